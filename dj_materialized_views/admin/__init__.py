@@ -1 +1 @@
-from .admin import MaterializedViewAdmin, MaterializedViewIndexAdmin
+from .admin import MaterializedViewAdmin, MaterializedViewIndexAdmin, MaterializedViewRefreshLogAdmin
@@ -1,74 +1,200 @@
 from django.contrib import messages
-from django.db import transaction
+from django.http import HttpResponseRedirect
+from django.urls import reverse
 from django.utils.translation import gettext_lazy as _
 
+from dj_materialized_views.executor import RefreshExecutor, create_materialized_views, drop_materialized_views, \
+    prefetch_materialized_views, refresh_materialized_views
+from dj_materialized_views.models import MaterializedView, MaterializedViewRefreshLog
+
+
+def _report_results(model_admin, request, results, message):
+    """
+    Reports the failed views one by one and the number of the successful ones
+    """
+    for result in results:
+        if not result.succeeded:
+            model_admin.message_user(request, f'{result.materialized_view}: Error: {result.error}',
+                                     level=messages.ERROR)
+
+    succeeded = sum(result.succeeded for result in results)
+    if succeeded:
+        model_admin.message_user(request, f'{message} ({succeeded})')
+
 
 def create_materialized_view_action(description=_('Create Materialized View')):
     def create_materialized_view(model_admin, request, queryset):
         """
         Creates the materialized views and all the indexes associated with the view.
-        If one of the SQL queries fails, the transaction is not committed
+        The views are created in parallel after the views they depend on, every view in its own transaction.
+        A failing view does not stop the others, the views that select from it are skipped
         """
-        with transaction.atomic():
-            for materialized_view in queryset:
-                try:
-                    materialized_view.create()
-                except Exception as e:
-                    return model_admin.message_user(request, f'Error: {e}', level=messages.ERROR)
+        results = create_materialized_views(queryset, trigger=MaterializedViewRefreshLog.Trigger.ADMIN)
 
-        return model_admin.message_user(request, _('Materialized view created'))
+        _report_results(model_admin, request, results, _('Materialized view created'))
 
     create_materialized_view.short_description = description
 
     return create_materialized_view
 
 
+def _refresh_materialized_views(model_admin, request, queryset, force=False):
+    """
+    Refreshes the materialized views in parallel, then the views that depend on them in topological order,
+    and reports the outcome of every view. This automatically rebuilds the indexes
+    """
+    results = refresh_materialized_views(queryset, cascade=True, trigger=MaterializedViewRefreshLog.Trigger.ADMIN,
+                                         force=force)
+
+    _report_results(model_admin, request, results, _('Materialized view refreshed'))
+
+
 def refresh_materialized_view_action(description=_('Refresh Materialized View')):
     def refresh_materialized_view(model_admin, request, queryset):
         """
-        Refreshes the materialized view.
-        This automatically rebuilds the indexes
+        Refreshes the materialized views, skips the views with unchanged source tables
         """
-        for materialized_view in queryset:
-            try:
-                materialized_view.refresh()
-            except Exception as e:
-                return model_admin.message_user(request, f'Error: {e}', level=messages.ERROR)
-
-        return model_admin.message_user(request, _('Materialized view refreshed'))
+        _refresh_materialized_views(model_admin, request, queryset)
 
     refresh_materialized_view.short_description = description
 
     return refresh_materialized_view
 
 
+def force_refresh_materialized_view_action(description=_('Force Refresh Materialized View')):
+    def force_refresh_materialized_view(model_admin, request, queryset):
+        """
+        Refreshes the materialized views, also the ones whose source tables did not change
+        """
+        _refresh_materialized_views(model_admin, request, queryset, force=True)
+
+    force_refresh_materialized_view.short_description = description
+
+    return force_refresh_materialized_view
+
+
+def queue_refresh_action(description=_('Queue Refresh')):
+    def queue_refresh(model_admin, request, queryset):
+        """
+        Sends the refresh tasks of the materialized views to Celery with the queue, priority,
+        time limits and expiry of every view, instead of refreshing them in the request
+        """
+        for materialized_view in queryset:
+            materialized_view.refresh_async(trigger=MaterializedViewRefreshLog.Trigger.ADMIN)
+
+        model_admin.message_user(request, f'{_("Materialized view refresh queued")} ({len(queryset)})')
+
+    queue_refresh.short_description = description
+
+    return queue_refresh
+
+
+def rebuild_materialized_view_action(description=_('Rebuild Materialized View')):
+    def rebuild_materialized_view(model_admin, request, queryset):
+        """
+        Rebuilds the materialized views from the current SQL query without downtime.
+        The views are rebuilt one at a time, a rebuild also rebuilds the views that depend on the view
+        """
+        results = RefreshExecutor(workers=1).run(
+            prefetch_materialized_views(queryset),
+            lambda mv: mv.rebuild(trigger=MaterializedViewRefreshLog.Trigger.ADMIN)
+        )
+
+        _report_results(model_admin, request, results, _('Materialized view rebuilt'))
+
+    rebuild_materialized_view.short_description = description
+
+    return rebuild_materialized_view
+
+
+def backfill_partitions_action(description=_('Backfill Partitions')):
+    def backfill_partitions(model_admin, request, queryset):
+        """
+        Recomputes all the partitions of the partitioned tables, also the ones outside of the refresh window
+        """
+        partitioned_views = queryset.filter(materialization=MaterializedView.Materialization.PARTITIONED.name)
+        results = RefreshExecutor(workers=1).run(
+            prefetch_materialized_views(partitioned_views),
+            lambda mv: mv.backfill(trigger=MaterializedViewRefreshLog.Trigger.ADMIN)
+        )
+
+        _report_results(model_admin, request, results, _('Partitions backfilled'))
+
+    backfill_partitions.short_description = description
+
+    return backfill_partitions
+
+
+def approve_estimate_action(description=_('Approve Estimated Cost')):
+    def approve_estimate(model_admin, request, queryset):
+        """
+        Allows creating and refreshing the views above the cost and row limits,
+        until the estimated cost of their query grows above the current estimate
+        """
+        for materialized_view in queryset:
+            materialized_view.approve_estimate()
+            model_admin.message_user(
+                request, f'{materialized_view}: approved estimated cost {materialized_view.approved_cost}, '
+                         f'{materialized_view.estimated_rows} rows'
+            )
+
+    approve_estimate.short_description = description
+
+    return approve_estimate
+
+
 def drop_materialized_view_action(description=_('Drop Materialized View')):
     def drop_materialized_view(model_admin, request, queryset):
         """
-        Drops tha materialized view table and removes the indexes
+        Drops tha materialized view table and removes the indexes.
+        The views are dropped in parallel before the views they depend on
         """
-        for materialized_view in queryset:
-            try:
-                materialized_view.drop()
-            except Exception as e:
-                return model_admin.message_user(request, f'Error: {e}', level=messages.ERROR)
+        results = drop_materialized_views(queryset)
 
-        return model_admin.message_user(request, _('Materialized view dropped'))
+        _report_results(model_admin, request, results, _('Materialized view dropped'))
 
     drop_materialized_view.short_description = description
 
     return drop_materialized_view
 
 
+def advise_indexes_action(description=_('Advise Indexes')):
+    def advise_indexes(model_admin, request, queryset):
+        """
+        Opens the index advisor page of the selected materialized views
+        """
+        opts = model_admin.model._meta
+        url = reverse(f'admin:{opts.app_label}_{opts.model_name}_advisor', current_app=model_admin.admin_site.name)
+        ids = ','.join(str(pk) for pk in queryset.values_list('pk', flat=True))
+
+        return HttpResponseRedirect(f'{url}?ids={ids}')
+
+    advise_indexes.short_description = description
+
+    return advise_indexes
+
+
+def _run_index_operation(model_admin, request, queryset, func, message):
+    """
+    Runs the operation on every index, the failures are reported and do not stop the other indexes
+    """
+    succeeded = 0
+
+    for index in queryset.select_related('materialized_view'):
+        try:
+            func(index)
+        except Exception as e:
+            model_admin.message_user(request, f'{index}: Error: {e}', level=messages.ERROR)
+        else:
+            succeeded += 1
+
+    if succeeded:
+        model_admin.message_user(request, f'{message} ({succeeded})')
+
+
 def create_index_action(description=_('Create Index')):
     def create_index_view(model_admin, request, queryset):
-        for index in queryset:
-            try:
-                index.create()
-            except Exception as e:
-                return model_admin.message_user(request, f'Error: {e}', level=messages.ERROR)
-
-        return model_admin.message_user(request, _('Index created'))
+        _run_index_operation(model_admin, request, queryset, lambda index: index.create(), _('Index created'))
 
     create_index_view.short_description = description
 
@@ -77,13 +203,7 @@ def create_index_action(description=_('Create Index')):
 
 def drop_index_action(description=_('Drop Index')):
     def drop_index_view(model_admin, request, queryset):
-        for index in queryset:
-            try:
-                index.drop()
-            except Exception as e:
-                return model_admin.message_user(request, f'Error: {e}', level=messages.ERROR)
-
-        return model_admin.message_user(request, _('Index dropped'))
+        _run_index_operation(model_admin, request, queryset, lambda index: index.drop(), _('Index dropped'))
 
     drop_index_view.short_description = description
 
@@ -1,8 +1,18 @@
-from django.contrib import admin
+from django.contrib import admin, messages
+from django.core.exceptions import PermissionDenied
+from django.http import HttpResponseRedirect
+from django.template.response import TemplateResponse
+from django.urls import path
+from django.utils.translation import gettext_lazy as _
 
 from dj_materialized_views.admin.actions import create_materialized_view_action, refresh_materialized_view_action, \
-    drop_materialized_view_action, create_index_action, drop_index_action
-from dj_materialized_views.models import MaterializedView, MaterializedViewIndex
+    force_refresh_materialized_view_action, rebuild_materialized_view_action, drop_materialized_view_action, \
+    backfill_partitions_action, approve_estimate_action, advise_indexes_action, create_index_action, \
+    drop_index_action, queue_refresh_action
+from dj_materialized_views.advisor import advise, get_statements_time_column
+from dj_materialized_views.estimates import get_exceeded_limit
+from dj_materialized_views.executor import delete_materialized_views
+from dj_materialized_views.models import MaterializedView, MaterializedViewIndex, MaterializedViewRefreshLog
 
 
 class MaterializedViewAdmin(admin.ModelAdmin):
@@ -11,29 +21,139 @@ class MaterializedViewAdmin(admin.ModelAdmin):
         fk_name = 'materialized_view'
         extra = 0  # do not show extra inline items
 
-    list_display = ('title', 'db_table', 'created_by_user',)
+    list_display = ('title', 'db_table', 'materialization', 'refresh_strategy', 'last_refresh_strategy',
+                    'last_run_date', 'refresh_p50', 'refresh_p95', 'refresh_failure_rate', 'estimated_rows',
+                    'estimated_cost', 'created_by_user',)
     list_filter = ('title',)
+    search_fields = ('title', 'db_table', 'tags')
     raw_id_fields = ('created_by_user',)
+    readonly_fields = ('depends_on', 'last_run_date', 'last_refresh_strategy', 'concurrent_refresh_duration',
+                       'full_refresh_duration', 'overlapping_refresh_count', 'coalesced_refresh_count',
+                       'refresh_follow_up_pending', 'source_tables', 'change_pending_since', 'last_change_at',
+                       'watermark', 'watermark_lag', 'last_full_rebuild_at', 'estimated_rows', 'estimated_width',
+                       'estimated_cost', 'estimated_at', 'approved_cost', 'heap_size', 'index_size',
+                       'dead_tuple_ratio', 'bloat_ratio', 'index_bloat_ratio', 'bloat_checked_at', 'maintenance_due',
+                       'last_maintenance', 'last_maintenance_at', 'last_concurrent_refresh_date')
     inlines = [MaterializedViewIndexInline, ]
 
     actions = [
         create_materialized_view_action(),
         refresh_materialized_view_action(),
-        drop_materialized_view_action()
+        force_refresh_materialized_view_action(),
+        queue_refresh_action(),
+        rebuild_materialized_view_action(),
+        backfill_partitions_action(),
+        approve_estimate_action(),
+        drop_materialized_view_action(),
+        advise_indexes_action()
     ]
 
+    def get_urls(self):
+        opts = self.model._meta
+        urls = [
+            path('advisor/', self.admin_site.admin_view(self.advisor_view),
+                 name=f'{opts.app_label}_{opts.model_name}_advisor'),
+        ]
+
+        return urls + super().get_urls()
+
+    def advisor_view(self, request):
+        """
+        Lists the index suggestions of the views in the ids query parameter, a POST applies one of them
+        """
+        index_opts = MaterializedViewIndex._meta
+        if not self.has_view_permission(request):
+            raise PermissionDenied
+
+        ids = [pk for pk in request.GET.get('ids', '').split(',') if pk.isdigit()]
+        queryset = MaterializedView.objects.filter(pk__in=ids)
+
+        if request.method == 'POST':
+            if not (request.user.has_perm(f'{index_opts.app_label}.add_{index_opts.model_name}')
+                    and request.user.has_perm(f'{index_opts.app_label}.delete_{index_opts.model_name}')):
+                raise PermissionDenied
+
+            self._apply_suggestion(request, queryset.filter(pk=request.POST.get('materialized_view')).first(),
+                                   request.POST.get('suggestion'))
+
+            return HttpResponseRedirect(request.get_full_path())
+
+        context = {
+            **self.admin_site.each_context(request),
+            'opts': self.model._meta,
+            'title': _('Index advisor'),
+            'suggestions': [(view, advise(view)) for view in queryset],
+            'statements_available': get_statements_time_column() is not None,
+        }
+
+        return TemplateResponse(request, 'admin/dj_materialized_views/materializedview/advisor.html', context)
+
+    def _apply_suggestion(self, request, materialized_view, key):
+        # the suggestions are computed again, only a current suggestion is applied
+        suggestion = next((suggestion for suggestion in advise(materialized_view) if suggestion.key == key), None) \
+            if materialized_view else None
+
+        if suggestion is None:
+            return self.message_user(request, _('The suggestion no longer applies'), level=messages.WARNING)
+
+        try:
+            index = suggestion.apply(user=request.user)
+        except Exception as e:
+            return self.message_user(request, f'Error: {e}', level=messages.ERROR)
+
+        message = _('Index created') if suggestion.action == suggestion.CREATE else _('Index dropped')
+        self.message_user(request, f'{message}: {index.get_index_name()}')
+
+    def get_queryset(self, request):
+        return super().get_queryset(request).annotate(**MaterializedViewRefreshLog.get_stats_annotations())
+
+    def refresh_p50(self, obj):
+        return _format_seconds(obj.refresh_duration_p50)
+
+    refresh_p50.short_description = _('Refresh p50')
+    refresh_p50.admin_order_field = 'refresh_duration_p50'
+
+    def refresh_p95(self, obj):
+        return _format_seconds(obj.refresh_duration_p95)
+
+    refresh_p95.short_description = _('Refresh p95')
+    refresh_p95.admin_order_field = 'refresh_duration_p95'
+
+    def refresh_failure_rate(self, obj):
+        return '-' if obj.refresh_failure_rate is None else f'{obj.refresh_failure_rate:.0%}'
+
+    refresh_failure_rate.short_description = _('Failure rate')
+    refresh_failure_rate.admin_order_field = 'refresh_failure_rate'
+
+    def watermark_lag(self, obj):
+        lag = obj.get_watermark_lag() if obj.is_append else None
+        if lag is None:
+            return '-'
+
+        return f'{lag["rows"]} rows, {_format_seconds(lag["seconds"])}'
+
+    watermark_lag.short_description = _('Watermark lag')
+
     def save_model(self, request, obj, form, change):
         if not obj.pk:
             obj.created_by_user = request.user
         super().save_model(request, obj, form, change)
 
+        # the estimate is updated on save
+        reason = get_exceeded_limit(obj)
+        if reason:
+            self.message_user(request, f'{obj}: {reason}, the view cannot be created or refreshed until its '
+                                       f'estimated cost is approved', level=messages.WARNING)
+
     def delete_queryset(self, request, queryset):
-        for materialized_view in queryset:
-            materialized_view.delete()
+        # the views that failed to drop are kept, the error is reported
+        for result in delete_materialized_views(queryset):
+            if not result.succeeded:
+                self.message_user(request, f'{result.materialized_view}: Error: {result.error}', level=messages.ERROR)
 
 
 class MaterializedViewIndexAdmin(admin.ModelAdmin):
-    list_display = ('title', 'created_by_user',)
+    list_display = ('title', 'materialized_view', 'index_name', 'index_type', 'index_field', 'created_by_user',)
     list_filter = ('title',)
     raw_id_fields = ('created_by_user',)
 
@@ -48,5 +168,24 @@ class MaterializedViewIndexAdmin(admin.ModelAdmin):
         super().save_model(request, obj, form, change)
 
 
+class MaterializedViewRefreshLogAdmin(admin.ModelAdmin):
+    list_display = ('materialized_view', 'started_at', 'duration', 'maintenance_duration', 'warm_up_duration',
+                    'strategy', 'status', 'trigger', 'row_count', 'estimated_rows', 'size_after',)
+    list_filter = ('status', 'trigger', 'strategy', 'materialized_view',)
+    date_hierarchy = 'started_at'
+
+    # the logs are written by the refreshes only
+    def has_add_permission(self, request):
+        return False
+
+    def has_change_permission(self, request, obj=None):
+        return False
+
+
+def _format_seconds(seconds):
+    return '-' if seconds is None else f'{seconds:.2f}s'
+
+
 admin.site.register(MaterializedView, MaterializedViewAdmin)
 admin.site.register(MaterializedViewIndex, MaterializedViewIndexAdmin)
+admin.site.register(MaterializedViewRefreshLog, MaterializedViewRefreshLogAdmin)
@@ -0,0 +1,245 @@
+import re
+from collections import OrderedDict
+from datetime import timedelta
+
+from django.db import DatabaseError
+from django.utils import timezone
+
+from dj_materialized_views.utils import atomic, fetch_raw_sql, using_database
+
+# usage of every index of the relation since the statistics were reset or the index was created
+INDEX_USAGE_SQL = """
+    SELECT stat.indexrelid, stat.indexrelname, stat.idx_scan, pg_relation_size(stat.indexrelid),
+        attribute.attname
+    FROM pg_stat_user_indexes stat
+    JOIN pg_index index ON index.indexrelid = stat.indexrelid
+    LEFT JOIN pg_attribute attribute ON attribute.attrelid = index.indrelid AND attribute.attnum = index.indkey[0]
+    WHERE stat.relid = to_regclass(%s)
+    ORDER BY stat.indexrelname
+"""
+
+TABLE_USAGE_SQL = """
+    SELECT coalesce(seq_scan, 0), coalesce(seq_tup_read, 0), coalesce(idx_scan, 0)
+    FROM pg_stat_user_tables
+    WHERE relid = to_regclass(%s)
+"""
+
+COLUMNS_SQL = """
+    SELECT attname FROM pg_attribute
+    WHERE attrelid = to_regclass(%s) AND attnum > 0 AND NOT attisdropped
+"""
+
+# the total time column was renamed in PostgreSQL 13
+STATEMENTS_SQL = """
+    SELECT query, calls, {total_time}
+    FROM pg_stat_statements
+    WHERE query ~* %s
+    ORDER BY {total_time} DESC
+    LIMIT %s
+"""
+
+# the WHERE clause of a query, up to the next clause
+WHERE_CLAUSE_PATTERN = re.compile(
+    r'\bWHERE\b(.*?)'
+    r'(?:\bGROUP\s+BY\b|\bORDER\s+BY\b|\bLIMIT\b|\bOFFSET\b|\bHAVING\b|\bUNION\b|\bFOR\s+UPDATE\b|\)\s*$|$)',
+    flags=re.IGNORECASE | re.DOTALL
+)
+# a column compared with something: "table"."column" = $1, column IN (...), column >= $2, ...
+PREDICATE_PATTERN = re.compile(
+    r'(?:"?(?P<table>[\w$]+)"?\s*\.\s*)?"?(?P<column>[\w$]+)"?\s*'
+    r'(?P<operator>=|<>|!=|<=|>=|<|>|\bIN\b|\bLIKE\b|\bILIKE\b|\bBETWEEN\b|\bIS\s+NULL\b)',
+    flags=re.IGNORECASE
+)
+EQUALITY_OPERATORS = ('=', 'IN', 'IS NULL')
+
+
+class IndexSuggestion:
+    """
+    A suggestion of the index advisor: drop an unused index or create a missing one
+    """
+
+    DROP = 'drop'
+    CREATE = 'create'
+
+    def __init__(self, materialized_view, action, reason, index=None, index_field=None, calls=0, total_time=0.0):
+        self.materialized_view = materialized_view
+        self.action = action
+        self.reason = reason
+        self.index = index
+        self.index_field = index_field
+        self.calls = calls
+        self.total_time = total_time
+
+    def __repr__(self):
+        return f'<IndexSuggestion {self.action} {self.materialized_view} {self.index or self.index_field}>'
+
+    @property
+    def key(self):
+        """
+        Identifies the suggestion among the suggestions of the view, e.g. in the admin apply form
+        """
+        return f'{self.action}:{self.index.pk if self.index else self.index_field}'
+
+    def __str__(self):
+        target = self.index.index_name if self.index else f'({self.index_field})'
+
+        return f'{self.materialized_view.db_table}: {self.action} index {target} - {self.reason}'
+
+    def apply(self, user=None):
+        """
+        Drops the unused index, or creates the MaterializedViewIndex of the missing index and builds it
+
+        :param user: recorded as the creator of the new index
+        :return: the dropped or created MaterializedViewIndex
+        """
+        from dj_materialized_views.models import MaterializedViewIndex
+
+        if self.action == self.DROP:
+            self.index.drop()
+            self.index.delete()
+            return self.index
+
+        index = MaterializedViewIndex.objects.create(
+            title=f'{self.materialized_view.db_table} ({self.index_field})',
+            materialized_view=self.materialized_view,
+            index_field=self.index_field,
+            created_by_user=user,
+        )
+        index.create()
+
+        return index
+
+
+def get_statements_time_column():
+    """
+    Returns the total time column of pg_stat_statements, or None when the extension is not available
+    """
+    rows = fetch_raw_sql(
+        "SELECT attname FROM pg_attribute WHERE attrelid = to_regclass('pg_stat_statements') "
+        "AND attname IN ('total_exec_time', 'total_time');"
+    )
+    if not rows:
+        return None
+
+    try:
+        # the view exists but fails when the library is not in shared_preload_libraries
+        with atomic():
+            fetch_raw_sql('SELECT 1 FROM pg_stat_statements LIMIT 1;')
+    except DatabaseError:
+        return None
+
+    return rows[0][0]
+
+
+def get_predicate_columns(query, db_table, columns):
+    """
+    Returns the columns of the table filtered by the query: the equality columns first,
+    followed by the first range column, the order of the keys of a matching btree index
+
+    :param query: normalized query text from pg_stat_statements
+    :param db_table: name of the table
+    :param columns: the columns of the table
+    :return: tuple of column names
+    """
+    table = db_table.split('.')[-1]
+    equality, ranges = [], []
+
+    for where_clause in WHERE_CLAUSE_PATTERN.findall(query):
+        for match in PREDICATE_PATTERN.finditer(where_clause):
+            if match.group('table') not in (None, table) or match.group('column') not in columns:
+                continue
+
+            column = match.group('column')
+            operator = re.sub(r'\s+', ' ', match.group('operator').upper())
+            target = equality if operator in EQUALITY_OPERATORS else ranges
+            if column not in equality and column not in ranges:
+                target.append(column)
+
+    return tuple(equality + ranges[:1])
+
+
+def advise(materialized_view, min_scans=100, max_statements=100, min_age=timedelta(days=1)):
+    """
+    Suggests the indexes to drop and to create for the materialized view.
+
+    * an index is unused when it was never scanned, although the view was read at least min_scans times.
+      Indexes younger than min_age and the unique index that enables the concurrent refresh are never
+      suggested for removal. The usage of the
+      indexes of views refreshed with a swap only counts since the last swap, the indexes are recreated by it
+    * a missing index is suggested for the columns the queries in pg_stat_statements filter the view on,
+      when the view is mostly read with sequential scans and no index starts with the same column
+
+    :param materialized_view: MaterializedView instance
+    :param min_scans: minimum number of reads of the view before its indexes are judged
+    :param max_statements: number of the slowest statements on the view that are analyzed
+    :param min_age: minimum age of an index before it is judged, its scans are only counted since its creation
+    :return: list of IndexSuggestion
+    """
+    with using_database(materialized_view.get_database_alias()):
+        return _advise(materialized_view, min_scans, max_statements, min_age)
+
+
+def _advise(materialized_view, min_scans, max_statements, min_age):
+    db_table = materialized_view.db_table
+    table_usage = fetch_raw_sql(TABLE_USAGE_SQL, [db_table])
+    if not table_usage:
+        return []  # the view does not exist
+
+    seq_scans, seq_rows, idx_scans = table_usage[0]
+    if seq_scans + idx_scans < min_scans:
+        return []
+
+    indexes = {index.get_index_name(): index for index in materialized_view.indexes.all()}
+    suggestions = []
+    leading_columns = set()
+    created_before = timezone.now() - min_age
+
+    for _, index_name, scans, size, leading_column in fetch_raw_sql(INDEX_USAGE_SQL, [db_table]):
+        leading_columns.add(leading_column)
+        index = indexes.get(index_name)
+
+        if index is None or scans or index.supports_concurrent_refresh or index.created_at > created_before:
+            continue
+
+        suggestions.append(IndexSuggestion(
+            materialized_view, IndexSuggestion.DROP, index=index,
+            reason=f'never used in {seq_scans + idx_scans} reads of the view, {size} bytes to rebuild on refresh'
+        ))
+
+    time_column = get_statements_time_column()
+    if time_column is None or seq_scans <= idx_scans:
+        return suggestions
+
+    columns = {row[0] for row in fetch_raw_sql(COLUMNS_SQL, [db_table])}
+    table_pattern = rf'\m"?{re.escape(db_table.split(".")[-1])}"?\M'
+    candidates = OrderedDict()
+
+    statements = fetch_raw_sql(STATEMENTS_SQL.format(total_time=time_column), [table_pattern, max_statements])
+    for query, calls, total_time in statements:
+        keys = get_predicate_columns(query, db_table, columns)
+        if not keys or keys[0] in leading_columns:
+            continue
+
+        candidate = candidates.setdefault(keys, [0, 0.0])
+        candidate[0] += calls
+        candidate[1] += total_time
+
+    for keys, (calls, total_time) in sorted(candidates.items(), key=lambda item: -item[1][1]):
+        suggestions.append(IndexSuggestion(
+            materialized_view, IndexSuggestion.CREATE, index_field=', '.join(keys), calls=calls,
+            total_time=total_time,
+            reason=f'{calls} queries filter on it ({total_time / 1000:.1f}s in total), '
+                   f'{seq_scans} sequential scans read {seq_rows} rows'
+        ))
+
+    return suggestions
+
+
+def advise_all(materialized_views, **kwargs):
+    """
+    Runs the advisor for every materialized view, see advise
+
+    :return: list of IndexSuggestion
+    """
+    return [suggestion for materialized_view in materialized_views
+            for suggestion in advise(materialized_view, **kwargs)]
@@ -0,0 +1,187 @@
+"""
+Append-only materialized views over event tables.
+
+The query is kept as a plain view (`<db_table>__query`) and its result is stored in a table. The view must be
+a projection or a filter of an append-only table with a monotonically increasing watermark column, e.g. an
+identity column or an insert timestamp. The highest watermark copied into the table is stored with the view:
+
+    SELECT id, created_at, user_id, payload->>'url' AS url FROM events WHERE kind = 'click'
+
+A refresh copies only the rows above the watermark, in batches of `append_batch_size` rows, each batch in its
+own transaction together with the new watermark. Rows with the same watermark value are never split between
+batches. Rows that appear below the watermark later (updates, deletes, late commits) are only picked up by a
+full rebuild, which recomputes the table from the query under a shadow name and swaps it in.
+"""
+from django.utils import timezone
+
+from dj_materialized_views.utils import atomic, execute_raw_sql, fetch_raw_sql
+
+# the rows of one batch: all the rows above the watermark up to the batch_size-th one, including its ties
+APPEND_BATCH_SQL = """
+    WITH bound AS (
+        SELECT {column} AS upper FROM {query_view}
+        WHERE %(watermark)s::text IS NULL OR {column} > %(watermark)s
+        ORDER BY {column}
+        OFFSET %(offset)s LIMIT 1
+    ), inserted AS (
+        INSERT INTO {db_table}
+        SELECT * FROM {query_view}
+        WHERE (%(watermark)s::text IS NULL OR {column} > %(watermark)s)
+            AND (NOT EXISTS (SELECT 1 FROM bound) OR {column} <= (SELECT upper FROM bound))
+        RETURNING {column}
+    )
+    SELECT count(*), max({column})::text FROM inserted
+"""
+
+LAG_SQL = """
+    SELECT count(*), {oldest}
+    FROM {query_view}
+    WHERE %(watermark)s::text IS NULL OR {column} > %(watermark)s
+"""
+
+COLUMN_TYPE_SQL = """
+    SELECT format_type(atttypid, atttypmod) FROM pg_attribute
+    WHERE attrelid = to_regclass(%s) AND attname = %s
+"""
+
+# types whose values are points in time, their lag is the age of the oldest row that was not copied yet
+TIME_TYPES = ('date', 'timestamp without time zone', 'timestamp with time zone')
+
+
+def get_shadow_table(materialized_view):
+    return f'{materialized_view.db_table}__shadow'
+
+
+def _store_watermark(materialized_view, watermark, **fields):
+    materialized_view.watermark = watermark or ''
+    for name, value in fields.items():
+        setattr(materialized_view, name, value)
+
+    type(materialized_view).objects.filter(pk=materialized_view.pk).update(
+        watermark=materialized_view.watermark, **fields
+    )
+
+
+def _load(materialized_view, db_table):
+    """
+    Copies all the rows of the query into the table, returns the highest watermark
+    """
+    column = materialized_view.watermark_column
+
+    execute_raw_sql(f'CREATE TABLE {db_table} (LIKE {materialized_view.query_relation})'
+                    f'{materialized_view.get_storage_sql()};')
+    execute_raw_sql(f'INSERT INTO {db_table} SELECT * FROM {materialized_view.query_relation};')
+    materialized_view._create_indexes(db_table=db_table)
+
+    return fetch_raw_sql(f'SELECT max({column})::text FROM {db_table};')[0][0]
+
+
+def create(materialized_view):
+    """
+    Creates the table with all the rows of the query and stores the watermark
+    """
+    execute_raw_sql(f'CREATE OR REPLACE VIEW {materialized_view.query_relation} AS '
+                    f'{materialized_view.sql_query.strip().rstrip(";")}\n;')
+
+    watermark = _load(materialized_view, materialized_view.db_table)
+    _store_watermark(materialized_view, watermark, last_full_rebuild_at=timezone.now())
+
+
+def drop(materialized_view):
+    """
+    Drops the table and the view of the query
+    """
+    execute_raw_sql(f'DROP TABLE IF EXISTS {get_shadow_table(materialized_view)};')
+    execute_raw_sql(f'DROP TABLE IF EXISTS {materialized_view.db_table};')
+    execute_raw_sql(f'DROP VIEW IF EXISTS {materialized_view.query_relation};')
+
+
+def rebuild(materialized_view):
+    """
+    Recomputes the whole table from the query without blocking the readers: the new version is built with
+    its indexes under the shadow name and replaces the table in a short transaction. Picks up the rows that
+    appeared below the watermark and compacts the table
+    """
+    db_table = materialized_view.db_table
+    shadow_table = get_shadow_table(materialized_view)
+
+    execute_raw_sql(f'CREATE OR REPLACE VIEW {materialized_view.query_relation} AS '
+                    f'{materialized_view.sql_query.strip().rstrip(";")}\n;')
+
+    with atomic():
+        materialized_view.apply_session_settings()
+        execute_raw_sql(f'DROP TABLE IF EXISTS {shadow_table};')
+        watermark = _load(materialized_view, shadow_table)
+
+    schema = f'{db_table.split(".")[0]}.' if '.' in db_table else ''
+    statements = [
+        f'DROP TABLE IF EXISTS {db_table};',
+        f'ALTER TABLE {shadow_table} RENAME TO {db_table.split(".")[-1]};',
+    ]
+    statements += [
+        f'ALTER INDEX IF EXISTS {schema}{index.get_index_name(shadow_table)} RENAME TO {index.get_index_name()};'
+        for index in materialized_view.indexes.all()
+    ]
+
+    with atomic():
+        materialized_view.apply_session_settings()
+        execute_raw_sql('\n'.join(statements))
+        _store_watermark(materialized_view, watermark, last_full_rebuild_at=timezone.now())
+
+
+def refresh(materialized_view):
+    """
+    Copies the rows above the watermark into the table, one batch per transaction, until no rows are left
+
+    :return: number of copied rows
+    """
+    column = materialized_view.watermark_column
+    batch_sql = APPEND_BATCH_SQL.format(
+        column=column, query_view=materialized_view.query_relation, db_table=materialized_view.db_table
+    )
+    batch_size = max(materialized_view.append_batch_size, 1)
+    copied = 0
+
+    while True:
+        with atomic():
+            materialized_view.apply_session_settings()
+            count, watermark = fetch_raw_sql(batch_sql, {
+                'watermark': materialized_view.watermark or None,
+                'offset': batch_size - 1,
+            })[0]
+            if count:
+                _store_watermark(materialized_view, watermark)
+
+        copied += count
+        if count < batch_size:
+            return copied
+
+
+def get_lag(materialized_view):
+    """
+    Returns how far the table is behind the query: the number of rows above the watermark and their age in
+    seconds. The age is measured from the oldest pending row for date and timestamp watermark columns, and
+    from the last refresh otherwise
+
+    :return: dict with rows and seconds
+    """
+    column = materialized_view.watermark_column
+    rows = fetch_raw_sql(COLUMN_TYPE_SQL, [materialized_view.query_relation, column])
+    is_time = bool(rows) and rows[0][0] in TIME_TYPES
+    oldest = f'extract(epoch FROM now() - min({column}))' if is_time else 'NULL'
+
+    count, age = fetch_raw_sql(
+        LAG_SQL.format(oldest=oldest, query_view=materialized_view.query_relation, column=column),
+        {'watermark': materialized_view.watermark or None}
+    )[0]
+
+    if not count:
+        seconds = 0.0
+    elif age is not None:
+        seconds = float(age)
+    elif materialized_view.last_run_date:
+        seconds = (timezone.now() - materialized_view.last_run_date).total_seconds()
+    else:
+        seconds = None
+
+    return {'rows': count, 'seconds': seconds}
@@ -6,3 +6,17 @@ class MaterializedViewsAppConfig(BaseConfig):
     name = 'dj_materialized_views'
     verbose_name = _('Django Materialized Views')
     default_auto_field = 'django.db.models.AutoField'
+
+    def ready(self):
+        from django.apps import apps
+        from django.db.models.signals import post_delete, post_save
+
+        from dj_materialized_views.changes import signal_receiver
+        from dj_materialized_views.conf import get_setting
+
+        # models whose writes request a refresh of the views with signal change detection
+        for model_name in get_setting('CHANGE_SIGNAL_MODELS'):
+            model = apps.get_model(model_name)
+            post_save.connect(signal_receiver, sender=model, dispatch_uid=f'dj_materialized_views_save_{model_name}')
+            post_delete.connect(signal_receiver, sender=model,
+                                dispatch_uid=f'dj_materialized_views_delete_{model_name}')
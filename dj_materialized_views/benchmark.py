@@ -0,0 +1,219 @@
+"""
+Benchmark of the creation, refresh and queries of materialized views over synthetic data.
+
+Every scale generates a table of events with the given number of rows and a view that aggregates them per user:
+
+    SELECT user_id AS id, count(*) AS events, sum(amount) AS amount, max(created) AS last_event
+    FROM __mv_bench_events GROUP BY user_id
+
+The view goes through the regular MaterializedView code paths, so the timings include the refresh log and
+the locks. Before every refresh a share of the events is updated, concurrent refreshes depend on the number
+of changed rows. The random data and change sets come from a fixed seed, so two runs benchmark the same data.
+All the benchmark tables, views and periodic tasks are removed afterwards.
+"""
+import platform
+import statistics
+import time
+
+import django
+from django.utils import timezone
+from django_celery_beat.models import IntervalSchedule, PeriodicTask
+
+from dj_materialized_views.utils import execute_raw_sql, fetch_raw_sql, get_connection
+
+PREFIX = '__mv_bench'
+EVENTS_TABLE = f'{PREFIX}_events'
+VIEW_TABLE = f'{PREFIX}_users'
+
+# one user per 100 events
+USERS_PER_EVENT = 0.01
+
+# seed of random(), between -1 and 1
+SEED = 0.5
+
+VIEW_SQL = f"""
+    SELECT user_id AS id, count(*) AS events, sum(amount) AS amount, max(created) AS last_event
+    FROM {EVENTS_TABLE}
+    GROUP BY user_id
+"""
+
+GENERATE_SQL = f"""
+    SELECT setseed(%(seed)s);
+    CREATE TABLE {EVENTS_TABLE} AS
+    SELECT
+        i AS id,
+        timestamp '2024-01-01' + i * interval '1 second' AS created,
+        (random() * %(users)s)::int AS user_id,
+        round((random() * 100)::numeric, 2) AS amount
+    FROM generate_series(1, %(rows)s) AS i;
+    ALTER TABLE {EVENTS_TABLE} ADD PRIMARY KEY (id);
+    ANALYZE {EVENTS_TABLE};
+"""
+
+CHANGE_SQL = f"""
+    UPDATE {EVENTS_TABLE} SET amount = amount + 1
+    WHERE id IN (SELECT (random() * %(rows)s)::int FROM generate_series(1, %(changes)s))
+"""
+
+
+def _timed(func):
+    start = time.monotonic()
+    func()
+
+    return time.monotonic() - start
+
+
+def _summary(operation, scale, runs, strategy=''):
+    return {
+        'operation': operation,
+        'strategy': strategy,
+        'rows': scale,
+        'runs': runs,
+        'min': min(runs),
+        'median': statistics.median(runs),
+        'max': max(runs),
+    }
+
+
+def generate_data(rows, seed=SEED):
+    """
+    Creates the events table with rows random events. The random sequence of the session starts from the seed,
+    the change sets of change_data that follow in the same session are the same on every run too
+    """
+    execute_raw_sql(f'DROP TABLE IF EXISTS {EVENTS_TABLE};')
+    execute_raw_sql(GENERATE_SQL, {'rows': rows, 'users': max(int(rows * USERS_PER_EVENT), 1), 'seed': seed})
+
+
+def change_data(rows, change_ratio):
+    """
+    Updates about change_ratio of the events, the changes of the view are spread over all the users.
+    The updated events follow from the seed of generate_data
+    """
+    changes = int(rows * change_ratio)
+    if changes:
+        execute_raw_sql(CHANGE_SQL, {'rows': rows, 'changes': changes})
+
+
+def create_view():
+    """
+    Returns a new MaterializedView of the benchmark with a unique index on id, not created in the database yet
+    """
+    from dj_materialized_views.models import MaterializedView, MaterializedViewIndex
+
+    interval, _ = IntervalSchedule.objects.get_or_create(every=1, period=IntervalSchedule.DAYS)
+    periodic_task = PeriodicTask.objects.create(name=f'{PREFIX} {timezone.now().isoformat()}', interval=interval)
+
+    materialized_view = MaterializedView.objects.create(
+        title=PREFIX, db_table=VIEW_TABLE, sql_query=VIEW_SQL, periodic_task=periodic_task
+    )
+    MaterializedViewIndex.objects.create(
+        title=f'{VIEW_TABLE} (id)', materialized_view=materialized_view, index_field='id', is_unique=True
+    )
+
+    return materialized_view
+
+
+def cleanup():
+    """
+    Drops the benchmark tables and views and deletes their MaterializedView and PeriodicTask
+    """
+    from dj_materialized_views.models import MaterializedView
+
+    for materialized_view in MaterializedView.objects.filter(db_table=VIEW_TABLE):
+        materialized_view.delete()
+
+    PeriodicTask.objects.filter(name__startswith=PREFIX).delete()
+    execute_raw_sql(f'DROP MATERIALIZED VIEW IF EXISTS {VIEW_TABLE};')
+    execute_raw_sql(f'DROP TABLE IF EXISTS {EVENTS_TABLE};')
+
+
+def get_queries(materialized_view, rows):
+    """
+    Typical ORM queries of the view: a lookup by primary key, a filtered count and a top 10
+    """
+    user_id = max(int(rows * USERS_PER_EVENT), 1) // 2
+
+    return {
+        'get': lambda: materialized_view.model.objects.filter(pk=user_id).first(),
+        'filter_count': lambda: materialized_view.model.objects.filter(events__gte=100).count(),
+        'top_10': lambda: list(materialized_view.model.objects.order_by('-amount')[:10]),
+    }
+
+
+def benchmark_scale(rows, repeat=3, change_ratio=0.01, seed=SEED):
+    """
+    Runs the benchmark at one scale
+
+    :param rows: number of events
+    :param repeat: number of runs of every operation
+    :param change_ratio: share of the events updated before every refresh
+    :param seed: seed of the random data and change sets, between -1 and 1
+    :return: list of dicts with the durations in seconds of every operation
+    """
+    from dj_materialized_views.models import MaterializedView, MaterializedViewIndex
+
+    results = []
+    cleanup()
+    generate_data(rows, seed)
+
+    try:
+        materialized_view = create_view()
+        runs = []
+        for _ in range(repeat):
+            materialized_view.drop()
+            runs.append(_timed(lambda: materialized_view.create(enable_periodic_refresh=False)))
+        results.append(_summary('create', rows, runs))
+
+        strategies = (MaterializedView.RefreshStrategy.CONCURRENT, MaterializedView.RefreshStrategy.PLAIN,
+                      MaterializedView.RefreshStrategy.SWAP)
+        for strategy in strategies:
+            materialized_view.refresh_strategy = strategy.name
+            MaterializedView.objects.filter(pk=materialized_view.pk).update(refresh_strategy=strategy.name)
+            runs = []
+            for _ in range(repeat):
+                change_data(rows, change_ratio)
+                runs.append(_timed(lambda: materialized_view.refresh(force=True)))
+            results.append(_summary('refresh', rows, runs, strategy=strategy.value))
+
+        index = MaterializedViewIndex.objects.create(
+            title=f'{VIEW_TABLE} (amount)', materialized_view=materialized_view, index_field='amount'
+        )
+        runs = []
+        for _ in range(repeat):
+            index.drop()
+            runs.append(_timed(index.create))
+        results.append(_summary('create_index', rows, runs))
+
+        execute_raw_sql(f'ANALYZE {VIEW_TABLE};')
+        for name, query in get_queries(materialized_view, rows).items():
+            query()  # introspects the model and warms up the cache
+            results.append(_summary(f'query_{name}', rows, [_timed(query) for _ in range(repeat)]))
+    finally:
+        cleanup()
+
+    return results
+
+
+def run(scales, repeat=3, change_ratio=0.01, label='', seed=SEED):
+    """
+    Runs the benchmark at every scale, outside of a transaction so that the concurrent operations are measured
+
+    :param scales: numbers of events
+    :param label: recorded with the results, e.g. the release or the tuning change
+    :param seed: seed of the random data and change sets, between -1 and 1
+    :return: dict with the environment and the results, serializable to JSON
+    """
+    if get_connection().in_atomic_block:
+        raise RuntimeError('The benchmark cannot run in a transaction')
+
+    return {
+        'label': label,
+        'started_at': timezone.now().isoformat(),
+        'environment': {
+            'postgresql': fetch_raw_sql('SHOW server_version;')[0][0],
+            'django': django.get_version(),
+            'python': platform.python_version(),
+        },
+        'settings': {'repeat': repeat, 'change_ratio': change_ratio, 'seed': seed},
+        'results': [result for rows in scales for result in benchmark_scale(rows, repeat, change_ratio, seed)],
+    }
@@ -0,0 +1,183 @@
+"""
+Bloat of the materialized view relations.
+
+Concurrent refreshes apply the differences with updates and deletes, incremental and append-only tables are
+changed in place. The dead rows and the half empty pages they leave behind slow down the scans of the view
+until VACUUM makes the space reusable, and the indexes only shrink when they are rebuilt. The stats of a view:
+
+    heap_size           size of the table without the indexes in bytes
+    index_size          size of all the indexes in bytes
+    dead_tuple_ratio    dead rows / all rows, as counted by the statistics collector
+    bloat_ratio         share of the table taken by dead rows and free space
+    index_bloat_ratio   share of the btree indexes taken by free space
+
+The bloat is measured with the pgstattuple extension when it is installed. Otherwise the bloat of the table is
+estimated from the catalog, the planner's row count and width against the size of the table, and the bloat
+of the indexes is not measured. Partitioned tables are rewritten by every refresh and are not tracked.
+"""
+import datetime
+
+from django.utils import timezone
+
+from dj_materialized_views.conf import DEFAULTS, get_setting
+from dj_materialized_views.utils import fetch_raw_sql
+
+# size of a page and of its header, see the PostgreSQL storage page layout
+PAGE_SIZE = 8192
+PAGE_HEADER_SIZE = 24
+# tuple header and line pointer of every row
+ROW_OVERHEAD = 28
+# leaf density of a freshly built btree index with the default fillfactor
+BTREE_LEAF_DENSITY = 90.0
+
+STATS_SQL = """
+    SELECT pg_relation_size(c.oid), pg_indexes_size(c.oid), c.reltuples, s.n_live_tup, s.n_dead_tup
+    FROM pg_class c
+    LEFT JOIN pg_stat_all_tables s ON s.relid = c.oid
+    WHERE c.oid = to_regclass(%s)
+"""
+
+ROW_WIDTH_SQL = """
+    SELECT sum(s.avg_width)
+    FROM pg_stats s
+    JOIN pg_namespace n ON n.nspname = s.schemaname
+    JOIN pg_class c ON c.relnamespace = n.oid AND c.relname = s.tablename
+    WHERE c.oid = to_regclass(%s) AND NOT s.inherited
+"""
+
+PGSTATTUPLE_SQL = """
+    SELECT table_len, dead_tuple_len, approx_free_space FROM pgstattuple_approx(to_regclass(%s))
+"""
+
+BTREE_INDEXES_SQL = """
+    SELECT i.indexrelid::regclass::text
+    FROM pg_index i
+    JOIN pg_class c ON c.oid = i.indexrelid
+    JOIN pg_am a ON a.oid = c.relam
+    WHERE i.indrelid = to_regclass(%s) AND a.amname = 'btree' AND i.indisvalid
+"""
+
+PGSTATINDEX_SQL = 'SELECT index_size, avg_leaf_density FROM pgstatindex(%s)'
+
+
+def has_pgstattuple():
+    return bool(fetch_raw_sql("SELECT 1 FROM pg_extension WHERE extname = 'pgstattuple';"))
+
+
+def get_stats(materialized_view):
+    """
+    Measures the size and the bloat of the view, see the module docstring
+
+    :return: dict with heap_size, index_size, dead_tuple_ratio, bloat_ratio and index_bloat_ratio,
+        None when the relation does not exist or is a partitioned table. Ratios that cannot be measured are None
+    """
+    if materialized_view.is_partitioned:
+        return None
+
+    rows = fetch_raw_sql(STATS_SQL, [materialized_view.db_table])
+    if not rows:
+        return None
+
+    heap_size, index_size, reltuples, live_tuples, dead_tuples = rows[0]
+    all_tuples = (live_tuples or 0) + (dead_tuples or 0)
+
+    stats = {
+        'heap_size': heap_size,
+        'index_size': index_size,
+        'dead_tuple_ratio': dead_tuples / all_tuples if all_tuples else 0.0,
+        'bloat_ratio': None,
+        'index_bloat_ratio': None,
+    }
+
+    if has_pgstattuple():
+        stats['bloat_ratio'] = _measure_table_bloat(materialized_view.db_table)
+        stats['index_bloat_ratio'] = _measure_index_bloat(materialized_view.db_table)
+    else:
+        stats['bloat_ratio'] = _estimate_table_bloat(materialized_view.db_table, heap_size, reltuples)
+
+    return stats
+
+
+def _measure_table_bloat(db_table):
+    table_len, dead_tuple_len, free_space = fetch_raw_sql(PGSTATTUPLE_SQL, [db_table])[0]
+
+    return (dead_tuple_len + free_space) / table_len if table_len else 0.0
+
+
+def _measure_index_bloat(db_table):
+    """
+    The free space of the btree indexes, from the density of their leaf pages, weighted by the index size
+    """
+    total_size, bloat_size = 0, 0.0
+
+    for (index_name,) in fetch_raw_sql(BTREE_INDEXES_SQL, [db_table]):
+        index_size, density = fetch_raw_sql(PGSTATINDEX_SQL, [index_name])[0]
+        if density != density:  # NaN for empty indexes
+            continue
+
+        total_size += index_size
+        bloat_size += index_size * max(1 - density / BTREE_LEAF_DENSITY, 0.0)
+
+    return bloat_size / total_size if total_size else 0.0
+
+
+def _estimate_table_bloat(db_table, heap_size, reltuples):
+    """
+    1 - the size the rows would take in tightly packed pages / the size of the table.
+    Unknown until the view is analyzed
+    """
+    width = fetch_raw_sql(ROW_WIDTH_SQL, [db_table])[0][0]
+    if width is None or reltuples is None or reltuples < 0 or not heap_size:
+        return None
+
+    expected_size = reltuples * (width + ROW_OVERHEAD) * PAGE_SIZE / (PAGE_SIZE - PAGE_HEADER_SIZE)
+
+    return max(1 - expected_size / heap_size, 0.0)
+
+
+def get_action(stats):
+    """
+    Picks the maintenance of a view with the given stats, MATERIALIZED_VIEWS_BLOAT_THRESHOLDS:
+    a rebuild for a bloated table, a reindex for bloated indexes, a vacuum for dead rows.
+    Relations smaller than min_size are left alone
+
+    :param stats: dict returned by get_stats, or None
+    :return: MaterializedView.BloatAction
+    """
+    from dj_materialized_views.models import MaterializedView
+
+    thresholds = dict(DEFAULTS['BLOAT_THRESHOLDS'], **get_setting('BLOAT_THRESHOLDS'))
+
+    if stats is None or stats['heap_size'] + stats['index_size'] < thresholds['min_size']:
+        return MaterializedView.BloatAction.NONE
+
+    def exceeds(name):
+        return stats[name] is not None and thresholds.get(name) is not None and stats[name] >= thresholds[name]
+
+    if exceeds('bloat_ratio'):
+        return MaterializedView.BloatAction.REBUILD
+    if exceeds('index_bloat_ratio'):
+        return MaterializedView.BloatAction.REINDEX
+    if exceeds('dead_tuple_ratio'):
+        return MaterializedView.BloatAction.VACUUM
+
+    return MaterializedView.BloatAction.NONE
+
+
+def in_maintenance_window(now=None):
+    """
+    Checks if the time is inside MATERIALIZED_VIEWS_MAINTENANCE_WINDOW, a pair of "HH:MM" local times.
+    The window may span midnight, e.g. ("23:00", "04:00"). Always true when no window is set
+    """
+    window = get_setting('MAINTENANCE_WINDOW')
+    if not window:
+        return True
+
+    start, end = (datetime.datetime.strptime(value, '%H:%M').time() for value in window)
+    now = now or timezone.now()
+    current = (timezone.localtime(now) if timezone.is_aware(now) else now).time()
+
+    if start <= end:
+        return start <= current < end
+
+    return current >= start or current < end
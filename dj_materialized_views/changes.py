@@ -0,0 +1,209 @@
+import select
+from datetime import timedelta
+
+from django.db import transaction
+from django.utils import timezone
+
+from dj_materialized_views.utils import execute_raw_sql, fetch_raw_sql, get_connection
+
+NOTIFY_CHANNEL = 'dj_materialized_views'
+NOTIFY_TRIGGER = 'dj_materialized_views_notify'
+
+# statement level trigger, notifications with the same payload are sent once per transaction
+CREATE_NOTIFY_FUNCTION_SQL = f"""
+    CREATE OR REPLACE FUNCTION {NOTIFY_TRIGGER}() RETURNS trigger AS $$
+    BEGIN
+        PERFORM pg_notify('{NOTIFY_CHANNEL}', TG_TABLE_SCHEMA || '.' || TG_TABLE_NAME);
+        RETURN NULL;
+    END;
+    $$ LANGUAGE plpgsql;
+"""
+
+# change counters of the tables and of the leaf partitions of the partitioned tables, including the
+# changes of the current transaction. The file node changes on TRUNCATE and on a plain REFRESH
+CHANGE_COUNTERS_SQL = """
+    WITH source AS (SELECT unnest(%s::regclass[]) AS relid)
+    SELECT relation.relid::regclass::text,
+        stat.n_tup_ins + pg_stat_get_xact_tuples_inserted(relation.relid),
+        stat.n_tup_upd + pg_stat_get_xact_tuples_updated(relation.relid),
+        stat.n_tup_del + pg_stat_get_xact_tuples_deleted(relation.relid),
+        pg_relation_filenode(relation.relid)
+    FROM (
+        SELECT relid FROM source
+        UNION
+        SELECT tree.relid FROM source, pg_partition_tree(source.relid) tree WHERE tree.isleaf
+    ) relation
+    JOIN pg_class class ON class.oid = relation.relid AND class.relkind <> 'p'
+    LEFT JOIN pg_stat_all_tables stat ON stat.relid = relation.relid
+    ORDER BY 1
+"""
+
+
+def install_notify_trigger(table):
+    """
+    Installs the trigger that sends a notification on every write to the table
+
+    :param table: schema qualified table name
+    """
+    execute_raw_sql(CREATE_NOTIFY_FUNCTION_SQL)
+    execute_raw_sql(f'DROP TRIGGER IF EXISTS {NOTIFY_TRIGGER} ON {table};')
+    execute_raw_sql(f'CREATE TRIGGER {NOTIFY_TRIGGER} AFTER INSERT OR UPDATE OR DELETE OR TRUNCATE ON {table} '
+                    f'FOR EACH STATEMENT EXECUTE PROCEDURE {NOTIFY_TRIGGER}();')
+
+
+def remove_notify_trigger(table):
+    """
+    Removes the notification trigger from the table
+
+    :param table: schema qualified table name
+    """
+    execute_raw_sql(f'DROP TRIGGER IF EXISTS {NOTIFY_TRIGGER} ON {table};')
+
+
+def get_notify_trigger_tables(tables):
+    """
+    Returns the tables that have the notification trigger
+
+    :param tables: iterable of schema qualified table names
+    :return: set of the given table names
+    """
+    rows = fetch_raw_sql(
+        'SELECT source.name FROM unnest(%s::text[]) source(name) '
+        'JOIN pg_trigger ON pg_trigger.tgrelid = to_regclass(source.name) AND pg_trigger.tgname = %s',
+        [list(tables), NOTIFY_TRIGGER]
+    )
+
+    return {table for table, in rows}
+
+
+def get_change_snapshot(tables):
+    """
+    Returns the insert / update / delete counters of the tables from the PostgreSQL statistics, which change
+    whenever the data of the tables changes. The statistics are reported with a delay of up to a few seconds,
+    so the snapshot may not include the changes committed by other sessions right before it is taken
+
+    :param tables: list of table or materialized view names, optionally schema qualified
+    :return: dict of table -> counters, or None when the changes cannot be tracked
+    """
+    if not tables or fetch_raw_sql("SELECT current_setting('track_counts');")[0][0] != 'on':
+        return None
+
+    rows = fetch_raw_sql(CHANGE_COUNTERS_SQL, [list(tables)])
+    if any(value is None for row in rows for value in row):
+        return None  # e.g. foreign tables have no statistics
+
+    return {table: list(counters) for table, *counters in rows}
+
+
+def get_changed_views(tables, change_detection=None):
+    """
+    Returns the materialized views with change detection that read from any of the tables
+
+    :param tables: iterable of table names, optionally schema qualified
+    :param change_detection: only return views with this change detection
+    :return: list of MaterializedView instances
+    """
+    from dj_materialized_views.models import MaterializedView
+
+    tables = set(tables)
+    materialized_views = MaterializedView.objects.exclude(
+        change_detection=MaterializedView.ChangeDetection.NONE.name
+    )
+    if change_detection is not None:
+        materialized_views = materialized_views.filter(change_detection=change_detection.name)
+
+    return [
+        mv for mv in materialized_views
+        if any(table in tables or table.split('.')[-1] in tables for table in mv.get_source_tables())
+    ]
+
+
+def notify_change(tables, change_detection=None):
+    """
+    Requests a refresh of the materialized views that read from the changed tables
+
+    :param tables: iterable of table names, optionally schema qualified
+    :param change_detection: only refresh views with this change detection
+    """
+    for materialized_view in get_changed_views(tables, change_detection):
+        request_refresh(materialized_view)
+
+
+def request_refresh(materialized_view):
+    """
+    Records a change in the sources of the materialized view.
+
+    The first change after a refresh schedules the refresh task, later changes only move the
+    debounce window, so a burst of changes results in a single refresh
+    """
+    from dj_materialized_views.models import MaterializedView
+
+    now = timezone.now()
+    first_change = MaterializedView.objects.filter(
+        pk=materialized_view.pk, change_pending_since__isnull=True
+    ).update(change_pending_since=now, last_change_at=now)
+
+    if first_change:
+        transaction.on_commit(lambda: schedule_refresh(materialized_view, materialized_view.debounce_seconds))
+    else:
+        MaterializedView.objects.filter(pk=materialized_view.pk).update(last_change_at=now)
+
+
+def schedule_refresh(materialized_view, countdown):
+    """
+    Sends the change refresh task with the queue, priority and time limits of the view.
+    The task never expires, the pending change is only cleared by the task, no other refresh would be requested
+    """
+    from dj_materialized_views.tasks import refresh_changed_materialized_view
+
+    options = materialized_view.get_task_options(countdown)
+    options.pop('expires', None)
+
+    refresh_changed_materialized_view.apply_async(kwargs={'materialized_view_id': materialized_view.pk}, **options)
+
+
+def get_refresh_due_date(materialized_view):
+    """
+    The refresh is due when no change came in for the debounce window,
+    or when the first pending change is about to exceed the maximum staleness
+    """
+    debounced = materialized_view.last_change_at + timedelta(seconds=materialized_view.debounce_seconds)
+    stale = materialized_view.change_pending_since + timedelta(
+        seconds=materialized_view.max_staleness_seconds
+    )
+
+    return min(debounced, stale)
+
+
+def signal_receiver(sender, **kwargs):
+    """
+    post_save / post_delete receiver for the models in MATERIALIZED_VIEWS_CHANGE_SIGNAL_MODELS
+    """
+    from dj_materialized_views.models import MaterializedView
+
+    notify_change([sender._meta.db_table], change_detection=MaterializedView.ChangeDetection.SIGNALS)
+
+
+def listen(timeout=5.0):
+    """
+    Listens for the notifications of the change triggers and requests the refresh of the changed views.
+    Runs forever, used by the mv_listen management command
+    """
+    from dj_materialized_views.models import MaterializedView
+
+    execute_raw_sql(f'LISTEN {NOTIFY_CHANNEL};')
+    raw_connection = get_connection().connection
+
+    while True:
+        if hasattr(raw_connection, 'poll'):  # psycopg2
+            # the notifications received while the views were queried are already waiting
+            if not raw_connection.notifies:
+                select.select([raw_connection], [], [], timeout)
+            raw_connection.poll()
+            tables = {notification.payload for notification in raw_connection.notifies}
+            raw_connection.notifies.clear()
+        else:  # psycopg 3
+            tables = {notification.payload for notification in raw_connection.notifies(timeout=timeout)}
+
+        if tables:
+            notify_change(tables, change_detection=MaterializedView.ChangeDetection.TRIGGERS)
@@ -0,0 +1,66 @@
+from django.conf import settings
+
+DEFAULTS = {
+    # maximum number of materialized views refreshed at the same time (one db connection each)
+    'REFRESH_WORKERS': 4,
+    # the auto refresh strategy switches from concurrent refresh to a swap when the last concurrent
+    # refresh took longer than this many times the last full rebuild
+    'CONCURRENT_REFRESH_MAX_RATIO': 1.0,
+    # the auto refresh strategy tries a concurrent refresh again once the last one is older than this many
+    # seconds, so the choice follows the changes of the data. None keeps the last duration forever
+    'CONCURRENT_REFRESH_RETRY_AGE': 7 * 24 * 60 * 60,
+    # 'app_label.ModelName' models whose post_save / post_delete signals refresh the views that read them
+    'CHANGE_SIGNAL_MODELS': [],
+    # refresh logs older than this are deleted
+    'REFRESH_LOG_RETENTION_DAYS': 30,
+    # count the rows of the view after every refresh instead of using the planner estimate
+    'REFRESH_LOG_EXACT_ROW_COUNT': False,
+    # cache used by the views with the read cache enabled
+    'READ_CACHE_ALIAS': 'default',
+    # safety expiry of the cached query results in seconds, they are invalidated by every refresh anyway
+    'READ_CACHE_TIMEOUT': 24 * 60 * 60,
+    # query results with more rows are not cached
+    'READ_CACHE_MAX_ROWS': 10000,
+    # bearer token of the scrapers of the metrics view, the view is only served to staff users without it
+    'METRICS_TOKEN': None,
+    # database alias where the views are created and refreshed, unless the view names another one
+    'DATABASE': 'default',
+    # aliases of the hot standby replicas of a database, e.g. {'default': ['replica_1', 'replica_2']}.
+    # The models of the views read from a replica that has replayed the last refresh, see routers
+    'REPLICAS': {},
+    # PostgreSQL settings applied with SET LOCAL to every refresh and index build, e.g.
+    # {'statement_timeout': '30min', 'lock_timeout': '10s'}, the settings of a view take precedence
+    'REFRESH_SESSION_SETTINGS': {},
+    # Celery options of the refresh tasks of every view, e.g. {'queue': 'refresh', 'expires': 3600},
+    # overridden by the queue, priority, time limits and expiry of a view
+    'REFRESH_TASK_OPTIONS': {},
+    # relations smaller than min_size bytes are not maintained. Above it a bloat_ratio rebuilds the view,
+    # an index_bloat_ratio reindexes it and a dead_tuple_ratio vacuums it, None disables a threshold.
+    # The given thresholds override these ones
+    'BLOAT_THRESHOLDS': {
+        'min_size': 10 * 1024 * 1024,
+        'bloat_ratio': 0.5,
+        'index_bloat_ratio': 0.3,
+        'dead_tuple_ratio': 0.2,
+    },
+    # ('HH:MM', 'HH:MM') local times between which the scheduled maintenance runs, any time when None
+    'MAINTENANCE_WINDOW': None,
+    # bytes that the warm-up of a view may load into the buffer cache, unless the view sets its own budget
+    'WARM_UP_MAX_BYTES': 256 * 1024 * 1024,
+    # the budget of the warm-up never exceeds this share of shared_buffers
+    'WARM_UP_MAX_SHARED_BUFFERS_RATIO': 0.25,
+    # creates and refreshes of views whose query the planner estimates above these limits are refused,
+    # unless the estimated cost of the view was approved. None disables the limit
+    'MAX_ESTIMATED_COST': None,
+    'MAX_ESTIMATED_ROWS': None,
+}
+
+
+def get_setting(name):
+    """
+    Returns the value of the MATERIALIZED_VIEWS_<name> Django setting or its default
+
+    :param name: setting name without the MATERIALIZED_VIEWS_ prefix
+    :return: setting value
+    """
+    return getattr(settings, f'MATERIALIZED_VIEWS_{name}', DEFAULTS[name])
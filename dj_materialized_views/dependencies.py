@@ -0,0 +1,209 @@
+import re
+
+from dj_materialized_views.utils import fetch_raw_sql
+
+# relations referenced by the rewrite rule of a view or a materialized view
+SOURCE_RELATIONS_SQL = """
+    SELECT DISTINCT source_namespace.nspname, source.relname, source.relkind
+    FROM pg_rewrite rewrite
+    JOIN pg_depend dependency
+        ON dependency.objid = rewrite.oid
+        AND dependency.classid = 'pg_rewrite'::regclass
+        AND dependency.refclassid = 'pg_class'::regclass
+    JOIN pg_class source ON source.oid = dependency.refobjid
+    JOIN pg_namespace source_namespace ON source_namespace.oid = source.relnamespace
+    WHERE rewrite.ev_class = to_regclass(%s)
+        AND source.oid <> rewrite.ev_class
+"""
+
+
+def relation_exists(db_table):
+    """
+    Checks if the relation exists in the database
+
+    :param db_table: table name, optionally schema qualified
+    :return: bool
+    """
+    return fetch_raw_sql('SELECT to_regclass(%s) IS NOT NULL;', [db_table])[0][0]
+
+
+def is_populated(db_table):
+    """
+    Checks if the relation exists and contains data, same as pg_matviews.ispopulated for materialized views.
+    Materialized views created WITH NO DATA are not populated
+
+    :param db_table: relation name, optionally schema qualified
+    :return: bool
+    """
+    rows = fetch_raw_sql('SELECT relispopulated FROM pg_class WHERE oid = to_regclass(%s);', [db_table])
+
+    return bool(rows and rows[0][0])
+
+
+def get_relation_kind(db_table):
+    """
+    Returns the pg_class.relkind of the relation: r - table, v - view, m - materialized view, ...
+
+    :param db_table: relation name, optionally schema qualified
+    :return: relkind or None if the relation does not exist
+    """
+    rows = fetch_raw_sql('SELECT relkind FROM pg_class WHERE oid = to_regclass(%s);', [db_table])
+
+    return rows[0][0] if rows else None
+
+
+def get_qualified_name(db_table):
+    """
+    Returns the schema qualified name of the relation, or None if the relation does not exist
+    """
+    rows = fetch_raw_sql(
+        'SELECT namespace.nspname || \'.\' || relation.relname FROM pg_class relation '
+        'JOIN pg_namespace namespace ON namespace.oid = relation.relnamespace WHERE relation.oid = to_regclass(%s);',
+        [db_table]
+    )
+
+    return rows[0][0] if rows else None
+
+
+def get_source_relations(db_table):
+    """
+    Returns the relations that a (materialized) view selects from, as found in pg_depend
+
+    :param db_table: view name, optionally schema qualified
+    :return: list of (schema, name, relkind) tuples
+    """
+    return fetch_raw_sql(SOURCE_RELATIONS_SQL, [db_table])
+
+
+def get_source_tables(db_table, relkinds=('r', 'p')):
+    """
+    Returns the tables that a (materialized) view reads, following plain views down to their tables.
+    Materialized views are not followed, they are refreshed separately
+
+    :param db_table: view name, optionally schema qualified
+    :param relkinds: kinds of the returned relations, ordinary and partitioned tables by default
+    :return: sorted list of schema qualified table names
+    """
+    tables = set()
+    visited = {db_table}
+    pending = [db_table]
+
+    while pending:
+        for schema, name, relkind in get_source_relations(pending.pop()):
+            relation = f'{schema}.{name}'
+            if relkind in relkinds:
+                tables.add(relation)
+            elif relkind == 'v' and relation not in visited:
+                visited.add(relation)
+                pending.append(relation)
+
+    return sorted(tables)
+
+
+def references_table(sql_query, db_table):
+    """
+    Checks if the SQL query references the table name as a standalone (optionally quoted) identifier
+    """
+    name = re.escape(db_table.split('.')[-1])
+    pattern = rf'(?<![\w$])"?{name}"?(?![\w$])'
+
+    return re.search(pattern, sql_query, flags=re.IGNORECASE) is not None
+
+
+def discover_dependencies(materialized_view):
+    """
+    Finds the materialized views that the given view selects from.
+
+    The catalog (pg_depend / pg_rewrite) is used when the view exists in the database,
+    otherwise (or for views kept as tables) the SQL query is searched for the table names of the other views.
+
+    :param materialized_view: MaterializedView instance
+    :return: list of MaterializedView instances
+    """
+    from dj_materialized_views.models import MaterializedView
+
+    candidates = MaterializedView.objects.exclude(pk=materialized_view.pk)
+
+    if get_relation_kind(materialized_view.db_table) in ('v', 'm'):
+        source_names = set()
+        for schema, name, _ in get_source_relations(materialized_view.db_table):
+            source_names.update({name, f'{schema}.{name}'})
+
+        return [mv for mv in candidates if mv.db_table in source_names]
+
+    return [mv for mv in candidates if references_table(materialized_view.sql_query, mv.db_table)]
+
+
+def topological_levels(materialized_views):
+    """
+    Groups the materialized views into levels, so that every view comes after all the views it depends on.
+    Views on the same level do not depend on each other and can be refreshed in parallel.
+    Only the dependencies between the given views are taken into account.
+
+    :param materialized_views: iterable of MaterializedView instances
+    :return: list of lists of MaterializedView instances
+    """
+    from dj_materialized_views.models import MaterializedView
+
+    views = {mv.pk: mv for mv in materialized_views}
+    pending = {pk: set() for pk in views}
+
+    # all the dependencies in one query
+    dependencies = MaterializedView.depends_on.through.objects.filter(
+        from_materializedview__in=list(views), to_materializedview__in=list(views)
+    ).values_list('from_materializedview_id', 'to_materializedview_id')
+    for pk, dependency_pk in dependencies:
+        pending[pk].add(dependency_pk)
+
+    levels = []
+    while pending:
+        level = sorted(pk for pk, dependencies in pending.items() if not dependencies)
+        if not level:
+            titles = ', '.join(str(views[pk]) for pk in sorted(pending))
+            raise ValueError(f'Circular dependency between materialized views: {titles}')
+
+        levels.append([views[pk] for pk in level])
+        for pk in level:
+            del pending[pk]
+        for dependencies in pending.values():
+            dependencies.difference_update(level)
+
+    return levels
+
+
+def get_dependents(materialized_views):
+    """
+    Returns the given materialized views together with all views that transitively depend on them
+    """
+    from dj_materialized_views.models import MaterializedView
+
+    collected = {mv.pk: mv for mv in materialized_views}
+    frontier = set(collected)
+
+    while frontier:
+        dependents = MaterializedView.objects.filter(depends_on__in=frontier).exclude(pk__in=collected).distinct()
+        frontier = set()
+        for mv in dependents:
+            collected[mv.pk] = mv
+            frontier.add(mv.pk)
+
+    return list(collected.values())
+
+
+def get_sources(materialized_views):
+    """
+    Returns the given materialized views together with all views that they transitively depend on
+    """
+    from dj_materialized_views.models import MaterializedView
+
+    collected = {mv.pk: mv for mv in materialized_views}
+    frontier = set(collected)
+
+    while frontier:
+        sources = MaterializedView.objects.filter(dependents__in=frontier).exclude(pk__in=collected).distinct()
+        frontier = set()
+        for mv in sources:
+            collected[mv.pk] = mv
+            frontier.add(mv.pk)
+
+    return list(collected.values())
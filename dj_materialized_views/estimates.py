@@ -0,0 +1,62 @@
+"""
+Planner estimates of the queries of the materialized views. The query is planned with EXPLAIN, never run,
+the estimates guard against creating or refreshing views that would run for hours
+"""
+import json
+
+from django.db import DatabaseError
+
+from dj_materialized_views.conf import get_setting
+from dj_materialized_views.utils import atomic, fetch_raw_sql
+
+
+def explain(sql_query):
+    """
+    Returns the planner estimate of the result of the query, or None when the query cannot be planned,
+    e.g. when it selects from a materialized view that does not exist yet
+
+    :param sql_query: SQL query of the view
+    :return: dict with rows, width (average size of a row in bytes) and cost (total cost in planner units)
+    """
+    try:
+        with atomic():
+            plan = fetch_raw_sql(f'EXPLAIN (FORMAT JSON) {sql_query.strip().rstrip(";")}\n')[0][0]
+    except DatabaseError:
+        return None
+
+    if isinstance(plan, str):
+        plan = json.loads(plan)
+    node = plan[0]['Plan']
+
+    return {'rows': int(node['Plan Rows']), 'width': int(node['Plan Width']), 'cost': float(node['Total Cost'])}
+
+
+def has_limits():
+    """
+    Checks if MATERIALIZED_VIEWS_MAX_ESTIMATED_COST or MATERIALIZED_VIEWS_MAX_ESTIMATED_ROWS is set
+    """
+    return get_setting('MAX_ESTIMATED_COST') is not None or get_setting('MAX_ESTIMATED_ROWS') is not None
+
+
+def get_exceeded_limit(materialized_view):
+    """
+    Returns why the stored estimate of the view is above the limits, or None when it is within the limits,
+    was approved or is unknown
+
+    :param materialized_view: MaterializedView instance with an up to date estimate
+    """
+    cost, rows = materialized_view.estimated_cost, materialized_view.estimated_rows
+    if cost is None:
+        return None
+
+    approved_cost = materialized_view.approved_cost
+    if approved_cost is not None and cost <= approved_cost:
+        return None
+
+    max_cost, max_rows = get_setting('MAX_ESTIMATED_COST'), get_setting('MAX_ESTIMATED_ROWS')
+    if max_cost is not None and cost > max_cost:
+        return f'Estimated cost {cost:.0f} is above the limit of {max_cost:.0f}'
+    if max_rows is not None and rows > max_rows:
+        return f'Estimated {rows} rows are above the limit of {max_rows}'
+
+    return None
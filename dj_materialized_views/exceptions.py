@@ -0,0 +1,26 @@
+class MaterializedViewRefreshError(Exception):
+    """
+    Raised when one or more materialized views could not be refreshed
+    """
+
+    def __init__(self, results):
+        self.results = [result for result in results if not result.succeeded]
+        errors = '; '.join(f'{result.materialized_view}: {result.error}' for result in self.results)
+        super().__init__(f'Failed to refresh {len(self.results)} materialized view(s): {errors}')
+
+
+class IncrementalQueryNotSupported(ValueError):
+    """
+    Raised when the SQL query of a materialized view cannot be maintained incrementally
+    """
+
+
+class MaterializedViewCostExceeded(Exception):
+    """
+    Raised instead of creating or refreshing a materialized view whose query is estimated by the planner above
+    MATERIALIZED_VIEWS_MAX_ESTIMATED_COST or MATERIALIZED_VIEWS_MAX_ESTIMATED_ROWS, unless its cost was approved
+    """
+
+    def __init__(self, materialized_view, reason):
+        self.materialized_view = materialized_view
+        super().__init__(f'{reason}, approve the estimated cost of the view to run it anyway')
@@ -0,0 +1,240 @@
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+from django.db import connections
+from django_celery_beat.models import PeriodicTask, PeriodicTasks
+
+from dj_materialized_views.conf import get_setting
+from dj_materialized_views.dependencies import get_dependents, topological_levels
+
+
+class RefreshResult:
+    """
+    Outcome of running an operation on a single materialized view
+    """
+
+    def __init__(self, materialized_view, error=None, duration=None, skipped=False):
+        self.materialized_view = materialized_view
+        self.error = error
+        self.duration = duration
+        self.skipped = skipped
+
+    def __repr__(self):
+        status = 'skipped' if self.skipped else 'ok' if self.succeeded else f'error: {self.error}'
+        return f'<RefreshResult {self.materialized_view} {status}>'
+
+    @property
+    def succeeded(self):
+        return self.error is None
+
+
+class RefreshExecutor:
+    """
+    Runs an operation (refresh by default) on many materialized views at once.
+
+    Every worker thread uses its own database connection, so at most `workers` connections are open
+    at the same time. The views are processed in topological order: a view starts only after all the
+    views it depends on are done, and it is skipped if one of them failed.
+    A failing view does not stop the others; the outcome of each view is reported in the results.
+    """
+
+    def __init__(self, workers=None):
+        self.workers = workers or get_setting('REFRESH_WORKERS')
+
+    def refresh(self, materialized_views, cascade=False, trigger=None, force=False):
+        """
+        Refreshes the materialized views
+
+        :param materialized_views: iterable of MaterializedView instances
+        :param cascade: also refresh all the views that depend on the given views
+        :param trigger: MaterializedViewRefreshLog.Trigger of the given views, the dependents
+            are logged as cascade refreshes
+        :param force: refresh even the views whose source tables did not change
+        :return: list of RefreshResult
+        """
+        from dj_materialized_views.models import MaterializedViewRefreshLog
+
+        materialized_views = list(materialized_views)
+        requested = {mv.pk for mv in materialized_views}
+        if cascade:
+            materialized_views = get_dependents(materialized_views)
+        materialized_views = prefetch_materialized_views(materialized_views)
+
+        def get_trigger(materialized_view):
+            return trigger if materialized_view.pk in requested else MaterializedViewRefreshLog.Trigger.CASCADE
+
+        results = self.run(materialized_views, lambda mv: mv.refresh(trigger=get_trigger(mv), force=force))
+
+        for result in results:
+            if result.skipped:
+                MaterializedViewRefreshLog.log_skipped(
+                    result.materialized_view, result.error, get_trigger(result.materialized_view)
+                )
+
+        return results
+
+    def run(self, materialized_views, func, reverse=False):
+        """
+        Calls the function for every materialized view
+
+        :param materialized_views: iterable of MaterializedView instances
+        :param func: callable that receives a MaterializedView instance
+        :param reverse: process the views before the views they depend on, e.g. to drop them.
+            A view is then skipped if one of its dependents failed
+        :return: list of RefreshResult, in the order the views were processed
+        """
+        results = []
+        failed = set()
+
+        levels = topological_levels(materialized_views)
+        for level in reversed(levels) if reverse else levels:
+            runnable = []
+            for materialized_view in level:
+                related = materialized_view.dependents if reverse else materialized_view.depends_on
+                failed_sources = failed and [mv for mv in related.all() if mv.pk in failed]
+                if failed_sources:
+                    failed.add(materialized_view.pk)
+                    kind = 'dependent' if reverse else 'source'
+                    error = f'Skipped, {kind} view {failed_sources[0]} failed'
+                    results.append(RefreshResult(materialized_view, error=error, skipped=True))
+                else:
+                    runnable.append(materialized_view)
+
+            for result in self._run_level(runnable, func):
+                if not result.succeeded:
+                    failed.add(result.materialized_view.pk)
+                results.append(result)
+
+        return results
+
+    def _run_level(self, level, func):
+        if self.workers == 1 or len(level) <= 1:
+            return [self._run_one(materialized_view, func) for materialized_view in level]
+
+        def run_in_thread(materialized_view):
+            try:
+                return self._run_one(materialized_view, func)
+            finally:
+                connections.close_all()  # connections are per thread, do not leak them
+
+        with ThreadPoolExecutor(max_workers=min(len(level), self.workers)) as executor:
+            return list(executor.map(run_in_thread, level))
+
+    @staticmethod
+    def _run_one(materialized_view, func):
+        start = time.monotonic()
+        try:
+            func(materialized_view)
+        except Exception as e:
+            return RefreshResult(materialized_view, error=e, duration=time.monotonic() - start)
+
+        return RefreshResult(materialized_view, duration=time.monotonic() - start)
+
+
+def refresh_materialized_views(materialized_views, workers=None, cascade=False, trigger=None, force=False):
+    """
+    Refreshes many materialized views in parallel, see RefreshExecutor
+
+    Example:
+
+        results = refresh_materialized_views(MaterializedView.objects.all(), workers=8)
+        failed = [result for result in results if not result.succeeded]
+
+    :param materialized_views: iterable of MaterializedView instances
+    :param workers: number of views refreshed at the same time, defaults to MATERIALIZED_VIEWS_REFRESH_WORKERS
+    :param cascade: also refresh all the views that depend on the given views
+    :param trigger: MaterializedViewRefreshLog.Trigger, recorded in the refresh log
+    :param force: refresh even the views whose source tables did not change
+    :return: list of RefreshResult
+    """
+    return RefreshExecutor(workers=workers).refresh(materialized_views, cascade=cascade, trigger=trigger,
+                                                    force=force)
+
+
+def prefetch_materialized_views(materialized_views):
+    """
+    Loads the materialized views with their periodic tasks, indexes and dependencies in a fixed number of
+    queries, instead of a few queries per view during the bulk operations
+
+    :param materialized_views: iterable of MaterializedView instances
+    :return: list of MaterializedView instances
+    """
+    from dj_materialized_views.models import MaterializedView
+
+    return list(
+        MaterializedView.objects.filter(pk__in=[mv.pk for mv in materialized_views])
+        .select_related('periodic_task')
+        .prefetch_related('indexes', 'depends_on', 'dependents')
+    )
+
+
+def set_periodic_refresh(materialized_views, enabled):
+    """
+    Enables or disables the periodic tasks of the materialized views in one query.
+    Queryset updates do not send signals, celery beat is notified about the change explicitly
+    """
+    task_ids = [mv.periodic_task_id for mv in materialized_views]
+    if not task_ids:
+        return
+
+    PeriodicTask.objects.filter(pk__in=task_ids).exclude(enabled=enabled).update(enabled=enabled)
+    PeriodicTasks.update_changed()
+
+    for materialized_view in materialized_views:
+        materialized_view.periodic_task.enabled = enabled
+
+
+def create_materialized_views(materialized_views, workers=None, trigger=None):
+    """
+    Creates many materialized views with their indexes in parallel, after the views they depend on.
+    A failing view does not stop the others, the views that select from it are skipped.
+    The periodic tasks of the created views are enabled at once
+
+    :param materialized_views: iterable of MaterializedView instances
+    :param workers: number of views created at the same time, defaults to MATERIALIZED_VIEWS_REFRESH_WORKERS
+    :param trigger: MaterializedViewRefreshLog.Trigger, recorded in the refresh log
+    :return: list of RefreshResult
+    """
+    results = RefreshExecutor(workers=workers).run(
+        prefetch_materialized_views(materialized_views),
+        lambda mv: mv.create(trigger=trigger, enable_periodic_refresh=False)
+    )
+    set_periodic_refresh([result.materialized_view for result in results if result.succeeded], True)
+
+    return results
+
+
+def drop_materialized_views(materialized_views, workers=None):
+    """
+    Drops many materialized views in parallel, before the views they depend on.
+    A failing view does not stop the others, the views it selects from are skipped.
+    The periodic tasks of the dropped views are disabled at once
+
+    :param materialized_views: iterable of MaterializedView instances
+    :param workers: number of views dropped at the same time, defaults to MATERIALIZED_VIEWS_REFRESH_WORKERS
+    :return: list of RefreshResult
+    """
+    results = RefreshExecutor(workers=workers).run(
+        prefetch_materialized_views(materialized_views),
+        lambda mv: mv.drop(disable_periodic_refresh=False),
+        reverse=True
+    )
+    set_periodic_refresh([result.materialized_view for result in results if result.succeeded], False)
+
+    return results
+
+
+def delete_materialized_views(materialized_views, workers=None):
+    """
+    Drops the materialized views and deletes them with their periodic tasks, see drop_materialized_views.
+    The views that failed to drop are kept
+
+    :return: list of RefreshResult
+    """
+    results = drop_materialized_views(materialized_views, workers=workers)
+
+    # the views are deleted together with their periodic tasks
+    task_ids = [result.materialized_view.periodic_task_id for result in results if result.succeeded]
+    PeriodicTask.objects.filter(pk__in=task_ids).delete()
+
+    return results
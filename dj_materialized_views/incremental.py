@@ -0,0 +1,570 @@
+"""
+Incremental maintenance of materialized views kept as plain tables.
+
+Supported queries aggregate a single table, or inner joined tables, with GROUP BY:
+
+    SELECT key, count(*) AS n, sum(x) AS total FROM events WHERE x > 0 GROUP BY key
+
+Statement level triggers capture the changed rows of every source table into a delta table.
+A refresh moves the pending deltas out of the delta tables, aggregates them with a sign
+(+1 inserted, -1 deleted) and merges the result into the table:
+
+    * count and sum are adjusted by the signed deltas
+    * avg is kept as hidden sum and count columns
+    * min and max are adjusted for inserted rows, groups with deleted rows are recomputed
+    * groups whose row count drops to zero are deleted
+
+Everything else falls back to a full recompute: queries that cannot be parsed, changes in more than
+one joined table at once, and truncated source tables.
+"""
+import re
+
+from dj_materialized_views.dependencies import relation_exists
+from dj_materialized_views.exceptions import IncrementalQueryNotSupported
+from dj_materialized_views.utils import atomic_repeatable_read, execute_raw_sql, fetch_raw_sql
+
+AGGREGATES = ('count', 'sum', 'min', 'max', 'avg')
+
+SIGN = '__mv_sign'
+COUNT = '__mv_count'
+HAS_DELETE = '__mv_has_delete'
+TARGET = '__mv_t'
+DELTA = '__mv_d'
+AGGREGATED_DELTA = '__mv_aggregated_delta'
+
+UNSUPPORTED_KEYWORDS = r'\b(HAVING|ORDER|LIMIT|OFFSET|FETCH|UNION|INTERSECT|EXCEPT|DISTINCT|WINDOW|OVER|FILTER|' \
+                       r'LEFT|RIGHT|FULL|CROSS|NATURAL|LATERAL|USING|WITH)\b'
+
+
+def _mask(sql, parentheses=True):
+    """
+    Replaces string literals, quoted identifiers and (optionally) everything inside parentheses with spaces,
+    so that keywords and separators can be searched at the top level of the query. The length is preserved
+    """
+    masked = []
+    depth = 0
+    quote = None
+
+    for char in sql:
+        if quote:
+            masked.append(' ')
+            if char == quote:
+                quote = None
+        elif char in '\'"':
+            quote = char
+            masked.append(' ')
+        elif char == '(' and parentheses:
+            depth += 1
+            masked.append(' ')
+        elif char == ')' and parentheses:
+            depth -= 1
+            masked.append(' ')
+        else:
+            masked.append(char if depth == 0 else ' ')
+
+    return ''.join(masked)
+
+
+def _mask_keywords(sql, parentheses=True):
+    """
+    Masks the query like _mask, and also the IS [NOT] DISTINCT FROM operator, which is not a DISTINCT or a FROM clause
+    """
+    return re.sub(r'\bIS\s+(NOT\s+)?DISTINCT\s+FROM\b', lambda match: ' ' * len(match.group()),
+                  _mask(sql, parentheses), flags=re.IGNORECASE)
+
+
+def _split(sql, pattern):
+    """
+    Splits the sql at the top level matches of the regex pattern
+    """
+    parts = []
+    start = 0
+    for match in re.finditer(pattern, _mask(sql), flags=re.IGNORECASE):
+        parts.append(sql[start:match.start()].strip())
+        start = match.end()
+    parts.append(sql[start:].strip())
+
+    return parts
+
+
+def _normalize(expression):
+    return re.sub(r'\s+', ' ', expression.strip()).lower()
+
+
+def _column_name(name):
+    return name.strip().strip('"')
+
+
+class Aggregate:
+    def __init__(self, function, argument, name):
+        self.function = function
+        self.argument = argument
+        self.name = name
+
+    @property
+    def hidden_count(self):
+        """
+        Column with the count of non null values, needed to maintain sum and avg
+        """
+        return f'__mv_count_{self.name.lower()}'
+
+    @property
+    def hidden_sum(self):
+        """
+        Column with the sum of the values, needed to maintain avg
+        """
+        return f'__mv_sum_{self.name.lower()}'
+
+    def not_null_sign(self, sign):
+        if self.argument == '*':
+            return sign
+        return f'CASE WHEN ({self.argument}) IS NOT NULL THEN {sign} ELSE 0 END'
+
+
+class Source:
+    def __init__(self, table, alias=None, condition=None):
+        self.table = table
+        self.alias = alias
+        self.condition = condition
+
+    @property
+    def reference(self):
+        """
+        Name used by the query to reference the columns of the table
+        """
+        return self.alias or self.table.split('.')[-1]
+
+    def sql(self, table=None):
+        return f'{table or self.table} AS {self.reference}'
+
+
+class IncrementalQuery:
+    """
+    Parsed aggregate query that can be maintained incrementally.
+    Raises IncrementalQueryNotSupported for other queries
+    """
+
+    def __init__(self, sql_query):
+        sql = sql_query.strip().rstrip(';').strip()
+        self.sql = sql
+
+        if re.search(UNSUPPORTED_KEYWORDS, _mask_keywords(sql, parentheses=False), flags=re.IGNORECASE):
+            raise IncrementalQueryNotSupported('Only SELECT ... FROM ... [INNER JOIN] [WHERE] GROUP BY is supported')
+        if len(re.findall(r'\bSELECT\b', _mask(sql, parentheses=False), flags=re.IGNORECASE)) != 1:
+            raise IncrementalQueryNotSupported('Subqueries are not supported')
+
+        match = re.match(
+            r'^\s*SELECT\s(?P<select>.*)\sFROM\s(?P<from>.*?)(?:\sWHERE\s(?P<where>.*))?\sGROUP\s+BY\s(?P<group>.*)$',
+            _mask_keywords(sql), flags=re.IGNORECASE | re.DOTALL
+        )
+        if not match:
+            raise IncrementalQueryNotSupported('The query must have a GROUP BY clause')
+
+        def clause(name):
+            return sql[match.start(name):match.end(name)].strip() if match.group(name) else None
+
+        self.where = clause('where')
+        self.sources = self._parse_sources(clause('from'))
+        items = self._parse_select(clause('select'))
+        self.keys, self.aggregates = self._parse_groups(items, _split(clause('group'), ','))
+
+    @staticmethod
+    def _parse_sources(from_clause):
+        if ',' in _mask(from_clause):
+            raise IncrementalQueryNotSupported('Use explicit INNER JOIN ... ON instead of comma joins')
+
+        sources = []
+        for i, part in enumerate(_split(from_clause, r'\b(?:INNER\s+)?JOIN\b')):
+            match = re.match(
+                r'^(?P<table>[\w."]+)(?:\s+(?:AS\s+)?(?P<alias>(?!ON\b)[\w"]+))?(?:\s+ON\s+(?P<condition>.+))?$',
+                part, flags=re.IGNORECASE | re.DOTALL
+            )
+            if not match or (i > 0) != bool(match.group('condition')):
+                raise IncrementalQueryNotSupported(f'Unsupported FROM clause: {part}')
+            sources.append(Source(match.group('table'), match.group('alias'), match.group('condition')))
+
+        tables = [source.table.lower() for source in sources]
+        if len(set(tables)) != len(tables):
+            raise IncrementalQueryNotSupported('Self joins are not supported')
+
+        return sources
+
+    @staticmethod
+    def _parse_select(select_clause):
+        items = []
+        for item in _split(select_clause, ','):
+            parts = _split(item, r'\bAS\b')
+            expression, name = (parts[0], parts[-1]) if len(parts) > 1 else (item, None)
+            items.append((expression, name))
+
+        return items
+
+    @staticmethod
+    def _parse_groups(items, group_by):
+        # GROUP BY 1, 2 references the select list
+        group_by = [items[int(key) - 1][0] if key.isdigit() else key for key in group_by]
+        group_expressions = {_normalize(key) for key in group_by}
+
+        keys = []
+        aggregates = []
+        for expression, name in items:
+            match = re.match(r'^(?P<function>\w+)\s*\((?P<argument>.*)\)$', expression, flags=re.DOTALL)
+            function = match and match.group('function').lower()
+
+            if function in AGGREGATES and _mask(expression).strip().lower() == function:
+                argument = match.group('argument').strip()
+                if argument == '*' and function != 'count':
+                    raise IncrementalQueryNotSupported(f'Unsupported aggregate: {expression}')
+                aggregates.append(Aggregate(function, argument, _column_name(name or function)))
+            elif _normalize(expression) in group_expressions:
+                keys.append((expression, _column_name(name or expression.split('.')[-1])))
+            else:
+                raise IncrementalQueryNotSupported(f'Only GROUP BY keys and {", ".join(AGGREGATES)} are supported, '
+                                                   f'found: {expression}')
+
+        if len(keys) != len(group_expressions):
+            raise IncrementalQueryNotSupported('All the GROUP BY keys must be selected')
+        if not aggregates:
+            raise IncrementalQueryNotSupported('At least one aggregate is required')
+
+        names = [name for _, name in keys] + [aggregate.name for aggregate in aggregates]
+        if len(set(names)) != len(names):
+            raise IncrementalQueryNotSupported('Every selected column needs a unique name, use AS')
+
+        return keys, aggregates
+
+    def get_used_columns(self, columns):
+        """
+        Returns the columns whose names appear in the query, the columns of a source table that the query may use
+        """
+        identifiers = {
+            quoted or name.lower()
+            for quoted, name in re.findall(r'"([^"]+)"|\b([a-z_]\w*)', self.sql, flags=re.IGNORECASE)
+        }
+
+        return [column for column in columns if column in identifiers]
+
+    @property
+    def key_names(self):
+        return [name for _, name in self.keys]
+
+    @property
+    def has_min_max(self):
+        return any(aggregate.function in ('min', 'max') for aggregate in self.aggregates)
+
+    def _from(self, changed=None, batch_table=None):
+        sql = ''
+        for source in self.sources:
+            table = batch_table if source is changed else None
+            if not sql:
+                sql = source.sql(table)
+            else:
+                sql += f' JOIN {source.sql(table)} ON {source.condition}'
+        return sql
+
+    def _query(self, columns, changed=None, batch_table=None, extra_condition=None):
+        conditions = [f'({condition})' for condition in (self.where, extra_condition) if condition]
+        where = f' WHERE {" AND ".join(conditions)}' if conditions else ''
+        group_by = ', '.join(expression for expression, _ in self.keys)
+
+        return f'SELECT {", ".join(columns)} FROM {self._from(changed, batch_table)}{where} GROUP BY {group_by}'
+
+    @property
+    def columns(self):
+        """
+        Columns of the table: the selected ones followed by the hidden ones used for the maintenance
+        """
+        columns = self.key_names + [aggregate.name for aggregate in self.aggregates] + [COUNT]
+        for aggregate in self.aggregates:
+            if aggregate.function == 'avg':
+                columns.append(aggregate.hidden_sum)
+            if aggregate.function in ('sum', 'avg'):
+                columns.append(aggregate.hidden_count)
+        return columns
+
+    def full_query(self, extra_condition=None):
+        """
+        Query that computes the whole table, or the groups matching the extra condition
+        """
+        columns = [f'{expression} AS {name}' for expression, name in self.keys]
+        columns += [f'{a.function}({a.argument}) AS {a.name}' for a in self.aggregates]
+        columns.append(f'count(*) AS {COUNT}')
+        for aggregate in self.aggregates:
+            if aggregate.function == 'avg':
+                columns.append(f'sum({aggregate.argument}) AS {aggregate.hidden_sum}')
+            if aggregate.function in ('sum', 'avg'):
+                columns.append(f'count({aggregate.argument}) AS {aggregate.hidden_count}')
+
+        return self._query(columns, extra_condition=extra_condition)
+
+    def delta_query(self, changed, batch_table):
+        """
+        Query that aggregates the signed changed rows of one source table
+        """
+        sign = f'{changed.reference}.{SIGN}'
+
+        columns = [f'{expression} AS {name}' for expression, name in self.keys]
+        for aggregate in self.aggregates:
+            if aggregate.function == 'count':
+                columns.append(f'sum({aggregate.not_null_sign(sign)}) AS {aggregate.name}')
+            elif aggregate.function == 'sum':
+                columns.append(f'sum(({aggregate.argument}) * {sign}) AS {aggregate.name}')
+            elif aggregate.function == 'avg':
+                columns.append(f'sum(({aggregate.argument}) * {sign}) AS {aggregate.hidden_sum}')
+            else:  # min, max of the inserted rows, groups with deleted rows are recomputed
+                columns.append(f'{aggregate.function}({aggregate.argument}) FILTER (WHERE {sign} > 0) '
+                               f'AS {aggregate.name}')
+            if aggregate.function in ('sum', 'avg'):
+                columns.append(f'sum({aggregate.not_null_sign(sign)}) AS {aggregate.hidden_count}')
+        columns.append(f'sum({sign}) AS {COUNT}')
+        columns.append(f'bool_or({sign} < 0) AS {HAS_DELETE}')
+
+        return self._query(columns, changed=changed, batch_table=batch_table)
+
+
+def parse(sql_query):
+    """
+    Returns the parsed query, or None if the query cannot be maintained incrementally
+    """
+    try:
+        return IncrementalQuery(sql_query)
+    except IncrementalQueryNotSupported:
+        return None
+
+
+def get_delta_table(materialized_view, source_index):
+    return f'{materialized_view.db_table}__delta_{source_index}'
+
+
+def get_delta_function(materialized_view, source_index):
+    return f'{materialized_view.db_table}__capture_{source_index}'
+
+
+def get_source_tables(materialized_view):
+    """
+    Returns the tables of the FROM clause, or an empty list for unsupported queries
+    """
+    query = parse(materialized_view.sql_query)
+
+    return [source.table for source in query.sources] if query else []
+
+
+def get_capture_columns(query, table):
+    """
+    Returns the quoted names of the columns of the source table that the query uses, in table order
+    """
+    rows = fetch_raw_sql('SELECT attname, quote_ident(attname) FROM pg_attribute '
+                         'WHERE attrelid = %s::regclass AND attnum > 0 AND NOT attisdropped ORDER BY attnum;',
+                         [table])
+    used = set(query.get_used_columns([name for name, _ in rows]))
+
+    return [quoted for name, quoted in rows if name in used]
+
+
+def _install_capture(materialized_view, query, source_index, table):
+    """
+    Creates the delta table and the triggers that copy the changed rows of the source table into it.
+    Only the columns that the query uses are captured, columns can be added to or dropped from the
+    source table without breaking its writes, unless the query uses them
+    """
+    delta_table = get_delta_table(materialized_view, source_index)
+    function = get_delta_function(materialized_view, source_index)
+    columns = ''.join(f'{column}, ' for column in get_capture_columns(query, table))
+
+    execute_raw_sql(f'CREATE TABLE IF NOT EXISTS {delta_table} AS '
+                    f'SELECT {columns}1::smallint AS {SIGN} FROM {table} WITH NO DATA;')
+    # a truncate cannot be captured row by row, a zero sign row requests a full recompute
+    execute_raw_sql(f"""
+        CREATE OR REPLACE FUNCTION {function}() RETURNS trigger AS $$
+        BEGIN
+            IF TG_OP = 'TRUNCATE' THEN
+                INSERT INTO {delta_table} ({SIGN}) VALUES (0);
+                RETURN NULL;
+            END IF;
+            IF TG_OP IN ('UPDATE', 'DELETE') THEN
+                INSERT INTO {delta_table} ({columns}{SIGN}) SELECT {columns}-1 FROM __mv_old_rows;
+            END IF;
+            IF TG_OP IN ('INSERT', 'UPDATE') THEN
+                INSERT INTO {delta_table} ({columns}{SIGN}) SELECT {columns}1 FROM __mv_new_rows;
+            END IF;
+            RETURN NULL;
+        END;
+        $$ LANGUAGE plpgsql;
+    """)
+
+    triggers = {
+        'insert': 'INSERT ON {table} REFERENCING NEW TABLE AS __mv_new_rows',
+        'update': 'UPDATE ON {table} REFERENCING OLD TABLE AS __mv_old_rows NEW TABLE AS __mv_new_rows',
+        'delete': 'DELETE ON {table} REFERENCING OLD TABLE AS __mv_old_rows',
+        'truncate': 'TRUNCATE ON {table}',
+    }
+    for operation, event in triggers.items():
+        trigger = f'{function}_{operation}'
+        execute_raw_sql(f'DROP TRIGGER IF EXISTS {trigger} ON {table};')
+        execute_raw_sql(f'CREATE TRIGGER {trigger} AFTER {event.format(table=table)} '
+                        f'FOR EACH STATEMENT EXECUTE PROCEDURE {function}();')
+
+
+def create(materialized_view):
+    """
+    Creates the table with the result of the query and starts capturing the changes of the source tables
+    """
+    query = parse(materialized_view.sql_query)
+    db_table = f'{materialized_view.db_table}{materialized_view.get_storage_sql()}'
+
+    if query is None:
+        execute_raw_sql(f'CREATE TABLE IF NOT EXISTS {db_table} AS {materialized_view.sql_query}')
+        return
+
+    with atomic_repeatable_read():
+        # no writes between the initial population and the installation of the triggers
+        execute_raw_sql(f'LOCK TABLE {", ".join(source.table for source in query.sources)} IN SHARE MODE;')
+
+        for i, source in enumerate(query.sources):
+            _install_capture(materialized_view, query, i, source.table)
+
+        execute_raw_sql(f'CREATE TABLE IF NOT EXISTS {db_table} AS {query.full_query()}')
+
+
+def drop(materialized_view):
+    """
+    Drops the table, the delta tables and the capture triggers.
+    The delta tables are looked up in the database, the query may have changed since they were created
+    """
+    i = 0
+    while relation_exists(get_delta_table(materialized_view, i)):
+        function = get_delta_function(materialized_view, i)
+        execute_raw_sql(f'DROP FUNCTION IF EXISTS {function}() CASCADE;')  # drops the triggers as well
+        execute_raw_sql(f'DROP TABLE {get_delta_table(materialized_view, i)};')
+        i += 1
+
+    execute_raw_sql(f'DROP TABLE IF EXISTS {materialized_view.db_table};')
+
+
+def _recompute_all(materialized_view, query_sql):
+    """
+    Replaces the content of the table, readers see the old content until the transaction commits
+    """
+    execute_raw_sql(f'DELETE FROM {materialized_view.db_table};')
+    execute_raw_sql(f'INSERT INTO {materialized_view.db_table} {query_sql}')
+
+
+def refresh(materialized_view):
+    """
+    Merges the captured changes into the table, or recomputes the whole table when the changes
+    cannot be merged. All the statements see the same snapshot, so no change is applied twice or lost
+    """
+    query = parse(materialized_view.sql_query)
+
+    with atomic_repeatable_read():
+        materialized_view.apply_session_settings()
+
+        if query is None:
+            return _recompute_all(materialized_view, materialized_view.sql_query)
+
+        changed = []
+        full_recompute = False
+        for i, source in enumerate(query.sources):
+            batch_table = f'__mv_batch_{i}'
+            execute_raw_sql(f'DROP TABLE IF EXISTS {batch_table};')
+            execute_raw_sql(f'CREATE TEMPORARY TABLE {batch_table} ON COMMIT DROP AS '
+                            f'SELECT * FROM {get_delta_table(materialized_view, i)} WITH NO DATA;')
+            execute_raw_sql(f'WITH moved AS (DELETE FROM {get_delta_table(materialized_view, i)} RETURNING *) '
+                            f'INSERT INTO {batch_table} SELECT * FROM moved;')
+
+            signs = {sign for sign, in fetch_raw_sql(f'SELECT DISTINCT {SIGN} FROM {batch_table};')}
+            if signs:
+                changed.append((source, batch_table))
+            if 0 in signs:
+                full_recompute = True  # the source table was truncated
+
+        if not changed:
+            return
+
+        if full_recompute or len(changed) > 1:
+            return _recompute_all(materialized_view, query.full_query())
+
+        _merge(materialized_view, query, *changed[0])
+
+
+def _merge(materialized_view, query, changed, batch_table):
+    table = materialized_view.db_table
+    keys = query.key_names
+    key_match = ' AND '.join(f'{TARGET}.{key} = {DELTA}.{key}' for key in keys)
+    null_key = ' OR '.join(f'{DELTA}.{key} IS NULL' for key in keys)
+    # groups that are recomputed from the source tables: NULL keys cannot be matched with =,
+    # min and max cannot be maintained when rows are deleted
+    recompute = f'({null_key}) OR {DELTA}.{HAS_DELETE}' if query.has_min_max else f'({null_key})'
+
+    execute_raw_sql(f'DROP TABLE IF EXISTS {AGGREGATED_DELTA};')
+    execute_raw_sql(f'CREATE TEMPORARY TABLE {AGGREGATED_DELTA} ON COMMIT DROP AS '
+                    f'{query.delta_query(changed, batch_table)}')
+
+    def total(column):
+        return f'{TARGET}.{column} + {DELTA}.{column}'
+
+    def coalesced_total(column):
+        return f'coalesce({TARGET}.{column}, 0) + coalesce({DELTA}.{column}, 0)'
+
+    updates = [f'{COUNT} = {total(COUNT)}']
+    inserts = [f'{DELTA}.{key}' for key in keys]
+    for aggregate in query.aggregates:
+        name = aggregate.name
+        if aggregate.function == 'count':
+            updates.append(f'{name} = {total(name)}')
+            inserts.append(f'{DELTA}.{name}')
+        elif aggregate.function == 'sum':
+            updates.append(f'{name} = CASE WHEN {total(aggregate.hidden_count)} = 0 THEN NULL '
+                           f'ELSE {coalesced_total(name)} END')
+            inserts.append(f'CASE WHEN {DELTA}.{aggregate.hidden_count} = 0 THEN NULL ELSE {DELTA}.{name} END')
+        elif aggregate.function == 'avg':
+            updates.append(f'{name} = ({coalesced_total(aggregate.hidden_sum)})::numeric '
+                           f'/ NULLIF({total(aggregate.hidden_count)}, 0)')
+            inserts.append(f'{DELTA}.{aggregate.hidden_sum}::numeric / NULLIF({DELTA}.{aggregate.hidden_count}, 0)')
+        else:
+            combine = 'LEAST' if aggregate.function == 'min' else 'GREATEST'
+            updates.append(f'{name} = CASE WHEN {DELTA}.{HAS_DELETE} THEN {TARGET}.{name} '
+                           f'ELSE {combine}({TARGET}.{name}, {DELTA}.{name}) END')
+            inserts.append(f'{DELTA}.{name}')
+    inserts.append(f'{DELTA}.{COUNT}')
+    for aggregate in query.aggregates:
+        if aggregate.function == 'avg':
+            updates.append(f'{aggregate.hidden_sum} = {coalesced_total(aggregate.hidden_sum)}')
+            inserts.append(f'{DELTA}.{aggregate.hidden_sum}')
+        if aggregate.function in ('sum', 'avg'):
+            updates.append(f'{aggregate.hidden_count} = {total(aggregate.hidden_count)}')
+            inserts.append(f'{DELTA}.{aggregate.hidden_count}')
+
+    # existing groups
+    execute_raw_sql(f'UPDATE {table} AS {TARGET} SET {", ".join(updates)} '
+                    f'FROM {AGGREGATED_DELTA} AS {DELTA} WHERE {key_match};')
+
+    # new groups
+    execute_raw_sql(f'INSERT INTO {table} ({", ".join(query.columns)}) '
+                    f'SELECT {", ".join(inserts)} FROM {AGGREGATED_DELTA} AS {DELTA} '
+                    f'WHERE {DELTA}.{COUNT} > 0 AND NOT ({recompute}) '
+                    f'AND NOT EXISTS (SELECT 1 FROM {table} AS {TARGET} WHERE {key_match});')
+
+    # groups without rows
+    execute_raw_sql(f'DELETE FROM {table} AS {TARGET} USING {AGGREGATED_DELTA} AS {DELTA} '
+                    f'WHERE {key_match} AND {TARGET}.{COUNT} <= 0;')
+
+    # recomputed groups
+    recomputed = fetch_raw_sql(f'SELECT bool_or({null_key}) FROM {AGGREGATED_DELTA} AS {DELTA} WHERE {recompute};')
+    if recomputed[0][0] is None:
+        return
+
+    not_distinct = ' AND '.join(f'{TARGET}.{key} IS NOT DISTINCT FROM {DELTA}.{key}' for key in keys)
+    execute_raw_sql(f'DELETE FROM {table} AS {TARGET} USING {AGGREGATED_DELTA} AS {DELTA} '
+                    f'WHERE ({recompute}) AND {not_distinct};')
+
+    key_expressions = [expression for expression, _ in query.keys]
+    if recomputed[0][0]:  # NULL keys, cannot use an index
+        condition = ' AND '.join(f'({expression}) IS NOT DISTINCT FROM {DELTA}.{key}'
+                                 for expression, key in zip(key_expressions, keys))
+        condition = f'EXISTS (SELECT 1 FROM {AGGREGATED_DELTA} AS {DELTA} WHERE ({recompute}) AND {condition})'
+    else:
+        condition = f'({", ".join(key_expressions)}) IN ' \
+                    f'(SELECT {", ".join(keys)} FROM {AGGREGATED_DELTA} AS {DELTA} WHERE {recompute})'
+
+    execute_raw_sql(f'INSERT INTO {table} ({", ".join(query.columns)}) {query.full_query(condition)}')
@@ -0,0 +1,30 @@
+import zlib
+from contextlib import contextmanager
+
+from dj_materialized_views.utils import execute_raw_sql, fetch_raw_sql
+
+# first key of the two key advisory locks, keeps the locks of the app apart from the other advisory locks
+LOCK_NAMESPACE = zlib.crc32(b'dj_materialized_views') & 0x7fffffff
+
+
+@contextmanager
+def refresh_lock(materialized_view):
+    """
+    Session level advisory lock that allows one refresh of the materialized view at a time,
+    across all the workers. Does not wait for the lock, yields whether it was acquired
+
+    Example:
+
+        with refresh_lock(materialized_view) as acquired:
+            if acquired:
+                ...
+    """
+    acquired = fetch_raw_sql(
+        'SELECT pg_try_advisory_lock(%s, %s);', [LOCK_NAMESPACE, materialized_view.pk]
+    )[0][0]
+
+    try:
+        yield acquired
+    finally:
+        if acquired:
+            execute_raw_sql('SELECT pg_advisory_unlock(%s, %s);', [LOCK_NAMESPACE, materialized_view.pk])
@@ -0,0 +1,80 @@
+import re
+
+from django.core.management.base import BaseCommand, CommandError
+from django.db.models import Q
+
+from dj_materialized_views.dependencies import topological_levels
+
+
+class MaterializedViewCommand(BaseCommand):
+    """
+    Base of the commands that run an operation on a selection of materialized views in the foreground,
+    without Celery. The command exits with a non-zero status when any of the views failed
+    """
+
+    def add_arguments(self, parser):
+        parser.add_argument('names', nargs='*', help='db_table or title of the materialized views')
+        parser.add_argument('--id', type=int, action='append', dest='ids', default=[],
+                            help='Id of a materialized view, can be repeated')
+        parser.add_argument('--tag', action='append', dest='tags', default=[],
+                            help='Select the views with this tag, can be repeated')
+        parser.add_argument('--all', action='store_true', help='Select all the materialized views')
+        parser.add_argument('--workers', type=int,
+                            help='Views processed at the same time, defaults to MATERIALIZED_VIEWS_REFRESH_WORKERS')
+        parser.add_argument('--dry-run', action='store_true', help='Only print what would be done')
+
+    def get_materialized_views(self, options):
+        """
+        Returns the materialized views selected by name, id, tag or all of them
+        """
+        from dj_materialized_views.models import MaterializedView
+
+        names, ids, tags = options['names'], options['ids'], options['tags']
+        if not (names or ids or tags or options['all']):
+            raise CommandError('Select the materialized views by name, --id, --tag or --all')
+
+        materialized_views = MaterializedView.objects.order_by('db_table')
+        if options['all']:
+            return list(materialized_views)
+
+        condition = Q(pk__in=ids) | Q(db_table__in=names) | Q(title__in=names)
+        for tag in tags:
+            condition |= Q(tags__iregex=rf'(^|,)\s*{re.escape(tag)}\s*(,|$)')
+        materialized_views = list(materialized_views.filter(condition))
+
+        found = {mv.db_table for mv in materialized_views} | {mv.title for mv in materialized_views}
+        missing = [name for name in names if name not in found]
+        missing += [str(pk) for pk in set(ids) - {mv.pk for mv in materialized_views}]
+        if missing:
+            raise CommandError(f'Unknown materialized views: {", ".join(missing)}')
+
+        return materialized_views
+
+    def print_plan(self, materialized_views, describe):
+        """
+        Prints the views in the order they would be processed, the views of a step run in parallel
+
+        :param describe: callable that returns what would be done with a view
+        """
+        for step, level in enumerate(topological_levels(materialized_views), start=1):
+            for materialized_view in level:
+                self.stdout.write(f'{step:>3}  {materialized_view.db_table:<40} {describe(materialized_view)}')
+
+    def report(self, results):
+        """
+        Prints the outcome and the duration of every view, raises CommandError when any of them failed
+        """
+        for result in results:
+            duration = '' if result.duration is None else f'{result.duration:.2f}s'
+            line = f'{result.materialized_view.db_table:<40} {duration:>10}'
+
+            if result.skipped:
+                self.stdout.write(self.style.WARNING(f'{line}  {result.error}'))
+            elif not result.succeeded:
+                self.stdout.write(self.style.ERROR(f'{line}  {result.error}'))
+            else:
+                self.stdout.write(self.style.SUCCESS(line))
+
+        failed = [result for result in results if not result.succeeded]
+        if failed:
+            raise CommandError(f'{len(failed)} of {len(results)} materialized view(s) failed')
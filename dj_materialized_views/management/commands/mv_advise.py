@@ -0,0 +1,34 @@
+from django.core.management.base import BaseCommand
+
+from dj_materialized_views.advisor import advise_all, get_statements_time_column
+from dj_materialized_views.models import MaterializedView
+
+
+class Command(BaseCommand):
+    help = 'Suggests the indexes of the materialized views to drop and to create, ' \
+           'based on the PostgreSQL usage statistics'
+
+    def add_arguments(self, parser):
+        parser.add_argument('db_tables', nargs='*', help='Only advise on these materialized views')
+        parser.add_argument('--min-scans', type=int, default=100,
+                            help='Minimum number of reads of a view before its indexes are judged')
+        parser.add_argument('--apply', action='store_true', help='Drop and create the suggested indexes')
+
+    def handle(self, *args, **options):
+        materialized_views = MaterializedView.objects.all()
+        if options['db_tables']:
+            materialized_views = materialized_views.filter(db_table__in=options['db_tables'])
+
+        if get_statements_time_column() is None:
+            self.stderr.write('pg_stat_statements is not available, only unused indexes are reported')
+
+        suggestions = advise_all(materialized_views, min_scans=options['min_scans'])
+        if not suggestions:
+            self.stdout.write('No suggestions')
+
+        for suggestion in suggestions:
+            self.stdout.write(str(suggestion))
+
+            if options['apply']:
+                index = suggestion.apply()
+                self.stdout.write(self.style.SUCCESS(f'  {suggestion.action}: {index.get_index_name()}'))
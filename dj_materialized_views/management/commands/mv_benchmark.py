@@ -0,0 +1,36 @@
+import json
+
+from django.core.management.base import BaseCommand
+
+from dj_materialized_views import benchmark
+
+
+class Command(BaseCommand):
+    help = 'Times the creation, refreshes, index builds and queries of a materialized view over synthetic data ' \
+           'at several scales and writes the results as JSON. Run it against a local database only'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--scales', type=int, nargs='+', default=[10000, 100000, 1000000],
+                            help='Numbers of rows of the generated source table')
+        parser.add_argument('--repeat', type=int, default=3, help='Runs of every operation')
+        parser.add_argument('--change-ratio', type=float, default=0.01,
+                            help='Share of the source rows updated before every refresh')
+        parser.add_argument('--seed', type=float, default=benchmark.SEED,
+                            help='Seed of the random data and change sets, between -1 and 1')
+        parser.add_argument('--label', default='', help='Recorded with the results, e.g. the release')
+        parser.add_argument('--output', help='JSON file of the results, printed when not set')
+
+    def handle(self, *args, **options):
+        results = benchmark.run(options['scales'], repeat=options['repeat'], change_ratio=options['change_ratio'],
+                                label=options['label'], seed=options['seed'])
+
+        for result in results['results']:
+            self.stderr.write(f'{result["rows"]:>10} {result["operation"]:<20} {result["strategy"]:<12} '
+                              f'{result["median"]:.4f}s')
+
+        output = json.dumps(results, indent=2)
+        if options['output']:
+            with open(options['output'], 'w') as f:
+                f.write(output)
+        else:
+            self.stdout.write(output)
@@ -0,0 +1,31 @@
+from dj_materialized_views.dependencies import relation_exists
+from dj_materialized_views.executor import create_materialized_views
+from dj_materialized_views.management.base import MaterializedViewCommand
+from dj_materialized_views.utils import using_database
+
+
+class Command(MaterializedViewCommand):
+    help = 'Creates the selected materialized views that do not exist yet, in parallel after the views they ' \
+           'depend on. Exits with a non-zero status when any of the views failed'
+
+    def handle(self, *args, **options):
+        from dj_materialized_views.models import MaterializedViewRefreshLog
+
+        materialized_views = self.get_materialized_views(options)
+
+        existing = []
+        for materialized_view in materialized_views:
+            with using_database(materialized_view.get_database_alias()):
+                if relation_exists(materialized_view.db_table):
+                    existing.append(materialized_view)
+                    self.stdout.write(f'{materialized_view.db_table:<40} exists, skipped')
+
+        materialized_views = [mv for mv in materialized_views if mv not in existing]
+
+        if options['dry_run']:
+            return self.print_plan(materialized_views, lambda mv: 'create')
+
+        results = create_materialized_views(materialized_views, workers=options['workers'],
+                                            trigger=MaterializedViewRefreshLog.Trigger.COMMAND)
+
+        self.report(results)
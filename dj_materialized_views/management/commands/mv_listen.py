@@ -0,0 +1,18 @@
+from django.core.management.base import BaseCommand
+
+from dj_materialized_views.changes import listen
+from dj_materialized_views.utils import using_database
+
+
+class Command(BaseCommand):
+    help = 'Listens for writes to the source tables of the materialized views with trigger change detection ' \
+           'and schedules their refresh'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--database', help='Alias of the database to listen to, '
+                                               'defaults to MATERIALIZED_VIEWS_DATABASE')
+
+    def handle(self, *args, **options):
+        self.stdout.write('Listening for changes...')
+        with using_database(options['database']):
+            listen()
@@ -0,0 +1,31 @@
+from dj_materialized_views.dependencies import get_dependents
+from dj_materialized_views.executor import refresh_materialized_views
+from dj_materialized_views.management.base import MaterializedViewCommand
+
+
+class Command(MaterializedViewCommand):
+    help = 'Refreshes the selected materialized views in parallel and waits until they are done, ' \
+           'e.g. right after a data load. Exits with a non-zero status when any of the views failed'
+
+    def add_arguments(self, parser):
+        super().add_arguments(parser)
+        parser.add_argument('--cascade', action='store_true', help='Also refresh the views that depend on them')
+        parser.add_argument('--force', action='store_true',
+                            help='Refresh also the views whose source tables did not change')
+
+    def handle(self, *args, **options):
+        from dj_materialized_views.models import MaterializedViewRefreshLog
+
+        materialized_views = self.get_materialized_views(options)
+
+        if options['dry_run']:
+            if options['cascade']:
+                materialized_views = get_dependents(materialized_views)
+            return self.print_plan(materialized_views, lambda mv: f'refresh ({mv.get_refresh_strategy().value})')
+
+        results = refresh_materialized_views(
+            materialized_views, workers=options['workers'], cascade=options['cascade'],
+            trigger=MaterializedViewRefreshLog.Trigger.COMMAND, force=options['force']
+        )
+
+        self.report(results)
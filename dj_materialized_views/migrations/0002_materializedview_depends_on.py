@@ -0,0 +1,18 @@
+# Generated by Django 4.2.30 on 2026-10-16 20:26
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('dj_materialized_views', '0001_initial'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='materializedview',
+            name='depends_on',
+            field=models.ManyToManyField(blank=True, help_text='Materialized views that this view selects from', related_name='dependents', to='dj_materialized_views.materializedview'),
+        ),
+    ]
@@ -0,0 +1,33 @@
+# Generated by Django 4.2.30 on 2026-10-16 20:29
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('dj_materialized_views', '0002_materializedview_depends_on'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='materializedview',
+            name='concurrent_refresh_duration',
+            field=models.FloatField(blank=True, editable=False, help_text='Duration of the last concurrent refresh in seconds', null=True),
+        ),
+        migrations.AddField(
+            model_name='materializedview',
+            name='full_refresh_duration',
+            field=models.FloatField(blank=True, editable=False, help_text='Duration of the last plain refresh, swap or creation in seconds', null=True),
+        ),
+        migrations.AddField(
+            model_name='materializedview',
+            name='last_refresh_strategy',
+            field=models.CharField(blank=True, choices=[('AUTO', 'auto'), ('CONCURRENT', 'concurrent'), ('PLAIN', 'plain'), ('SWAP', 'swap')], editable=False, max_length=255),
+        ),
+        migrations.AddField(
+            model_name='materializedview',
+            name='refresh_strategy',
+            field=models.CharField(choices=[('AUTO', 'auto'), ('CONCURRENT', 'concurrent'), ('PLAIN', 'plain'), ('SWAP', 'swap')], default='AUTO', help_text='How the view is refreshed. Auto picks concurrent, plain or swap refresh for every run', max_length=255),
+        ),
+    ]
@@ -0,0 +1,43 @@
+# Generated by Django 4.2.30 on 2026-10-16 20:30
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('dj_materialized_views', '0003_materializedview_refresh_strategy'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='materializedview',
+            name='change_detection',
+            field=models.CharField(choices=[('NONE', 'none'), ('TRIGGERS', 'triggers'), ('SIGNALS', 'signals')], default='NONE', help_text='Refresh the view when its source tables change, detected by database triggers (requires the mv_listen command) or by Django signals of the models in MATERIALIZED_VIEWS_CHANGE_SIGNAL_MODELS', max_length=255),
+        ),
+        migrations.AddField(
+            model_name='materializedview',
+            name='change_pending_since',
+            field=models.DateTimeField(blank=True, editable=False, null=True),
+        ),
+        migrations.AddField(
+            model_name='materializedview',
+            name='debounce_seconds',
+            field=models.PositiveIntegerField(default=60, help_text='Change detection: refresh once no change came in for this many seconds'),
+        ),
+        migrations.AddField(
+            model_name='materializedview',
+            name='last_change_at',
+            field=models.DateTimeField(blank=True, editable=False, null=True),
+        ),
+        migrations.AddField(
+            model_name='materializedview',
+            name='max_staleness_seconds',
+            field=models.PositiveIntegerField(default=600, help_text='Change detection: refresh at the latest this many seconds after the first change'),
+        ),
+        migrations.AddField(
+            model_name='materializedview',
+            name='source_tables',
+            field=models.TextField(blank=True, editable=False, help_text='Comma separated tables that the view reads, found when the view is created'),
+        ),
+    ]
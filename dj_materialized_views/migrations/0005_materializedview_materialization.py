@@ -0,0 +1,28 @@
+# Generated by Django 4.2.30 on 2026-10-16 20:34
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('dj_materialized_views', '0004_materializedview_change_detection'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='materializedview',
+            name='materialization',
+            field=models.CharField(choices=[('VIEW', 'materialized view'), ('INCREMENTAL', 'incremental table')], default='VIEW', help_text='Incremental tables apply only the changes of the source tables on refresh. Supported queries: GROUP BY over one table or inner joined tables with count, sum, min, max and avg, other queries are fully recomputed on every refresh', max_length=255),
+        ),
+        migrations.AlterField(
+            model_name='materializedview',
+            name='last_refresh_strategy',
+            field=models.CharField(blank=True, choices=[('AUTO', 'auto'), ('CONCURRENT', 'concurrent'), ('PLAIN', 'plain'), ('SWAP', 'swap'), ('INCREMENTAL', 'incremental')], editable=False, max_length=255),
+        ),
+        migrations.AlterField(
+            model_name='materializedview',
+            name='refresh_strategy',
+            field=models.CharField(choices=[('AUTO', 'auto'), ('CONCURRENT', 'concurrent'), ('PLAIN', 'plain'), ('SWAP', 'swap'), ('INCREMENTAL', 'incremental')], default='AUTO', help_text='How the view is refreshed. Auto picks concurrent, plain or swap refresh for every run', max_length=255),
+        ),
+    ]
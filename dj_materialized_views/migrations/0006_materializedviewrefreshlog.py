@@ -0,0 +1,42 @@
+# Generated by Django 4.2.30 on 2026-10-16 20:39
+
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('dj_materialized_views', '0005_materializedview_materialization'),
+    ]
+
+    operations = [
+        migrations.AlterField(
+            model_name='materializedview',
+            name='last_run_date',
+            field=models.DateTimeField(blank=True, editable=False, help_text='Time of the last refresh', null=True),
+        ),
+        migrations.CreateModel(
+            name='MaterializedViewRefreshLog',
+            fields=[
+                ('id', models.AutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('strategy', models.CharField(blank=True, max_length=255)),
+                ('status', models.CharField(choices=[('SUCCESS', 'success'), ('FAILURE', 'failure'), ('SKIPPED', 'skipped')], default='SUCCESS', max_length=255)),
+                ('trigger', models.CharField(choices=[('BEAT', 'periodic task'), ('CHANGE', 'source change'), ('CASCADE', 'source view refreshed'), ('ADMIN', 'admin'), ('TASK', 'celery task'), ('API', 'api')], default='API', max_length=255)),
+                ('started_at', models.DateTimeField()),
+                ('finished_at', models.DateTimeField(blank=True, null=True)),
+                ('duration', models.FloatField(blank=True, help_text='Duration of the refresh in seconds', null=True)),
+                ('row_count', models.BigIntegerField(blank=True, help_text='Rows in the view after the refresh', null=True)),
+                ('size_before', models.BigIntegerField(blank=True, help_text='Size of the view in bytes', null=True)),
+                ('size_after', models.BigIntegerField(blank=True, help_text='Size of the view in bytes', null=True)),
+                ('error', models.TextField(blank=True)),
+                ('materialized_view', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='refresh_logs', to='dj_materialized_views.materializedview')),
+            ],
+            options={
+                'verbose_name': 'Materialized View Refresh Log',
+                'verbose_name_plural': 'Materialized View Refresh Logs',
+                'ordering': ('-started_at',),
+                'indexes': [models.Index(fields=['materialized_view', 'started_at'], name='dj_material_materia_7d56f2_idx')],
+            },
+        ),
+    ]
@@ -0,0 +1,18 @@
+# Generated by Django 4.2.30 on 2026-10-16 20:41
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('dj_materialized_views', '0006_materializedviewrefreshlog'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='materializedview',
+            name='definition_version',
+            field=models.PositiveIntegerField(default=1, editable=False, help_text='Incremented whenever the table is created, rebuilt or dropped, invalidates the cached ORM model'),
+        ),
+    ]
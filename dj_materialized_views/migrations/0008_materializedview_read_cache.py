@@ -0,0 +1,18 @@
+# Generated by Django 4.2.30 on 2026-10-16 20:42
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('dj_materialized_views', '0007_materializedview_definition_version'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='materializedview',
+            name='read_cache',
+            field=models.BooleanField(default=False, help_text='Keep the results of the ORM queries of the view in the Django cache until the next refresh'),
+        ),
+    ]
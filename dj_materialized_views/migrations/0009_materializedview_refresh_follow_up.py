@@ -0,0 +1,33 @@
+# Generated by Django 4.2.30 on 2026-10-16 20:44
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('dj_materialized_views', '0008_materializedview_read_cache'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='materializedview',
+            name='coalesced_refresh_count',
+            field=models.PositiveIntegerField(default=0, editable=False, help_text='Overlapping refresh requests merged into an already pending follow-up refresh'),
+        ),
+        migrations.AddField(
+            model_name='materializedview',
+            name='overlapping_refresh_count',
+            field=models.PositiveIntegerField(default=0, editable=False, help_text='Refresh requests that came in while the view was refreshing'),
+        ),
+        migrations.AddField(
+            model_name='materializedview',
+            name='refresh_follow_up_pending',
+            field=models.BooleanField(default=False, editable=False, help_text='A refresh was requested while the view was refreshing, it is refreshed once more afterwards'),
+        ),
+        migrations.AlterField(
+            model_name='materializedviewrefreshlog',
+            name='trigger',
+            field=models.CharField(choices=[('BEAT', 'periodic task'), ('CHANGE', 'source change'), ('CASCADE', 'source view refreshed'), ('FOLLOW_UP', 'requests during a refresh'), ('ADMIN', 'admin'), ('TASK', 'celery task'), ('API', 'api')], default='API', max_length=255),
+        ),
+    ]
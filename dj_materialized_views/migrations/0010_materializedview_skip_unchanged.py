@@ -0,0 +1,23 @@
+# Generated by Django 4.2.30 on 2026-10-16 20:46
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('dj_materialized_views', '0009_materializedview_refresh_follow_up'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='materializedview',
+            name='skip_unchanged',
+            field=models.BooleanField(default=False, help_text='Skip the refresh when the change counters of the source tables did not change since the last refresh. The counters are reported by PostgreSQL with a delay of up to a few seconds'),
+        ),
+        migrations.AddField(
+            model_name='materializedview',
+            name='source_snapshot',
+            field=models.TextField(blank=True, editable=False, help_text='Change counters of the source tables before the last refresh, JSON'),
+        ),
+    ]
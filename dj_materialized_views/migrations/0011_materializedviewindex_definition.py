@@ -0,0 +1,55 @@
+# Generated by Django 4.2.30 on 2026-10-16 20:48
+
+from django.db import migrations, models
+
+
+def set_legacy_index_names(apps, schema_editor):
+    """
+    The existing indexes keep the names they were created with
+    """
+    MaterializedViewIndex = apps.get_model('dj_materialized_views', 'MaterializedViewIndex')
+
+    for index in MaterializedViewIndex.objects.select_related('materialized_view'):
+        index.index_name = f'{index.materialized_view.db_table}_{index.index_field}'
+        index.save(update_fields=['index_name'])
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('dj_materialized_views', '0010_materializedview_skip_unchanged'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='materializedviewindex',
+            name='condition',
+            field=models.CharField(blank=True, help_text='WHERE condition of a partial index, e.g. "status = \'active\'"', max_length=1024),
+        ),
+        migrations.AddField(
+            model_name='materializedviewindex',
+            name='include_fields',
+            field=models.CharField(blank=True, help_text='Comma separated columns stored in the index for index-only scans (INCLUDE), btree, gist and spgist only', max_length=1024),
+        ),
+        migrations.AddField(
+            model_name='materializedviewindex',
+            name='index_name',
+            field=models.CharField(blank=True, help_text='Name of the index in the database, generated when empty', max_length=63),
+        ),
+        migrations.AddField(
+            model_name='materializedviewindex',
+            name='storage_parameters',
+            field=models.CharField(blank=True, help_text='Comma separated storage parameters, e.g. "pages_per_range = 32" for brin or "fillfactor = 90"', max_length=255),
+        ),
+        migrations.AlterField(
+            model_name='materializedviewindex',
+            name='index_field',
+            field=models.CharField(help_text='DB fields or expressions to be indexed, comma separated, e.g. "app, created_at DESC" or "lower(name) text_pattern_ops". Expressions other than function calls go in parentheses', max_length=1024),
+        ),
+        migrations.AlterField(
+            model_name='materializedviewindex',
+            name='index_type',
+            field=models.CharField(choices=[('BTREE', 'btree'), ('GIN', 'gin'), ('GIST', 'gist'), ('HASH', 'hash'), ('BRIN', 'brin'), ('SPGIST', 'spgist')], default='btree', max_length=255),
+        ),
+        migrations.RunPython(set_legacy_index_names, migrations.RunPython.noop),
+    ]
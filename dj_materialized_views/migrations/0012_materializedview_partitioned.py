@@ -0,0 +1,43 @@
+# Generated by Django 4.2.30 on 2026-10-16 20:58
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('dj_materialized_views', '0011_materializedviewindex_definition'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='materializedview',
+            name='partition_column',
+            field=models.CharField(blank=True, help_text='Partitioned tables: date or timestamp column of the query that the table is partitioned by', max_length=255),
+        ),
+        migrations.AddField(
+            model_name='materializedview',
+            name='partition_interval',
+            field=models.CharField(choices=[('DAY', 'day'), ('WEEK', 'week'), ('MONTH', 'month'), ('YEAR', 'year')], default='MONTH', help_text='Partitioned tables: range of the partition column covered by one partition', max_length=255),
+        ),
+        migrations.AddField(
+            model_name='materializedview',
+            name='partition_window',
+            field=models.PositiveIntegerField(default=2, help_text='Partitioned tables: number of the most recent partitions recomputed on every refresh, the older partitions are only recomputed by a backfill'),
+        ),
+        migrations.AlterField(
+            model_name='materializedview',
+            name='last_refresh_strategy',
+            field=models.CharField(blank=True, choices=[('AUTO', 'auto'), ('CONCURRENT', 'concurrent'), ('PLAIN', 'plain'), ('SWAP', 'swap'), ('INCREMENTAL', 'incremental'), ('PARTITION', 'partition window')], editable=False, max_length=255),
+        ),
+        migrations.AlterField(
+            model_name='materializedview',
+            name='materialization',
+            field=models.CharField(choices=[('VIEW', 'materialized view'), ('INCREMENTAL', 'incremental table'), ('PARTITIONED', 'partitioned table')], default='VIEW', help_text='Incremental tables apply only the changes of the source tables on refresh. Supported queries: GROUP BY over one table or inner joined tables with count, sum, min, max and avg, other queries are fully recomputed on every refresh. Partitioned tables recompute only the partitions of the trailing window on refresh', max_length=255),
+        ),
+        migrations.AlterField(
+            model_name='materializedview',
+            name='refresh_strategy',
+            field=models.CharField(choices=[('AUTO', 'auto'), ('CONCURRENT', 'concurrent'), ('PLAIN', 'plain'), ('SWAP', 'swap'), ('INCREMENTAL', 'incremental'), ('PARTITION', 'partition window')], default='AUTO', help_text='How the view is refreshed. Auto picks concurrent, plain or swap refresh for every run', max_length=255),
+        ),
+    ]
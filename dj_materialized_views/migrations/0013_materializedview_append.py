@@ -0,0 +1,53 @@
+# Generated by Django 4.2.30 on 2026-10-16 21:01
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('dj_materialized_views', '0012_materializedview_partitioned'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='materializedview',
+            name='append_batch_size',
+            field=models.PositiveIntegerField(default=100000, help_text='Append-only tables: maximum number of rows copied in one transaction, rows with the same watermark are never split'),
+        ),
+        migrations.AddField(
+            model_name='materializedview',
+            name='full_rebuild_interval',
+            field=models.PositiveIntegerField(blank=True, help_text='Append-only tables: rebuild the whole table from the query when the last full rebuild is older than this many seconds, picks up late, updated and deleted rows', null=True),
+        ),
+        migrations.AddField(
+            model_name='materializedview',
+            name='last_full_rebuild_at',
+            field=models.DateTimeField(blank=True, editable=False, null=True),
+        ),
+        migrations.AddField(
+            model_name='materializedview',
+            name='watermark',
+            field=models.TextField(blank=True, editable=False, help_text='Append-only tables: highest value of the watermark column copied into the table'),
+        ),
+        migrations.AddField(
+            model_name='materializedview',
+            name='watermark_column',
+            field=models.CharField(blank=True, help_text='Append-only tables: monotonically increasing column of the query, e.g. an identity column or an insert timestamp, the rows above the stored watermark are appended on refresh', max_length=255),
+        ),
+        migrations.AlterField(
+            model_name='materializedview',
+            name='last_refresh_strategy',
+            field=models.CharField(blank=True, choices=[('AUTO', 'auto'), ('CONCURRENT', 'concurrent'), ('PLAIN', 'plain'), ('SWAP', 'swap'), ('INCREMENTAL', 'incremental'), ('PARTITION', 'partition window'), ('APPEND', 'append')], editable=False, max_length=255),
+        ),
+        migrations.AlterField(
+            model_name='materializedview',
+            name='materialization',
+            field=models.CharField(choices=[('VIEW', 'materialized view'), ('INCREMENTAL', 'incremental table'), ('PARTITIONED', 'partitioned table'), ('APPEND', 'append-only table')], default='VIEW', help_text='Incremental tables apply only the changes of the source tables on refresh. Supported queries: GROUP BY over one table or inner joined tables with count, sum, min, max and avg, other queries are fully recomputed on every refresh. Partitioned tables recompute only the partitions of the trailing window on refresh. Append-only tables copy only the rows above the watermark on refresh', max_length=255),
+        ),
+        migrations.AlterField(
+            model_name='materializedview',
+            name='refresh_strategy',
+            field=models.CharField(choices=[('AUTO', 'auto'), ('CONCURRENT', 'concurrent'), ('PLAIN', 'plain'), ('SWAP', 'swap'), ('INCREMENTAL', 'incremental'), ('PARTITION', 'partition window'), ('APPEND', 'append')], default='AUTO', help_text='How the view is refreshed. Auto picks concurrent, plain or swap refresh for every run', max_length=255),
+        ),
+    ]
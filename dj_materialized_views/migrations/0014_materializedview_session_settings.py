@@ -0,0 +1,43 @@
+# Generated by Django 4.2.30 on 2026-10-16 21:03
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('dj_materialized_views', '0013_materializedview_append'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='materializedview',
+            name='lock_timeout',
+            field=models.CharField(blank=True, help_text='Refresh settings: maximum wait for a lock on the view or its source tables, e.g. "10s"', max_length=64),
+        ),
+        migrations.AddField(
+            model_name='materializedview',
+            name='maintenance_work_mem',
+            field=models.CharField(blank=True, help_text='Refresh settings: memory of the index builds, e.g. "1GB"', max_length=64),
+        ),
+        migrations.AddField(
+            model_name='materializedview',
+            name='max_parallel_workers_per_gather',
+            field=models.PositiveIntegerField(blank=True, help_text='Refresh settings: parallel workers of a query of the refresh, 0 disables parallel queries', null=True),
+        ),
+        migrations.AddField(
+            model_name='materializedview',
+            name='statement_timeout',
+            field=models.CharField(blank=True, help_text='Refresh settings: maximum duration of a statement of a refresh or index build, e.g. "30min"', max_length=64),
+        ),
+        migrations.AddField(
+            model_name='materializedview',
+            name='temp_tablespaces',
+            field=models.CharField(blank=True, help_text='Refresh settings: comma separated tablespaces of the temporary files of the refresh', max_length=255),
+        ),
+        migrations.AddField(
+            model_name='materializedview',
+            name='work_mem',
+            field=models.CharField(blank=True, help_text='Refresh settings: memory of a sort or hash before it spills to disk, e.g. "256MB"', max_length=64),
+        ),
+    ]
@@ -0,0 +1,43 @@
+# Generated by Django 4.2.30 on 2026-10-16 21:06
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('dj_materialized_views', '0014_materializedview_session_settings'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='materializedview',
+            name='approved_cost',
+            field=models.FloatField(blank=True, editable=False, help_text='Estimated cost approved by a user, creates and refreshes up to this cost are allowed above MATERIALIZED_VIEWS_MAX_ESTIMATED_COST and MATERIALIZED_VIEWS_MAX_ESTIMATED_ROWS', null=True),
+        ),
+        migrations.AddField(
+            model_name='materializedview',
+            name='estimated_at',
+            field=models.DateTimeField(blank=True, editable=False, null=True),
+        ),
+        migrations.AddField(
+            model_name='materializedview',
+            name='estimated_cost',
+            field=models.FloatField(blank=True, editable=False, help_text='Total cost of the query estimated by the planner, in planner units', null=True),
+        ),
+        migrations.AddField(
+            model_name='materializedview',
+            name='estimated_rows',
+            field=models.BigIntegerField(blank=True, editable=False, help_text='Rows of the query estimated by the planner', null=True),
+        ),
+        migrations.AddField(
+            model_name='materializedview',
+            name='estimated_width',
+            field=models.PositiveIntegerField(blank=True, editable=False, help_text='Average size of a row of the query in bytes estimated by the planner', null=True),
+        ),
+        migrations.AddField(
+            model_name='materializedviewrefreshlog',
+            name='estimated_rows',
+            field=models.BigIntegerField(blank=True, help_text='Rows of the query estimated by the planner before the refresh', null=True),
+        ),
+    ]
@@ -0,0 +1,23 @@
+# Generated by Django 4.2.30 on 2026-10-16 21:08
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('dj_materialized_views', '0015_materializedview_estimates'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='materializedview',
+            name='tags',
+            field=models.CharField(blank=True, help_text='Comma separated tags, e.g. "nightly, sales", the mv_refresh and mv_create commands select groups of views by tag', max_length=255),
+        ),
+        migrations.AlterField(
+            model_name='materializedviewrefreshlog',
+            name='trigger',
+            field=models.CharField(choices=[('BEAT', 'periodic task'), ('CHANGE', 'source change'), ('CASCADE', 'source view refreshed'), ('FOLLOW_UP', 'requests during a refresh'), ('ADMIN', 'admin'), ('TASK', 'celery task'), ('API', 'api'), ('COMMAND', 'management command')], default='API', max_length=255),
+        ),
+    ]
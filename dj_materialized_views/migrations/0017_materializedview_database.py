@@ -0,0 +1,23 @@
+# Generated by Django 4.2.30 on 2026-10-16 21:11
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('dj_materialized_views', '0016_materializedview_tags'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='materializedview',
+            name='database',
+            field=models.CharField(blank=True, help_text='Alias of the database where the view is created and refreshed, defaults to MATERIALIZED_VIEWS_DATABASE', max_length=255),
+        ),
+        migrations.AddField(
+            model_name='materializedview',
+            name='last_refresh_lsn',
+            field=models.CharField(blank=True, editable=False, help_text='WAL position of the database after the last refresh, replicas serve the reads of the view once they have replayed it', max_length=32),
+        ),
+    ]
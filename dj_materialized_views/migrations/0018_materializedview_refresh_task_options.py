@@ -0,0 +1,39 @@
+# Generated by Django 4.2.30 on 2026-10-16 21:14
+
+import django.core.validators
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('dj_materialized_views', '0017_materializedview_database'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='materializedview',
+            name='refresh_expire_seconds',
+            field=models.PositiveIntegerField(blank=True, help_text='Refresh task: refresh tasks still waiting in the queue this many seconds after they were due are dropped instead of executed', null=True),
+        ),
+        migrations.AddField(
+            model_name='materializedview',
+            name='refresh_priority',
+            field=models.PositiveIntegerField(blank=True, help_text='Refresh task: message priority of the refresh tasks, its range depends on the broker', null=True, validators=[django.core.validators.MaxValueValidator(255)]),
+        ),
+        migrations.AddField(
+            model_name='materializedview',
+            name='refresh_queue',
+            field=models.CharField(blank=True, help_text='Refresh task: Celery queue of the refresh tasks, e.g. "heavy" to keep long refreshes on their own workers', max_length=255),
+        ),
+        migrations.AddField(
+            model_name='materializedview',
+            name='refresh_soft_time_limit',
+            field=models.PositiveIntegerField(blank=True, help_text='Refresh task: seconds after which the refresh is interrupted and recorded as failed', null=True),
+        ),
+        migrations.AddField(
+            model_name='materializedview',
+            name='refresh_time_limit',
+            field=models.PositiveIntegerField(blank=True, help_text='Refresh task: seconds after which the worker running the refresh is killed', null=True),
+        ),
+    ]
@@ -0,0 +1,38 @@
+# Generated by Django 4.2.30 on 2026-10-16 21:16
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('dj_materialized_views', '0018_materializedview_refresh_task_options'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='materializedview',
+            name='create_with_no_data',
+            field=models.BooleanField(default=False, help_text='Storage: create the materialized view empty (WITH NO DATA), a refresh task populates it right after, see the Refresh task fields'),
+        ),
+        migrations.AddField(
+            model_name='materializedview',
+            name='post_refresh_maintenance',
+            field=models.CharField(choices=[('NONE', 'none'), ('ANALYZE', 'analyze'), ('VACUUM_ANALYZE', 'vacuum analyze')], default='NONE', help_text='Update the planner statistics of the view after every refresh. VACUUM (ANALYZE) also cleans up the dead rows of concurrent refreshes, it falls back to ANALYZE in a transaction', max_length=255),
+        ),
+        migrations.AddField(
+            model_name='materializedview',
+            name='storage_parameters',
+            field=models.CharField(blank=True, help_text='Storage: comma separated storage parameters of the view, e.g. "fillfactor = 90, autovacuum_vacuum_scale_factor = 0.01". Applied when the view is created or rebuilt', max_length=1024),
+        ),
+        migrations.AddField(
+            model_name='materializedview',
+            name='tablespace',
+            field=models.CharField(blank=True, help_text='Storage: tablespace of the view and its indexes, e.g. a tablespace on fast disks. Applied when the view is created or rebuilt', max_length=255),
+        ),
+        migrations.AddField(
+            model_name='materializedviewrefreshlog',
+            name='maintenance_duration',
+            field=models.FloatField(blank=True, help_text='Duration of the ANALYZE or VACUUM after the refresh in seconds, not included in the duration', null=True),
+        ),
+    ]
@@ -0,0 +1,63 @@
+# Generated by Django 4.2.30 on 2026-10-16 21:19
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('dj_materialized_views', '0019_materializedview_storage'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='materializedview',
+            name='bloat_checked_at',
+            field=models.DateTimeField(blank=True, editable=False, null=True),
+        ),
+        migrations.AddField(
+            model_name='materializedview',
+            name='bloat_ratio',
+            field=models.FloatField(blank=True, editable=False, help_text='Bloat: share of the table taken by dead rows and free space, estimated without pgstattuple', null=True),
+        ),
+        migrations.AddField(
+            model_name='materializedview',
+            name='dead_tuple_ratio',
+            field=models.FloatField(blank=True, editable=False, help_text='Bloat: share of the rows of the table that are dead', null=True),
+        ),
+        migrations.AddField(
+            model_name='materializedview',
+            name='heap_size',
+            field=models.BigIntegerField(blank=True, editable=False, help_text='Bloat: size of the table of the view without the indexes in bytes', null=True),
+        ),
+        migrations.AddField(
+            model_name='materializedview',
+            name='index_bloat_ratio',
+            field=models.FloatField(blank=True, editable=False, help_text='Bloat: share of the btree indexes taken by free space, measured with pgstattuple only', null=True),
+        ),
+        migrations.AddField(
+            model_name='materializedview',
+            name='index_size',
+            field=models.BigIntegerField(blank=True, editable=False, help_text='Bloat: size of the indexes of the view in bytes', null=True),
+        ),
+        migrations.AddField(
+            model_name='materializedview',
+            name='last_maintenance',
+            field=models.CharField(blank=True, choices=[('NONE', 'none'), ('VACUUM', 'vacuum'), ('REINDEX', 'reindex'), ('REBUILD', 'rebuild')], editable=False, max_length=255),
+        ),
+        migrations.AddField(
+            model_name='materializedview',
+            name='last_maintenance_at',
+            field=models.DateTimeField(blank=True, editable=False, null=True),
+        ),
+        migrations.AddField(
+            model_name='materializedview',
+            name='maintenance_due',
+            field=models.CharField(choices=[('NONE', 'none'), ('VACUUM', 'vacuum'), ('REINDEX', 'reindex'), ('REBUILD', 'rebuild')], default='NONE', editable=False, help_text='Bloat: maintenance scheduled for the next maintenance window', max_length=255),
+        ),
+        migrations.AlterField(
+            model_name='materializedviewrefreshlog',
+            name='trigger',
+            field=models.CharField(choices=[('BEAT', 'periodic task'), ('CHANGE', 'source change'), ('CASCADE', 'source view refreshed'), ('FOLLOW_UP', 'requests during a refresh'), ('ADMIN', 'admin'), ('TASK', 'celery task'), ('API', 'api'), ('COMMAND', 'management command'), ('MAINTENANCE', 'maintenance')], default='API', max_length=255),
+        ),
+    ]
@@ -0,0 +1,38 @@
+# Generated by Django 4.2.30 on 2026-10-16 21:21
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('dj_materialized_views', '0020_materializedview_bloat'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='materializedview',
+            name='warm_up',
+            field=models.BooleanField(default=False, help_text='Warm-up: load the view into the buffer cache after every refresh, with pg_prewarm or, when the extension is not installed, with the warm-up queries'),
+        ),
+        migrations.AddField(
+            model_name='materializedview',
+            name='warm_up_max_bytes',
+            field=models.BigIntegerField(blank=True, help_text='Warm-up: bytes the warm-up may load into the buffer cache, defaults to MATERIALIZED_VIEWS_WARM_UP_MAX_BYTES', null=True),
+        ),
+        migrations.AddField(
+            model_name='materializedview',
+            name='warm_up_queries',
+            field=models.TextField(blank=True, help_text='Warm-up: JSON list of queries of the model run without pg_prewarm, e.g. [{"filter": {"status": "active"}, "order_by": ["-amount"], "limit": 100}]. They only run when the view fits in the warm-up budget'),
+        ),
+        migrations.AddField(
+            model_name='materializedviewindex',
+            name='warm_up',
+            field=models.BooleanField(default=False, help_text='Load the index into the buffer cache with the view after every refresh, see the warm-up of the view'),
+        ),
+        migrations.AddField(
+            model_name='materializedviewrefreshlog',
+            name='warm_up_duration',
+            field=models.FloatField(blank=True, help_text='Duration of the buffer cache warm-up after the refresh in seconds, not included in the duration', null=True),
+        ),
+    ]
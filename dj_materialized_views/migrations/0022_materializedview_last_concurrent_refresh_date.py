@@ -0,0 +1,18 @@
+# Generated by Django 4.2.30 on 2026-10-16 22:19
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('dj_materialized_views', '0021_materializedview_warm_up'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='materializedview',
+            name='last_concurrent_refresh_date',
+            field=models.DateTimeField(blank=True, editable=False, help_text='Time of the last concurrent refresh, the auto strategy measures it again once it is too old', null=True),
+        ),
+    ]
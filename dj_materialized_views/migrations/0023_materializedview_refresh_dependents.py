@@ -0,0 +1,18 @@
+# Generated by Django 4.2.30 on 2026-10-16 22:37
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('dj_materialized_views', '0022_materializedview_last_concurrent_refresh_date'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='materializedview',
+            name='refresh_dependents',
+            field=models.BooleanField(default=True, help_text='The periodic refresh also refreshes the views that select from this view, their own periodic refreshes are skipped'),
+        ),
+    ]
@@ -0,0 +1,23 @@
+# Generated by Django 4.2.30 on 2026-10-16 22:42
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('dj_materialized_views', '0023_materializedview_refresh_dependents'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='materializedview',
+            name='watermark_lag_rows',
+            field=models.BigIntegerField(blank=True, editable=False, help_text='Append-only tables: rows of the query above the watermark after the last refresh', null=True),
+        ),
+        migrations.AddField(
+            model_name='materializedview',
+            name='watermark_lag_since',
+            field=models.DateTimeField(blank=True, editable=False, help_text='Append-only tables: time of the oldest row above the watermark after the last refresh, or of the last refresh when all the rows were copied', null=True),
+        ),
+    ]
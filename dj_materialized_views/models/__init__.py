@@ -1,2 +1,3 @@
 from .materialized_view import MaterializedView
 from .materialized_view_index import MaterializedViewIndex
+from .materialized_view_refresh_log import MaterializedViewRefreshLog
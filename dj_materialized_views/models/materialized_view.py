@@ -1,17 +1,37 @@
 import json
+import time
+from datetime import timedelta
+from enum import Enum
 
 from django.conf import settings
-from django.db import models, transaction
-from django.db.models.signals import post_save
+from django.core.exceptions import ValidationError
+from django.core.validators import MaxValueValidator
+from django.db import DatabaseError, models, transaction
+from django.db.models import F
+from django.db.models.signals import post_save, pre_save
 from django.dispatch import receiver
+from django.utils import timezone
 from django.utils.translation import gettext_lazy as _
 from django_celery_beat.models import PeriodicTask
 
-from dj_materialized_views import tasks
+from dj_materialized_views import append, bloat, changes, estimates, incremental, orm, partitioned, prewarm, \
+    read_cache, tasks
+from dj_materialized_views.conf import get_setting
+from dj_materialized_views.dependencies import discover_dependencies, get_dependents, get_qualified_name, \
+    get_source_tables, get_sources, is_populated, relation_exists, topological_levels
+from dj_materialized_views.exceptions import MaterializedViewCostExceeded, MaterializedViewRefreshError
+from dj_materialized_views.executor import RefreshExecutor
+from dj_materialized_views.locks import refresh_lock
+from dj_materialized_views.models.materialized_view_refresh_log import MaterializedViewRefreshLog
 from dj_materialized_views.utils import (
-    execute_raw_sql
+    atomic, execute_raw_sql, fetch_raw_sql, get_connection, get_database_alias, on_view_database,
+    set_local_settings
 )
 
+# PostgreSQL settings of a view applied to its refreshes and index builds
+SESSION_SETTINGS = ('statement_timeout', 'lock_timeout', 'work_mem', 'maintenance_work_mem',
+                    'max_parallel_workers_per_gather', 'temp_tablespaces')
+
 
 class MaterializedView(models.Model):
     """
@@ -20,20 +40,357 @@ class MaterializedView(models.Model):
     django_celery_beat library.
     The materialized view can be queried through the Django ORM.
     """
+
+    class Materialization(Enum):
+        VIEW = "materialized view"
+        INCREMENTAL = "incremental table"
+        PARTITIONED = "partitioned table"
+        APPEND = "append-only table"
+
+        @classmethod
+        def choices(cls):
+            return tuple((i.name, i.value) for i in cls)
+
+    class RefreshStrategy(Enum):
+        AUTO = "auto"
+        CONCURRENT = "concurrent"
+        PLAIN = "plain"
+        SWAP = "swap"
+        INCREMENTAL = "incremental"
+        PARTITION = "partition window"
+        APPEND = "append"
+
+        @classmethod
+        def choices(cls):
+            return tuple((i.name, i.value) for i in cls)
+
+    class PartitionInterval(Enum):
+        DAY = "day"
+        WEEK = "week"
+        MONTH = "month"
+        YEAR = "year"
+
+        @classmethod
+        def choices(cls):
+            return tuple((i.name, i.value) for i in cls)
+
+    class Maintenance(Enum):
+        NONE = "none"
+        ANALYZE = "analyze"
+        VACUUM_ANALYZE = "vacuum analyze"
+
+        @classmethod
+        def choices(cls):
+            return tuple((i.name, i.value) for i in cls)
+
+    class BloatAction(Enum):
+        NONE = "none"
+        VACUUM = "vacuum"
+        REINDEX = "reindex"
+        REBUILD = "rebuild"
+
+        @classmethod
+        def choices(cls):
+            return tuple((i.name, i.value) for i in cls)
+
+    class ChangeDetection(Enum):
+        NONE = "none"
+        TRIGGERS = "triggers"
+        SIGNALS = "signals"
+
+        @classmethod
+        def choices(cls):
+            return tuple((i.name, i.value) for i in cls)
+
     title = models.CharField(max_length=255)
     db_table = models.CharField(max_length=255, help_text=_('Name of the Materialized View table'))
     sql_query = models.TextField(help_text=_('SQL query to be materialize'))
+    tags = models.CharField(
+        max_length=255, blank=True,
+        help_text=_('Comma separated tags, e.g. "nightly, sales", the mv_refresh and mv_create commands '
+                    'select groups of views by tag')
+    )
+    database = models.CharField(
+        max_length=255, blank=True,
+        help_text=_('Alias of the database where the view is created and refreshed, '
+                    'defaults to MATERIALIZED_VIEWS_DATABASE')
+    )
     periodic_task = models.OneToOneField(
         PeriodicTask,
         on_delete=models.CASCADE
     )
+    depends_on = models.ManyToManyField(
+        'self',
+        symmetrical=False,
+        related_name='dependents',
+        blank=True,
+        help_text=_('Materialized views that this view selects from')
+    )
+    refresh_dependents = models.BooleanField(
+        default=True,
+        help_text=_('The periodic refresh also refreshes the views that select from this view, their own '
+                    'periodic refreshes are skipped')
+    )
+    materialization = models.CharField(
+        choices=Materialization.choices(), max_length=255, default=Materialization.VIEW.name,
+        help_text=_('Incremental tables apply only the changes of the source tables on refresh. '
+                    'Supported queries: GROUP BY over one table or inner joined tables with count, sum, min, max '
+                    'and avg, other queries are fully recomputed on every refresh. '
+                    'Partitioned tables recompute only the partitions of the trailing window on refresh. '
+                    'Append-only tables copy only the rows above the watermark on refresh')
+    )
+    partition_column = models.CharField(
+        max_length=255, blank=True,
+        help_text=_('Partitioned tables: date or timestamp column of the query that the table is partitioned by')
+    )
+    partition_interval = models.CharField(
+        choices=PartitionInterval.choices(), max_length=255, default=PartitionInterval.MONTH.name,
+        help_text=_('Partitioned tables: range of the partition column covered by one partition')
+    )
+    partition_window = models.PositiveIntegerField(
+        default=2,
+        help_text=_('Partitioned tables: number of the most recent partitions recomputed on every refresh, '
+                    'the older partitions are only recomputed by a backfill')
+    )
+    watermark_column = models.CharField(
+        max_length=255, blank=True,
+        help_text=_('Append-only tables: monotonically increasing column of the query, e.g. an identity column '
+                    'or an insert timestamp, the rows above the stored watermark are appended on refresh')
+    )
+    watermark = models.TextField(
+        blank=True, editable=False,
+        help_text=_('Append-only tables: highest value of the watermark column copied into the table')
+    )
+    append_batch_size = models.PositiveIntegerField(
+        default=100000,
+        help_text=_('Append-only tables: maximum number of rows copied in one transaction, rows with the same '
+                    'watermark are never split')
+    )
+    full_rebuild_interval = models.PositiveIntegerField(
+        null=True, blank=True,
+        help_text=_('Append-only tables: rebuild the whole table from the query when the last full rebuild is '
+                    'older than this many seconds, picks up late, updated and deleted rows')
+    )
+    last_full_rebuild_at = models.DateTimeField(null=True, blank=True, editable=False)
+    watermark_lag_rows = models.BigIntegerField(
+        null=True, blank=True, editable=False,
+        help_text=_('Append-only tables: rows of the query above the watermark after the last refresh')
+    )
+    watermark_lag_since = models.DateTimeField(
+        null=True, blank=True, editable=False,
+        help_text=_('Append-only tables: time of the oldest row above the watermark after the last refresh, '
+                    'or of the last refresh when all the rows were copied')
+    )
+    last_refresh_lsn = models.CharField(
+        max_length=32, blank=True, editable=False,
+        help_text=_('WAL position of the database after the last refresh, replicas serve the reads of the view '
+                    'once they have replayed it')
+    )
+    refresh_strategy = models.CharField(
+        choices=RefreshStrategy.choices(), max_length=255, default=RefreshStrategy.AUTO.name,
+        help_text=_('How the view is refreshed. Auto picks concurrent, plain or swap refresh for every run')
+    )
+    last_refresh_strategy = models.CharField(
+        choices=RefreshStrategy.choices(), max_length=255, blank=True, editable=False
+    )
+    concurrent_refresh_duration = models.FloatField(
+        null=True, blank=True, editable=False,
+        help_text=_('Duration of the last concurrent refresh in seconds')
+    )
+    full_refresh_duration = models.FloatField(
+        null=True, blank=True, editable=False,
+        help_text=_('Duration of the last plain refresh, swap or creation in seconds')
+    )
+    last_concurrent_refresh_date = models.DateTimeField(
+        null=True, blank=True, editable=False,
+        help_text=_('Time of the last concurrent refresh, the auto strategy measures it again once it is too old')
+    )
+    statement_timeout = models.CharField(
+        max_length=64, blank=True,
+        help_text=_('Refresh settings: maximum duration of a statement of a refresh or index build, e.g. "30min"')
+    )
+    lock_timeout = models.CharField(
+        max_length=64, blank=True,
+        help_text=_('Refresh settings: maximum wait for a lock on the view or its source tables, e.g. "10s"')
+    )
+    work_mem = models.CharField(
+        max_length=64, blank=True,
+        help_text=_('Refresh settings: memory of a sort or hash before it spills to disk, e.g. "256MB"')
+    )
+    maintenance_work_mem = models.CharField(
+        max_length=64, blank=True,
+        help_text=_('Refresh settings: memory of the index builds, e.g. "1GB"')
+    )
+    max_parallel_workers_per_gather = models.PositiveIntegerField(
+        null=True, blank=True,
+        help_text=_('Refresh settings: parallel workers of a query of the refresh, 0 disables parallel queries')
+    )
+    temp_tablespaces = models.CharField(
+        max_length=255, blank=True,
+        help_text=_('Refresh settings: comma separated tablespaces of the temporary files of the refresh')
+    )
+    tablespace = models.CharField(
+        max_length=255, blank=True,
+        help_text=_('Storage: tablespace of the view and its indexes, e.g. a tablespace on fast disks. '
+                    'Applied when the view is created or rebuilt')
+    )
+    storage_parameters = models.CharField(
+        max_length=1024, blank=True,
+        help_text=_('Storage: comma separated storage parameters of the view, e.g. "fillfactor = 90, '
+                    'autovacuum_vacuum_scale_factor = 0.01". Applied when the view is created or rebuilt')
+    )
+    create_with_no_data = models.BooleanField(
+        default=False,
+        help_text=_('Storage: create the materialized view empty (WITH NO DATA), a refresh task populates it '
+                    'right after, see the Refresh task fields')
+    )
+    post_refresh_maintenance = models.CharField(
+        choices=Maintenance.choices(), max_length=255, default=Maintenance.NONE.name,
+        help_text=_('Update the planner statistics of the view after every refresh. VACUUM (ANALYZE) also '
+                    'cleans up the dead rows of concurrent refreshes, it falls back to ANALYZE in a transaction')
+    )
+    heap_size = models.BigIntegerField(
+        null=True, blank=True, editable=False,
+        help_text=_('Bloat: size of the table of the view without the indexes in bytes')
+    )
+    index_size = models.BigIntegerField(
+        null=True, blank=True, editable=False,
+        help_text=_('Bloat: size of the indexes of the view in bytes')
+    )
+    dead_tuple_ratio = models.FloatField(
+        null=True, blank=True, editable=False,
+        help_text=_('Bloat: share of the rows of the table that are dead')
+    )
+    bloat_ratio = models.FloatField(
+        null=True, blank=True, editable=False,
+        help_text=_('Bloat: share of the table taken by dead rows and free space, estimated without pgstattuple')
+    )
+    index_bloat_ratio = models.FloatField(
+        null=True, blank=True, editable=False,
+        help_text=_('Bloat: share of the btree indexes taken by free space, measured with pgstattuple only')
+    )
+    bloat_checked_at = models.DateTimeField(null=True, blank=True, editable=False)
+    maintenance_due = models.CharField(
+        choices=BloatAction.choices(), max_length=255, default=BloatAction.NONE.name, editable=False,
+        help_text=_('Bloat: maintenance scheduled for the next maintenance window')
+    )
+    last_maintenance = models.CharField(choices=BloatAction.choices(), max_length=255, blank=True, editable=False)
+    last_maintenance_at = models.DateTimeField(null=True, blank=True, editable=False)
+    warm_up = models.BooleanField(
+        default=False,
+        help_text=_('Warm-up: load the view into the buffer cache after every refresh, with pg_prewarm or, '
+                    'when the extension is not installed, with the warm-up queries')
+    )
+    warm_up_max_bytes = models.BigIntegerField(
+        null=True, blank=True,
+        help_text=_('Warm-up: bytes the warm-up may load into the buffer cache, '
+                    'defaults to MATERIALIZED_VIEWS_WARM_UP_MAX_BYTES')
+    )
+    warm_up_queries = models.TextField(
+        blank=True,
+        help_text=_('Warm-up: JSON list of queries of the model run without pg_prewarm, e.g. '
+                    '[{"filter": {"status": "active"}, "order_by": ["-amount"], "limit": 100}]. '
+                    'They only run when the view fits in the warm-up budget')
+    )
+    refresh_queue = models.CharField(
+        max_length=255, blank=True,
+        help_text=_('Refresh task: Celery queue of the refresh tasks, e.g. "heavy" to keep long refreshes on '
+                    'their own workers')
+    )
+    refresh_priority = models.PositiveIntegerField(
+        null=True, blank=True, validators=[MaxValueValidator(255)],
+        help_text=_('Refresh task: message priority of the refresh tasks, its range depends on the broker')
+    )
+    refresh_soft_time_limit = models.PositiveIntegerField(
+        null=True, blank=True,
+        help_text=_('Refresh task: seconds after which the refresh is interrupted and recorded as failed')
+    )
+    refresh_time_limit = models.PositiveIntegerField(
+        null=True, blank=True,
+        help_text=_('Refresh task: seconds after which the worker running the refresh is killed')
+    )
+    refresh_expire_seconds = models.PositiveIntegerField(
+        null=True, blank=True,
+        help_text=_('Refresh task: refresh tasks still waiting in the queue this many seconds after they were due '
+                    'are dropped instead of executed')
+    )
+    estimated_rows = models.BigIntegerField(
+        null=True, blank=True, editable=False,
+        help_text=_('Rows of the query estimated by the planner')
+    )
+    estimated_width = models.PositiveIntegerField(
+        null=True, blank=True, editable=False,
+        help_text=_('Average size of a row of the query in bytes estimated by the planner')
+    )
+    estimated_cost = models.FloatField(
+        null=True, blank=True, editable=False,
+        help_text=_('Total cost of the query estimated by the planner, in planner units')
+    )
+    estimated_at = models.DateTimeField(null=True, blank=True, editable=False)
+    approved_cost = models.FloatField(
+        null=True, blank=True, editable=False,
+        help_text=_('Estimated cost approved by a user, creates and refreshes up to this cost are allowed '
+                    'above MATERIALIZED_VIEWS_MAX_ESTIMATED_COST and MATERIALIZED_VIEWS_MAX_ESTIMATED_ROWS')
+    )
+    read_cache = models.BooleanField(
+        default=False,
+        help_text=_('Keep the results of the ORM queries of the view in the Django cache until the next refresh')
+    )
+    skip_unchanged = models.BooleanField(
+        default=False,
+        help_text=_('Skip the refresh when the change counters of the source tables did not change since the last '
+                    'refresh. The counters are reported by PostgreSQL with a delay of up to a few seconds')
+    )
+    source_snapshot = models.TextField(
+        blank=True, editable=False,
+        help_text=_('Change counters of the source tables before the last refresh, JSON')
+    )
+    change_detection = models.CharField(
+        choices=ChangeDetection.choices(), max_length=255, default=ChangeDetection.NONE.name,
+        help_text=_('Refresh the view when its source tables change, detected by database triggers '
+                    '(requires the mv_listen command) or by Django signals of the models in '
+                    'MATERIALIZED_VIEWS_CHANGE_SIGNAL_MODELS')
+    )
+    debounce_seconds = models.PositiveIntegerField(
+        default=60,
+        help_text=_('Change detection: refresh once no change came in for this many seconds')
+    )
+    max_staleness_seconds = models.PositiveIntegerField(
+        default=600,
+        help_text=_('Change detection: refresh at the latest this many seconds after the first change')
+    )
+    source_tables = models.TextField(
+        blank=True, editable=False,
+        help_text=_('Comma separated tables that the view reads, found when the view is created')
+    )
+    definition_version = models.PositiveIntegerField(
+        default=1, editable=False,
+        help_text=_('Incremented whenever the table is created, rebuilt or dropped, invalidates the cached ORM model')
+    )
+    refresh_follow_up_pending = models.BooleanField(
+        default=False, editable=False,
+        help_text=_('A refresh was requested while the view was refreshing, it is refreshed once more afterwards')
+    )
+    overlapping_refresh_count = models.PositiveIntegerField(
+        default=0, editable=False,
+        help_text=_('Refresh requests that came in while the view was refreshing')
+    )
+    coalesced_refresh_count = models.PositiveIntegerField(
+        default=0, editable=False,
+        help_text=_('Overlapping refresh requests merged into an already pending follow-up refresh')
+    )
+    change_pending_since = models.DateTimeField(null=True, blank=True, editable=False)
+    last_change_at = models.DateTimeField(null=True, blank=True, editable=False)
     created_by_user = models.ForeignKey(
         settings.AUTH_USER_MODEL,
         null=True, blank=True, editable=False,
         on_delete=models.SET_NULL
     )
     created_at = models.DateTimeField(auto_now_add=True)
-    last_run_date = models.DateTimeField(auto_now=True)
+    last_run_date = models.DateTimeField(
+        null=True, blank=True, editable=False,
+        help_text=_('Time of the last refresh')
+    )
 
     class Meta:
         verbose_name = _('Materialized View')
@@ -42,6 +399,198 @@ class MaterializedView(models.Model):
     def __str__(self):
         return self.title
 
+    @on_view_database
+    def clean(self):
+        incremental_strategies = (self.RefreshStrategy.AUTO.name, self.RefreshStrategy.INCREMENTAL.name)
+        if self.is_incremental and self.refresh_strategy not in incremental_strategies:
+            raise ValidationError({'refresh_strategy': _('Incremental tables are refreshed incrementally')})
+        if not self.is_incremental and self.refresh_strategy == self.RefreshStrategy.INCREMENTAL.name:
+            raise ValidationError({'refresh_strategy': _('Only incremental tables can be refreshed incrementally')})
+
+        partition_strategies = (self.RefreshStrategy.AUTO.name, self.RefreshStrategy.PARTITION.name)
+        if self.is_partitioned and self.refresh_strategy not in partition_strategies:
+            raise ValidationError({'refresh_strategy': _('Partitioned tables are refreshed by partition window')})
+        if not self.is_partitioned and self.refresh_strategy == self.RefreshStrategy.PARTITION.name:
+            raise ValidationError({'refresh_strategy': _('Only partitioned tables are refreshed by partition window')})
+        if self.is_partitioned and not self.partition_column:
+            raise ValidationError({'partition_column': _('Partitioned tables require a partition column')})
+
+        append_strategies = (self.RefreshStrategy.AUTO.name, self.RefreshStrategy.APPEND.name)
+        if self.is_append and self.refresh_strategy not in append_strategies:
+            raise ValidationError({'refresh_strategy': _('Append-only tables are refreshed by appending')})
+        if not self.is_append and self.refresh_strategy == self.RefreshStrategy.APPEND.name:
+            raise ValidationError({'refresh_strategy': _('Only append-only tables are refreshed by appending')})
+        if self.is_append and not self.watermark_column:
+            raise ValidationError({'watermark_column': _('Append-only tables require a watermark column')})
+
+        if self.create_with_no_data and self.materialization != self.Materialization.VIEW.name:
+            raise ValidationError({'create_with_no_data': _('Only materialized views can be created with no data')})
+        if self.is_partitioned and self.storage_parameters:
+            raise ValidationError({'storage_parameters': _('Partitioned tables do not support storage parameters')})
+
+        try:
+            prewarm.parse_queries(self.warm_up_queries)
+        except ValueError as e:
+            raise ValidationError({'warm_up_queries': str(e)})
+
+        if self.refresh_soft_time_limit and self.refresh_time_limit and \
+                self.refresh_soft_time_limit >= self.refresh_time_limit:
+            raise ValidationError({'refresh_soft_time_limit': _('The soft time limit must be below the time limit')})
+
+        for name in SESSION_SETTINGS:
+            value = getattr(self, name)
+            if value is None or value == '':
+                continue
+
+            try:
+                with atomic():
+                    set_local_settings({name: value})
+                    transaction.set_rollback(True, using=get_database_alias())  # only validates the value
+            except DatabaseError as e:
+                raise ValidationError({name: str(e).strip()})
+
+    @property
+    def is_incremental(self):
+        return self.materialization == self.Materialization.INCREMENTAL.name
+
+    @property
+    def is_partitioned(self):
+        return self.materialization == self.Materialization.PARTITIONED.name
+
+    @property
+    def is_append(self):
+        return self.materialization == self.Materialization.APPEND.name
+
+    def get_session_settings(self):
+        """
+        Returns the PostgreSQL settings of the refreshes and index builds of the view,
+        MATERIALIZED_VIEWS_REFRESH_SESSION_SETTINGS overridden by the settings of the view
+
+        :return: dict of setting name -> value
+        """
+        session_settings = dict(get_setting('REFRESH_SESSION_SETTINGS'))
+
+        for name in SESSION_SETTINGS:
+            value = getattr(self, name)
+            if value is not None and value != '':
+                session_settings[name] = value
+
+        return session_settings
+
+    def apply_session_settings(self):
+        """
+        Applies the settings of get_session_settings until the end of the current transaction
+        """
+        set_local_settings(self.get_session_settings())
+
+    def get_storage_sql(self, parameters=True):
+        """
+        Returns the WITH (storage parameters) and TABLESPACE clauses of the CREATE statements of the view
+
+        :param parameters: include the storage parameters, partitioned tables do not support them
+        """
+        sql = ''
+        if parameters and self.storage_parameters:
+            sql += f' WITH ({self.storage_parameters})'
+        if self.tablespace:
+            sql += f' TABLESPACE {self.tablespace}'
+
+        return sql
+
+    def get_task_options(self, countdown=None):
+        """
+        Returns the Celery options of the refresh tasks of the view, MATERIALIZED_VIEWS_REFRESH_TASK_OPTIONS
+        overridden by the queue, priority, time limits and expiry of the view
+
+        :param countdown: seconds before the task runs, the expiry counts from then
+        :return: dict of apply_async keyword arguments
+        """
+        options = dict(get_setting('REFRESH_TASK_OPTIONS'))
+        values = {
+            'queue': self.refresh_queue,
+            'priority': self.refresh_priority,
+            'soft_time_limit': self.refresh_soft_time_limit,
+            'time_limit': self.refresh_time_limit,
+            'expires': self.refresh_expire_seconds,
+        }
+        options.update({name: value for name, value in values.items() if value is not None and value != ''})
+
+        if countdown:
+            options['countdown'] = countdown
+            if options.get('expires') is not None:
+                options['expires'] += countdown
+
+        return options
+
+    def refresh_async(self, trigger=None, cascade=True, force=False, countdown=None):
+        """
+        Sends the refresh task of the view with its task options, see get_task_options
+
+        :param trigger: MaterializedViewRefreshLog.Trigger recorded in the refresh log, defaults to TASK
+        :param countdown: seconds before the refresh runs
+        :return: Celery AsyncResult
+        """
+        trigger = trigger or MaterializedViewRefreshLog.Trigger.TASK
+
+        return tasks.refresh_materialized_view.apply_async(
+            kwargs={'materialized_view_id': self.pk, 'cascade': cascade, 'force': force, 'trigger': trigger.name},
+            **self.get_task_options(countdown=countdown)
+        )
+
+    @on_view_database
+    def update_estimate(self):
+        """
+        Plans the query with EXPLAIN and stores the estimated rows, width and cost.
+        The estimate is cleared when the query cannot be planned
+
+        :return: dict with rows, width and cost, or None
+        """
+        estimate = estimates.explain(self.sql_query) or {}
+
+        self.estimated_rows = estimate.get('rows')
+        self.estimated_width = estimate.get('width')
+        self.estimated_cost = estimate.get('cost')
+        self.estimated_at = timezone.now()
+        MaterializedView.objects.filter(pk=self.pk).update(
+            estimated_rows=self.estimated_rows,
+            estimated_width=self.estimated_width,
+            estimated_cost=self.estimated_cost,
+            estimated_at=self.estimated_at
+        )
+
+        return estimate or None
+
+    def check_estimate(self):
+        """
+        Updates the estimate of the query and raises MaterializedViewCostExceeded when it is above
+        MATERIALIZED_VIEWS_MAX_ESTIMATED_COST or MATERIALIZED_VIEWS_MAX_ESTIMATED_ROWS, unless it was approved.
+        Nothing is checked when neither limit is set
+        """
+        if not estimates.has_limits():
+            return
+
+        self.update_estimate()
+
+        reason = estimates.get_exceeded_limit(self)
+        if reason:
+            raise MaterializedViewCostExceeded(self, reason)
+
+    def approve_estimate(self):
+        """
+        Allows creating and refreshing the view above the limits, as long as the estimated cost of the query
+        does not grow above the current estimate
+        """
+        self.update_estimate()
+
+        self.approved_cost = self.estimated_cost
+        MaterializedView.objects.filter(pk=self.pk).update(approved_cost=self.approved_cost)
+
+    def get_database_alias(self):
+        """
+        Returns the alias of the database where the view is created and refreshed
+        """
+        return self.database or get_setting('DATABASE')
+
     def delete(self, using=None, keep_parents=False):
         """
         Deletes the materialized view and the periodic task
@@ -67,73 +616,865 @@ class MaterializedView(models.Model):
             self.periodic_task.enabled = False
             self.periodic_task.save()
 
-    def create(self):
+    @on_view_database
+    def create(self, trigger=None, enable_periodic_refresh=True):
         """
-        Creates a new materialized view table with indexes
+        Creates a new materialized view table with indexes.
+        The table and its indexes are created in a single round trip to the database
+
+        :param trigger: MaterializedViewRefreshLog.Trigger, recorded in the refresh log
+        :param enable_periodic_refresh: enable the periodic task, bulk creation enables all the tasks at once
+        :raises MaterializedViewCostExceeded: the estimate of the query is above the limits, see check_estimate
         """
-        with transaction.atomic():
-            sql_command = f'CREATE MATERIALIZED VIEW IF NOT EXISTS {self.db_table} AS '
-            sql_command += self.sql_query
+        self.check_estimate()
+
+        with MaterializedViewRefreshLog.record(self, self.RefreshStrategy.PLAIN, trigger) as log:
+            with atomic():
+                self.apply_session_settings()
 
-            execute_raw_sql(sql_command)
+                if self.is_incremental:
+                    incremental.create(self)
+                    self._create_indexes()
+                elif self.is_partitioned:
+                    partitioned.create(self)
+                elif self.is_append:
+                    append.create(self)
+                else:
+                    sql_command = f'CREATE MATERIALIZED VIEW IF NOT EXISTS {self.db_table}{self.get_storage_sql()} AS '
+                    sql_command += self.sql_query.strip().rstrip(';')
+                    # on its own line, the query may end with a comment
+                    sql_command += '\nWITH NO DATA;' if self.create_with_no_data else '\n;'
 
-            for index in self.indexes.all():
-                index.create()
+                    execute_raw_sql('\n'.join([sql_command] + self._get_index_sql()))
 
-            self.enable_periodic_refresh()
+                self.update_dependencies()
+                self.install_change_triggers()
+                if enable_periodic_refresh:
+                    self.enable_periodic_refresh()
+                self._increment_definition_version()
 
-    def refresh(self):
+        self._record_refresh(self.RefreshStrategy.PLAIN, log.duration)
+
+        if self.create_with_no_data and not self.is_populated():
+            # the view is queryable once populated, the first refresh runs in the background
+            transaction.on_commit(lambda: self.refresh_async(trigger=trigger), using=get_database_alias())
+        else:
+            self._after_refresh(log)
+
+    def _get_index_sql(self, db_table=None):
         """
-        Concurrently refreshes the materialized view table
+        Returns the CREATE INDEX statements of all the indexes of the view
         """
-        with transaction.atomic():
-            sql_command = f'REFRESH MATERIALIZED VIEW CONCURRENTLY {self.db_table};'
+        return [index.get_create_sql(db_table) for index in self.indexes.all()]
+
+    def _create_indexes(self, db_table=None):
+        """
+        Creates all the indexes of the view in a single round trip, in the current transaction
+        """
+        statements = self._get_index_sql(db_table)
+        if statements:
+            execute_raw_sql('\n'.join(statements))
+
+    @property
+    def shadow_db_table(self):
+        """
+        Name of the table where the new version of the materialized view is built before the swap
+        """
+        return f'{self.db_table}__shadow'
+
+    @property
+    def old_db_table(self):
+        """
+        Name of the replaced version of the materialized view until it is dropped after the swap
+        """
+        return f'{self.db_table}__old'
+
+    @on_view_database
+    def rebuild(self, trigger=None, check_estimate=True):
+        """
+        Rebuilds the materialized view from the current SQL query without downtime.
+
+        The new version is built with all the indexes under a shadow name, then the names are swapped
+        in one short transaction and the old version is dropped, so readers always see either the old
+        or the new data. The views that depend on this view are rebuilt on top of the new version,
+        the partitioned and append-only tables that depend on it get their query views replaced.
+        When one of them fails, the views swapped so far get their old version back.
+        The view is simply created if it does not exist yet
+
+        :param trigger: MaterializedViewRefreshLog.Trigger, recorded in the refresh log
+        :param check_estimate: refuse to rebuild above the limits, see check_estimate
+        """
+        if not relation_exists(self.db_table):
+            return self.create(trigger=trigger)
+
+        if check_estimate:
+            self.check_estimate()
+
+        if self.is_incremental or self.is_partitioned or self.is_append:
+            return self._rebuild_table(trigger=trigger)
+
+        # incremental tables do not reference the old version, partitioned and append-only tables only
+        # through the plain view of their query, which is replaced instead of rebuilt
+        views = [
+            mv for level in topological_levels(get_dependents([self])) for mv in level
+            if mv.pk == self.pk or (not mv.is_incremental and relation_exists(mv.query_relation))
+        ]
+
+        swapped = []
+        try:
+            for mv in views:
+                if mv.pk != self.pk and mv.query_relation != mv.db_table:
+                    mv._replace_query_view()
+                    swapped.append(mv)
+                    continue
+
+                mv_trigger = trigger if mv.pk == self.pk else MaterializedViewRefreshLog.Trigger.CASCADE
+                with MaterializedViewRefreshLog.record(mv, self.RefreshStrategy.SWAP, mv_trigger) as log:
+                    mv._build_shadow()
+                    mv._swap_shadow()
+                    swapped.append(mv)
+                    mv._increment_definition_version()
+                mv._record_refresh(self.RefreshStrategy.SWAP, log.duration)
+                mv._after_refresh(log)
+        finally:
+            if len(swapped) < len(views):
+                # the dependent views that were not rebuilt still select from the old versions
+                self._restore_old_versions(swapped)
+
+        # the old versions of the dependent views select from the old version of this view
+        for mv in reversed(views):
+            if mv.query_relation == mv.db_table:
+                mv._drop_old()
+
+        self.update_dependencies()
+
+    @staticmethod
+    def _restore_old_versions(swapped):
+        """
+        Puts the replaced versions of the swapped materialized views back when the rebuild fails after the swap.
+        The query views replaced so far select from the new versions, they are replaced again before the new
+        versions are dropped
+        """
+        replaced = [mv for mv in swapped if mv.query_relation != mv.db_table]
+        views = [mv for mv in swapped if mv.query_relation == mv.db_table]
+
+        for mv in reversed(views):
+            mv._restore_old()
+        for mv in replaced:
+            mv._replace_query_view()
+        for mv in reversed(views):
+            mv._drop_shadow()
+
+    def _rebuild_table(self, trigger=None):
+        """
+        Recreates the incremental table and its change capture, or the partitioned table with all
+        its partitions, in one transaction. Readers wait until the new version is committed.
+        Append-only tables are built under a shadow name and swapped in, see append.rebuild
+        """
+        strategy = self.RefreshStrategy.SWAP if self.is_append else self.RefreshStrategy.PLAIN
+
+        with MaterializedViewRefreshLog.record(self, strategy, trigger) as log:
+            with atomic():
+                self.apply_session_settings()
+
+                if self.is_append:
+                    append.rebuild(self)
+                elif self.is_partitioned:
+                    partitioned.drop(self)
+                    partitioned.create(self)
+                else:
+                    incremental.drop(self)
+                    incremental.create(self)
+                    self._create_indexes()
+
+                self._increment_definition_version()
+
+        self._record_refresh(strategy, log.duration)
+        self._after_refresh(log)
+        self.update_dependencies()
 
-            execute_raw_sql(sql_command)
+    def _build_shadow(self):
+        """
+        Builds the materialized view and its indexes under the shadow name
+        """
+        shadow_db_table = self.shadow_db_table
+
+        with atomic():
+            self.apply_session_settings()
+            execute_raw_sql(f'DROP MATERIALIZED VIEW IF EXISTS {shadow_db_table};')
+            execute_raw_sql(f'CREATE MATERIALIZED VIEW {shadow_db_table}{self.get_storage_sql()} AS '
+                            f'{self.sql_query.strip().rstrip(";")}\n;')
+            self._create_indexes(db_table=shadow_db_table)
+
+    def _swap_shadow(self):
+        """
+        Replaces the materialized view with the shadow one in a single short transaction
+        """
+        with atomic():
+            self.apply_session_settings()
+            # left behind when an earlier swap could not be completed
+            execute_raw_sql(f'DROP MATERIALIZED VIEW IF EXISTS {self.old_db_table};')
+            execute_raw_sql(f'ALTER MATERIALIZED VIEW {self.db_table} RENAME TO {self.old_db_table};')
+            execute_raw_sql(f'ALTER MATERIALIZED VIEW {self.shadow_db_table} RENAME TO {self.db_table};')
+
+    def _restore_old(self):
+        """
+        Puts the replaced version of the materialized view back when the rebuild fails after the swap,
+        the new version is moved back to the shadow name, see _drop_shadow
+        """
+        with atomic():
+            self.apply_session_settings()
+            execute_raw_sql(f'ALTER MATERIALIZED VIEW {self.db_table} RENAME TO {self.shadow_db_table};')
+            execute_raw_sql(f'ALTER MATERIALIZED VIEW {self.old_db_table} RENAME TO {self.db_table};')
+
+        self._increment_definition_version()
+
+    def _drop_shadow(self):
+        """
+        Drops the shadow version of the materialized view
+        """
+        with atomic():
+            self.apply_session_settings()
+            execute_raw_sql(f'DROP MATERIALIZED VIEW IF EXISTS {self.shadow_db_table};')
+
+    def _replace_query_view(self):
+        """
+        Replaces the plain view of the query of a partitioned or append-only table, so that it selects from
+        the relations currently named in the query, e.g. the new version of a rebuilt source view
+        """
+        with atomic():
+            self.apply_session_settings()
+            execute_raw_sql(f'CREATE OR REPLACE VIEW {self.query_relation} AS {self.sql_query.strip().rstrip(";")}\n;')
+
+    def _drop_old(self):
+        """
+        Drops the replaced materialized view and gives the indexes of the new one their usual names
+        """
+        statements = [f'DROP MATERIALIZED VIEW {self.old_db_table};']
+        statements += [
+            f'ALTER INDEX IF EXISTS {index.get_index_name(self.shadow_db_table)} RENAME TO {index.get_index_name()};'
+            for index in self.indexes.all()
+        ]
+
+        with atomic():
+            self.apply_session_settings()
+            execute_raw_sql('\n'.join(statements))
+
+    def _increment_definition_version(self):
+        """
+        Marks the cached ORM models of the view as outdated, in this and in all the other processes
+        """
+        MaterializedView.objects.filter(pk=self.pk).update(definition_version=F('definition_version') + 1)
+        self.refresh_from_db(fields=['definition_version'])
+        orm.invalidate_model(self)
+
+    def has_unique_index(self):
+        """
+        Concurrent refresh requires at least one unique index on plain columns without a condition
+        """
+        return any(index.supports_concurrent_refresh for index in self.indexes.all())
+
+    @on_view_database
+    def is_populated(self):
+        """
+        Checks if the materialized view contains data, same as pg_matviews.ispopulated.
+        Views created WITH NO DATA cannot be refreshed concurrently
+        """
+        return is_populated(self.db_table)
+
+    def get_refresh_strategy(self):
+        """
+        Returns the strategy used for the next refresh.
+
+        The auto strategy picks:
+            * plain refresh for views without data, nobody can read them anyway
+            * concurrent refresh for views with a unique index, unless the last concurrent refresh
+              was slower than the last full rebuild (the view is mostly rewritten on every refresh).
+              The concurrent refresh is measured again once it is older than
+              MATERIALIZED_VIEWS_CONCURRENT_REFRESH_RETRY_AGE, the churn of the data may have changed
+            * otherwise a swap, or a plain refresh when other views select from this view,
+              because a swap has to rebuild them too
+        """
+        if self.is_incremental:
+            return self.RefreshStrategy.INCREMENTAL
+        if self.is_partitioned:
+            return self.RefreshStrategy.PARTITION
+        if self.is_append:
+            return self.RefreshStrategy.SWAP if self.is_full_rebuild_due() else self.RefreshStrategy.APPEND
+
+        strategy = self.RefreshStrategy[self.refresh_strategy]
+        if strategy != self.RefreshStrategy.AUTO:
+            return strategy
+
+        if not self.is_populated():
+            return self.RefreshStrategy.PLAIN
+
+        if self.has_unique_index():
+            if self.concurrent_refresh_duration is None or self.full_refresh_duration is None:
+                return self.RefreshStrategy.CONCURRENT
+
+            max_ratio = get_setting('CONCURRENT_REFRESH_MAX_RATIO')
+            if self.concurrent_refresh_duration <= self.full_refresh_duration * max_ratio:
+                return self.RefreshStrategy.CONCURRENT
+
+            if self.is_concurrent_refresh_retry_due():
+                return self.RefreshStrategy.CONCURRENT
+
+        if self.dependents.exists():
+            return self.RefreshStrategy.PLAIN
+
+        return self.RefreshStrategy.SWAP
+
+    def is_concurrent_refresh_retry_due(self):
+        """
+        The duration of the last concurrent refresh expires after MATERIALIZED_VIEWS_CONCURRENT_REFRESH_RETRY_AGE
+        """
+        retry_age = get_setting('CONCURRENT_REFRESH_RETRY_AGE')
+        if retry_age is None:
+            return False
+
+        return self.last_concurrent_refresh_date is None or \
+            (timezone.now() - self.last_concurrent_refresh_date).total_seconds() >= retry_age
+
+    @on_view_database
+    def refresh(self, trigger=None, force=False):
+        """
+        Refreshes the materialized view table with the strategy picked by get_refresh_strategy.
+        Every refresh is recorded in the refresh log.
+
+        Only one refresh of the view runs at a time, guarded by an advisory lock. A request that comes in
+        while the view is refreshing does not wait, it is merged into a single follow-up refresh that runs
+        right after the current one
+
+        :param trigger: MaterializedViewRefreshLog.Trigger, what started the refresh
+        :param force: refresh even if the source tables did not change, see skip_unchanged
+        """
+        requested = True
+
+        while True:
+            with refresh_lock(self) as acquired:
+                # a refresh that starts now also covers the requests of the pending follow-up
+                if acquired and (self._take_follow_up() or requested):
+                    self._refresh(trigger, force=force)
+                    force = False
+
+            if not acquired:
+                if not requested:
+                    return  # the running refresh takes care of the follow-up
+
+                self._request_follow_up(trigger)
+                # try once more, the running refresh may have finished before the follow-up was requested
+            elif not MaterializedView.objects.filter(pk=self.pk, refresh_follow_up_pending=True).exists():
+                return
+
+            requested = False
+            trigger = MaterializedViewRefreshLog.Trigger.FOLLOW_UP
+
+    def _request_follow_up(self, trigger=None):
+        """
+        Requests a refresh after the one that is running, merging it with the already pending request
+        """
+        views = MaterializedView.objects.filter(pk=self.pk)
+        coalesced = not views.filter(refresh_follow_up_pending=False).update(refresh_follow_up_pending=True)
+
+        views.update(
+            overlapping_refresh_count=F('overlapping_refresh_count') + 1,
+            coalesced_refresh_count=F('coalesced_refresh_count') + int(coalesced),
+        )
+
+        reason = 'Merged into the pending follow-up refresh' if coalesced else \
+            'The view is refreshing, requested a follow-up refresh'
+        MaterializedViewRefreshLog.log_skipped(self, reason, trigger)
+
+    def _take_follow_up(self):
+        """
+        Clears the pending follow-up refresh, returns whether there was one
+        """
+        return bool(
+            MaterializedView.objects.filter(pk=self.pk, refresh_follow_up_pending=True).update(
+                refresh_follow_up_pending=False
+            )
+        )
+
+    def _refresh(self, trigger=None, force=False):
+        # taken before the refresh, changes that come in during the refresh are seen by the next one
+        snapshot = self.get_source_snapshot() if self.skip_unchanged and not self.is_incremental else None
+
+        if snapshot is not None and not force and snapshot == self.get_last_source_snapshot():
+            return MaterializedViewRefreshLog.log_skipped(self, 'Source tables unchanged since the last refresh',
+                                                          trigger)
+
+        strategy = self.get_refresh_strategy()
+
+        if strategy in (self.RefreshStrategy.CONCURRENT, self.RefreshStrategy.PLAIN, self.RefreshStrategy.SWAP):
+            # the whole query runs
+            try:
+                self.check_estimate()
+            except MaterializedViewCostExceeded as e:
+                MaterializedViewRefreshLog.log_skipped(self, e, trigger)
+                raise
+
+        if strategy == self.RefreshStrategy.SWAP:
+            self.rebuild(trigger=trigger, check_estimate=False)
+        else:
+            with MaterializedViewRefreshLog.record(self, strategy, trigger) as log:
+                if strategy == self.RefreshStrategy.INCREMENTAL:
+                    incremental.refresh(self)
+                elif strategy == self.RefreshStrategy.PARTITION:
+                    partitioned.refresh(self)
+                elif strategy == self.RefreshStrategy.APPEND:
+                    append.refresh(self)
+                else:
+                    with atomic():
+                        self.apply_session_settings()
+                        concurrently = 'CONCURRENTLY ' if strategy == self.RefreshStrategy.CONCURRENT else ''
+                        sql_command = f'REFRESH MATERIALIZED VIEW {concurrently}{self.db_table};'
+
+                        execute_raw_sql(sql_command)
+
+            self._record_refresh(strategy, log.duration)
+            self._after_refresh(log)
+
+        if snapshot is not None:
+            self.source_snapshot = json.dumps(snapshot)
+            MaterializedView.objects.filter(pk=self.pk).update(source_snapshot=self.source_snapshot)
+
+    @property
+    def query_relation(self):
+        """
+        The relation defined by the query of the view,
+        partitioned and append-only tables keep their query in a plain view
+        """
+        return f'{self.db_table}__query' if self.is_partitioned or self.is_append else self.db_table
+
+    @on_view_database
+    def backfill(self, start=None, end=None, trigger=None):
+        """
+        Recomputes the partitions of a partitioned table between start and end, also the ones outside
+        of the refresh window, and creates the missing partitions. Recorded in the refresh log
+
+        :param start: datetime or date, defaults to the lowest value of the partition column
+        :param end: datetime or date, exclusive, defaults to the end of the current period
+        :param trigger: MaterializedViewRefreshLog.Trigger, what started the backfill
+        """
+        if not self.is_partitioned:
+            raise ValueError(f'{self} is not a partitioned table')
+
+        with MaterializedViewRefreshLog.record(self, self.RefreshStrategy.PARTITION, trigger) as log:
+            partitioned.backfill(self, start=start, end=end)
+
+        self._after_refresh(log)
+        self._publish_refresh()
+
+    def is_full_rebuild_due(self):
+        """
+        Append-only tables are rebuilt from the query once the last full rebuild is older than full_rebuild_interval
+        """
+        if not self.full_rebuild_interval:
+            return False
+
+        return self.last_full_rebuild_at is None or \
+            (timezone.now() - self.last_full_rebuild_at).total_seconds() >= self.full_rebuild_interval
+
+    @on_view_database
+    def get_watermark_lag(self):
+        """
+        Returns how far an append-only table is behind its query, see append.get_lag
+
+        :return: dict with the number of rows above the watermark and their age in seconds,
+            None when the table does not exist
+        """
+        if not self.is_append:
+            raise ValueError(f'{self} is not an append-only table')
+
+        return append.get_lag(self) if relation_exists(self.db_table) else None
+
+    @on_view_database
+    def get_source_snapshot(self):
+        """
+        Returns the change counters of the tables and materialized views that the view reads,
+        None when the changes cannot be tracked, see changes.get_change_snapshot
+        """
+        return changes.get_change_snapshot(get_source_tables(self.query_relation, relkinds=('r', 'p', 'm')))
+
+    def get_last_source_snapshot(self):
+        """
+        Returns the change counters of the source tables taken before the last successful refresh
+        """
+        return json.loads(self.source_snapshot) if self.source_snapshot else None
+
+    def _record_refresh(self, strategy, duration):
+        """
+        Stores the strategy and the duration of the refresh, used to pick the next strategy
+        """
+        self.last_refresh_strategy = strategy.name
+        self.last_run_date = timezone.now()
+
+        if strategy == self.RefreshStrategy.CONCURRENT:
+            self.concurrent_refresh_duration = duration
+            self.last_concurrent_refresh_date = self.last_run_date
+        else:
+            self.full_refresh_duration = duration
+
+        MaterializedView.objects.filter(pk=self.pk).update(
+            last_refresh_strategy=self.last_refresh_strategy,
+            last_run_date=self.last_run_date,
+            concurrent_refresh_duration=self.concurrent_refresh_duration,
+            last_concurrent_refresh_date=self.last_concurrent_refresh_date,
+            full_refresh_duration=self.full_refresh_duration
+        )
+        if self.is_append:
+            self._record_watermark_lag()
+        self._publish_refresh()
+
+    def _record_watermark_lag(self):
+        """
+        Stores how far the append-only table is behind its query after the refresh, exported by the metrics
+        endpoint without querying the source tables on every scrape
+        """
+        lag = append.get_lag(self)
+        self.watermark_lag_rows = lag['rows']
+        self.watermark_lag_since = None if lag['seconds'] is None else \
+            timezone.now() - timedelta(seconds=lag['seconds'])
+
+        MaterializedView.objects.filter(pk=self.pk).update(
+            watermark_lag_rows=self.watermark_lag_rows, watermark_lag_since=self.watermark_lag_since
+        )
+
+    def _after_refresh(self, log):
+        """
+        Updates the planner statistics and warms up the buffer cache once the new version of the view is written
+        """
+        self.run_maintenance(log)
+        self.run_warm_up(log)
+
+    @on_view_database
+    def run_warm_up(self, log=None):
+        """
+        Loads the view into the buffer cache when its warm-up is enabled, see prewarm.warm_up.
+        The duration is stored in the refresh log, apart from the refresh duration
+
+        :param log: MaterializedViewRefreshLog of the refresh
+        :return: dict with the method and the loaded bytes or fetched rows, None when nothing ran
+        """
+        if not self.warm_up:
+            return None
+
+        start = time.monotonic()
+        result = prewarm.warm_up(self)
+        duration = time.monotonic() - start
 
-    def drop(self):
+        if result is not None and log is not None and log.pk is not None:
+            log.warm_up_duration = duration
+            MaterializedViewRefreshLog.objects.filter(pk=log.pk).update(warm_up_duration=duration)
+
+        return result
+
+    def run_maintenance(self, log=None):
+        """
+        Runs the post_refresh_maintenance of the view after a refresh. VACUUM cannot run in a transaction,
+        ANALYZE is run instead. The duration is stored in the refresh log, apart from the refresh duration
+
+        :param log: MaterializedViewRefreshLog of the refresh
+        :return: duration in seconds, None when the view has no maintenance
+        """
+        maintenance = self.Maintenance[self.post_refresh_maintenance]
+        if maintenance == self.Maintenance.NONE:
+            return None
+
+        if maintenance == self.Maintenance.VACUUM_ANALYZE and not get_connection().in_atomic_block:
+            sql_command = f'VACUUM (ANALYZE) {self.db_table};'
+        else:
+            sql_command = f'ANALYZE {self.db_table};'
+
+        start = time.monotonic()
+        execute_raw_sql(sql_command)
+        duration = time.monotonic() - start
+
+        if log is not None and log.pk is not None:
+            log.maintenance_duration = duration
+            MaterializedViewRefreshLog.objects.filter(pk=log.pk).update(maintenance_duration=duration)
+
+        return duration
+
+    @on_view_database
+    def update_bloat_stats(self):
+        """
+        Measures the size and the bloat of the view and schedules the maintenance it needs,
+        see bloat.get_stats and bloat.get_action
+
+        :return: dict of stats, None when the view does not exist or is a partitioned table
+        """
+        stats = bloat.get_stats(self)
+        fields = dict.fromkeys(('heap_size', 'index_size', 'dead_tuple_ratio', 'bloat_ratio', 'index_bloat_ratio'))
+        fields.update(stats or {})
+        fields['bloat_checked_at'] = timezone.now()
+        fields['maintenance_due'] = bloat.get_action(stats).name
+
+        for name, value in fields.items():
+            setattr(self, name, value)
+        MaterializedView.objects.filter(pk=self.pk).update(**fields)
+
+        return stats
+
+    @on_view_database
+    def run_due_maintenance(self, trigger=None):
+        """
+        Runs the maintenance scheduled by update_bloat_stats, outside of a transaction:
+            * vacuum - VACUUM (ANALYZE) of the table
+            * reindex - VACUUM (ANALYZE) and REINDEX CONCURRENTLY of the table
+            * rebuild - rebuild of the whole view under a shadow name, see rebuild
+        Skipped while the view is refreshing, it is retried by the next run
+
+        :param trigger: MaterializedViewRefreshLog.Trigger of the rebuild, defaults to MAINTENANCE
+        :return: the BloatAction that ran, None when nothing ran
+        """
+        action = self.BloatAction[self.maintenance_due]
+        if action == self.BloatAction.NONE or not relation_exists(self.db_table):
+            return None
+
+        if get_connection().in_atomic_block:
+            raise RuntimeError('VACUUM and REINDEX CONCURRENTLY cannot run in a transaction')
+
+        with refresh_lock(self) as acquired:
+            if not acquired:
+                return None
+
+            if action == self.BloatAction.REBUILD:
+                self.rebuild(trigger=trigger or MaterializedViewRefreshLog.Trigger.MAINTENANCE)
+            else:
+                execute_raw_sql(f'VACUUM (ANALYZE) {self.db_table};')
+                if action == self.BloatAction.REINDEX:
+                    execute_raw_sql(f'REINDEX TABLE CONCURRENTLY {self.db_table};')
+
+        self.maintenance_due = self.BloatAction.NONE.name
+        self.last_maintenance = action.name
+        self.last_maintenance_at = timezone.now()
+        MaterializedView.objects.filter(pk=self.pk).update(
+            maintenance_due=self.maintenance_due, last_maintenance=self.last_maintenance,
+            last_maintenance_at=self.last_maintenance_at
+        )
+
+        return action
+
+    def _publish_refresh(self):
+        """
+        Once the new data is committed, stores the WAL position of the database and then starts a new refresh
+        generation of the read cache. The replicas serve the reads of the view after they have replayed the
+        position (see routers.MaterializedViewRouter), so a reader of the new generation never reads and caches
+        the old data, neither from the database nor from a lagging replica.
+        The generation is also bumped with the read cache disabled, it may be enabled later
+        """
+        alias = get_database_alias()
+        replicated = bool(get_setting('REPLICAS').get(alias))
+        pk = self.pk
+
+        def publish():
+            if replicated:
+                lsn = fetch_raw_sql('SELECT pg_current_wal_lsn()::text;', using=alias)[0][0]
+                MaterializedView.objects.filter(pk=pk).update(last_refresh_lsn=lsn)
+            read_cache.bump_generation(pk)
+
+        transaction.on_commit(publish, using=alias)
+
+    def refresh_with_dependents(self, trigger=None, force=False):
+        """
+        Refreshes the materialized view and then all the views that depend on it in topological order.
+        Raises MaterializedViewRefreshError if any of the views failed to refresh
+
+        :param trigger: MaterializedViewRefreshLog.Trigger, the dependents are logged as cascade refreshes
+        :param force: refresh even if the source tables did not change, see skip_unchanged
+        """
+        results = RefreshExecutor().refresh([self], cascade=True, trigger=trigger, force=force)
+
+        if not all(result.succeeded for result in results):
+            raise MaterializedViewRefreshError(results)
+
+        return results
+
+    def is_refreshed_by_sources(self):
+        """
+        Checks if the periodic refresh of a view that this view transitively selects from cascades to this view,
+        its own periodic refresh would refresh it twice then
+        """
+        sources = [mv.pk for mv in get_sources([self]) if mv.pk != self.pk]
+
+        return MaterializedView.objects.filter(
+            pk__in=sources, refresh_dependents=True, periodic_task__enabled=True
+        ).exists()
+
+    @on_view_database
+    def update_dependencies(self):
+        """
+        Stores the materialized views that this view selects from
+        and the tables that it reads, once the view exists in the database
+        """
+        self.depends_on.set(discover_dependencies(self))
+
+        if not relation_exists(self.db_table):
+            return
+
+        if self.is_incremental:
+            source_tables = [get_qualified_name(table) for table in incremental.get_source_tables(self)]
+        else:
+            source_tables = get_source_tables(self.query_relation)
+
+        self.source_tables = ','.join(table for table in source_tables if table)
+        MaterializedView.objects.filter(pk=self.pk).update(source_tables=self.source_tables)
+
+    def get_source_tables(self):
+        """
+        Returns the schema qualified tables that the view reads
+        """
+        return [table for table in self.source_tables.split(',') if table]
+
+    @on_view_database
+    def install_change_triggers(self):
+        """
+        Installs the triggers that notify the mv_listen command about writes to the source tables
+        """
+        if self.change_detection != self.ChangeDetection.TRIGGERS.name:
+            return
+
+        for table in self.get_source_tables():
+            changes.install_notify_trigger(table)
+
+    @on_view_database
+    def update_change_triggers(self):
+        """
+        Installs or removes the change triggers of an existing view after its change detection was changed
+        """
+        if not relation_exists(self.db_table):
+            return
+
+        source_tables = self.get_source_tables()
+        installed = changes.get_notify_trigger_tables(source_tables)
+
+        if self.change_detection == self.ChangeDetection.TRIGGERS.name:
+            if installed != set(source_tables):
+                self.install_change_triggers()
+        elif installed:
+            self.remove_change_triggers()
+
+    @on_view_database
+    def remove_change_triggers(self):
+        """
+        Removes the change triggers from the source tables that no other view listens to
+        """
+        other_views = MaterializedView.objects.filter(
+            change_detection=self.ChangeDetection.TRIGGERS.name
+        ).exclude(pk=self.pk)
+        tables_in_use = {table for mv in other_views for table in mv.get_source_tables()}
+
+        for table in self.get_source_tables():
+            if table not in tables_in_use:
+                changes.remove_notify_trigger(table)
+
+    @on_view_database
+    def drop(self, disable_periodic_refresh=True):
         """
         Drops the materialized view table
+
+        :param disable_periodic_refresh: disable the periodic task, bulk drops disable all the tasks at once
         """
-        with transaction.atomic():
-            sql_command = f'DROP MATERIALIZED VIEW IF EXISTS {self.db_table};'
+        with atomic():
+            if self.is_incremental:
+                incremental.drop(self)
+            elif self.is_partitioned:
+                partitioned.drop(self)
+            elif self.is_append:
+                append.drop(self)
+            else:
+                sql_command = f'DROP MATERIALIZED VIEW IF EXISTS {self.db_table};'
 
-            execute_raw_sql(sql_command)
-            self.disable_periodic_refresh()
+                execute_raw_sql(sql_command)
+
+            self.remove_change_triggers()
+            if disable_periodic_refresh:
+                self.disable_periodic_refresh()
+            self._increment_definition_version()
+            self._publish_refresh()
 
     def link_periodic_refresh_task(self):
         """
         Links the periodic task that refreshes the materialized view
         with the particular materialized view instance during post_save
         """
+        changed = False
         if self.periodic_task.task != tasks.REFRESH_MV_TASK_FULL_NAME:
             self.periodic_task.task = tasks.REFRESH_MV_TASK_FULL_NAME  # connect the custom celery task
-            self.periodic_task.kwargs = json.dumps({'materialized_view_id': self.pk})  # call the task with id param
+            changed = True
+
+        # call the task with id param, a cascading refresh also refreshes the dependents
+        task_kwargs = {'materialized_view_id': self.pk, 'cascade': self.refresh_dependents}
+        if json.loads(self.periodic_task.kwargs or '{}') != task_kwargs:
+            self.periodic_task.kwargs = json.dumps(task_kwargs)
+            changed = True
+
+        # older django_celery_beat versions lack some of the routing fields
+        field_names = {field.name for field in PeriodicTask._meta.get_fields()}
+        for name, value in self._get_periodic_task_options().items():
+            if name in field_names and getattr(self.periodic_task, name) != value:
+                setattr(self.periodic_task, name, value)
+                changed = True
+
+        if changed:
             self.periodic_task.save()
 
+    def _get_periodic_task_options(self):
+        """
+        Maps the task options of the view to the fields of the periodic task.
+        Celery beat has no time limit options, they are sent as the timelimit message header instead
+        """
+        options = self.get_task_options()
+
+        headers = json.loads(self.periodic_task.headers or '{}') if hasattr(self.periodic_task, 'headers') else {}
+        time_limits = [options.get('time_limit'), options.get('soft_time_limit')]
+        if any(limit is not None for limit in time_limits):
+            headers['timelimit'] = time_limits
+        else:
+            headers.pop('timelimit', None)
+
+        return {
+            'queue': options.get('queue') or None,
+            'priority': options.get('priority'),
+            'expire_seconds': options.get('expires'),
+            'headers': json.dumps(headers),
+        }
+
     @property
     def model(self):
         """
         Returns unmanaged Django model (excluded from migrations) that can be
-        used to run ORM queries against the materialized view table
+        used to run ORM queries against the materialized view table.
+
+        The fields are introspected from the table columns and the primary key is the column
+        of a unique index. The model is cached per process until the view is created, rebuilt or dropped
 
         Example:
 
             my_materialized_view = MaterializedView.objects.first()
             my_materialized_view.model.objects.filter(my_field=my_value)
         """
+        return orm.get_model(self)
 
-        class MaterializedViewModel(models.Model):
-            class Meta:
-                managed = False
-                db_table = self.db_table
 
-        return MaterializedViewModel
+@receiver(pre_save, sender=MaterializedView)
+def track_query_change_receiver(sender, instance, **kwargs):
+    previous = MaterializedView.objects.filter(pk=instance.pk).values_list('sql_query', 'database').first() \
+        if instance.pk else None
+    instance._query_changed = previous != (instance.sql_query, instance.database)
 
 
 @receiver(post_save, sender=MaterializedView)
 def link_periodic_refresh_task_receiver(sender, instance, created, **kwargs):
     instance.link_periodic_refresh_task()
+    instance.update_dependencies()
+    instance.update_change_triggers()
+
+    # the query is only planned again when it changed
+    if getattr(instance, '_query_changed', True):
+        instance.update_estimate()
 
     if created:
         # do not enable the periodic refresh task when a mv is created
@@ -1,13 +1,27 @@
+import hashlib
+import re
 from enum import Enum
 
 from django.conf import settings
+from django.core.exceptions import ValidationError
 from django.db import models
 from django.utils.translation import gettext_lazy as _
 
+from dj_materialized_views.dependencies import get_relation_kind, is_populated
 from dj_materialized_views.utils import (
-    execute_raw_sql
+    atomic, execute_raw_sql, fetch_raw_sql, get_connection, on_view_database, session_settings,
+    set_local_settings
 )
 
+# PostgreSQL truncates longer identifiers
+MAX_NAME_LENGTH = 63
+
+# pg_class.relkind of partitioned tables
+PARTITIONED_TABLE = 'p'
+
+# a plain column, optionally quoted
+COLUMN_PATTERN = re.compile(r'^\s*("[^"]+"|[A-Za-z_][\w$]*)\s*$')
+
 
 class MaterializedViewIndex(models.Model):
     """
@@ -19,6 +33,8 @@ class MaterializedViewIndex(models.Model):
         GIN = "gin"
         GIST = "gist"
         HASH = "hash"
+        BRIN = "brin"
+        SPGIST = "spgist"
 
         @classmethod
         def choices(cls):
@@ -31,8 +47,35 @@ class MaterializedViewIndex(models.Model):
         on_delete=models.CASCADE
     )
     index_type = models.CharField(choices=IndexType.choices(), max_length=255, default=IndexType.BTREE.value)
-    index_field = models.CharField(max_length=255, help_text='DB field to be indexed')
+    index_field = models.CharField(
+        max_length=1024,
+        help_text=_('DB fields or expressions to be indexed, comma separated, e.g. "app, created_at DESC" or '
+                    '"lower(name) text_pattern_ops". Expressions other than function calls go in parentheses')
+    )
+    include_fields = models.CharField(
+        max_length=1024, blank=True,
+        help_text=_('Comma separated columns stored in the index for index-only scans (INCLUDE), '
+                    'btree, gist and spgist only')
+    )
+    condition = models.CharField(
+        max_length=1024, blank=True,
+        help_text=_('WHERE condition of a partial index, e.g. "status = \'active\'"')
+    )
+    storage_parameters = models.CharField(
+        max_length=255, blank=True,
+        help_text=_('Comma separated storage parameters, e.g. "pages_per_range = 32" for brin '
+                    'or "fillfactor = 90"')
+    )
+    index_name = models.CharField(
+        max_length=MAX_NAME_LENGTH, blank=True,
+        help_text=_('Name of the index in the database, generated when empty')
+    )
     is_unique = models.BooleanField(default=False)
+    warm_up = models.BooleanField(
+        default=False,
+        help_text=_('Load the index into the buffer cache with the view after every refresh, '
+                    'see the warm-up of the view')
+    )
 
     created_by_user = models.ForeignKey(
         settings.AUTH_USER_MODEL,
@@ -49,26 +92,228 @@ class MaterializedViewIndex(models.Model):
     def __str__(self):
         return self.title
 
-    def create(self):
+    def clean(self):
+        index_type = self.index_type.lower()
+
+        if self.is_unique and index_type != self.IndexType.BTREE.value:
+            raise ValidationError({'is_unique': _('Only btree indexes can be unique')})
+
+        if self.include_fields and index_type not in (self.IndexType.BTREE.value, self.IndexType.GIST.value,
+                                                      self.IndexType.SPGIST.value):
+            raise ValidationError({'include_fields': _('Only btree, gist and spgist indexes support INCLUDE')})
+
+        if self.materialized_view_id is not None:
+            other_indexes = self.materialized_view.indexes.exclude(pk=self.pk)
+            if self.index_name and other_indexes.filter(index_name=self.index_name).exists():
+                raise ValidationError({'index_name': _('Another index of the view has the same name')})
+
+    def save(self, *args, **kwargs):
+        previous = MaterializedViewIndex.objects.filter(pk=self.pk).first() if self.pk else None
+        definition_changed = previous is not None and \
+            previous._get_definition_hash() != self._get_definition_hash()
+
+        if definition_changed and previous.has_generated_name():
+            self.index_name = ''
+        if not self.index_name:
+            self.index_name = self.generate_index_name()
+
+        super().save(*args, **kwargs)
+
+        if previous is not None and (definition_changed or previous.index_name != self.index_name):
+            self._replace(previous)
+
+    def has_generated_name(self):
+        """
+        Checks if the name was generated from the definition, or is the name of the earlier versions
+        """
+        return self.index_name in (self.generate_index_name(), f'{self.materialized_view.db_table}_{self.index_field}')
+
+    @on_view_database
+    def _replace(self, previous):
+        """
+        Replaces the index built from the previous definition or under the previous name, if it exists
+        """
+        db_table = previous.materialized_view.db_table
+        schema = f'{db_table.split(".")[0]}.' if '.' in db_table else ''
+
+        if fetch_raw_sql('SELECT to_regclass(%s) IS NOT NULL;', [f'{schema}{previous.index_name}'])[0][0]:
+            previous.drop()
+            self.create()
+
+    @property
+    def keys(self):
+        """
+        The indexed columns and expressions, split on the commas outside of parentheses
+        """
+        return split_list(self.index_field)
+
+    @property
+    def supports_concurrent_refresh(self):
+        """
+        REFRESH MATERIALIZED VIEW CONCURRENTLY requires a unique index on plain columns without a condition
+        """
+        return self.is_unique and not self.condition and all(COLUMN_PATTERN.match(key) for key in self.keys)
+
+    def _get_definition_hash(self):
+        definition = (self.materialized_view.db_table, self.index_type.lower(), self.index_field,
+                      self.include_fields, self.condition, self.storage_parameters, self.is_unique)
+
+        return hashlib.sha1(repr(definition).encode()).hexdigest()[:8]
+
+    def generate_index_name(self):
+        """
+        Returns a name that is unique among the indexes of the view.
+
+        A plain index on a single column keeps the `{db_table}_{index_field}` name of the earlier versions,
+        unless another index of the view already uses it. The other indexes get a hash of their definition
+        """
+        db_table = self.materialized_view.db_table
+        legacy_name = f'{db_table}_{self.index_field}'
+
+        is_plain = COLUMN_PATTERN.match(self.index_field) and not (
+            self.include_fields or self.condition or self.storage_parameters
+        )
+        other_indexes = self.materialized_view.indexes.exclude(pk=self.pk)
+        if is_plain and not other_indexes.filter(index_name=legacy_name).exists():
+            return legacy_name
+
+        columns = '_'.join(re.findall(r'\w+', self.index_field))
+
+        # unquoted names are folded to lower case by PostgreSQL
+        return truncate_name(f'{db_table.split(".")[-1]}_{columns}'.lower(), self._get_definition_hash())
+
+    def get_index_name(self, db_table=None):
+        """
+        Returns the name of the index on the materialized view table
+
+        :param db_table: name of another table with the same columns, e.g. a shadow table
+        """
+        if db_table is None or db_table == self.materialized_view.db_table:
+            return self.index_name or self.generate_index_name()
+
+        # renamed to the usual name when the shadow table replaces the view
+        digest = hashlib.sha1(self.get_index_name().encode()).hexdigest()[:8]
+
+        return truncate_name(db_table.split('.')[-1], digest)
+
+    def get_create_sql(self, db_table=None, concurrently=False):
+        """
+        Returns the CREATE INDEX statement
+
+        :param db_table: create the index on another table with the same columns, e.g. a shadow table
+        :param concurrently: build the index without blocking the readers and writers of the table
+        """
+        db_table = db_table or self.materialized_view.db_table  # linked with the materialized view table
+
+        sql_command = 'CREATE UNIQUE INDEX' if self.is_unique else 'CREATE INDEX'
+        if concurrently:
+            sql_command += ' CONCURRENTLY'
+        sql_command += f' IF NOT EXISTS {self.get_index_name(db_table)} ' \
+                       f'ON {db_table} USING {self.index_type}({", ".join(self.keys)})'
+
+        if self.include_fields:
+            sql_command += f' INCLUDE ({", ".join(split_list(self.include_fields))})'
+        if self.storage_parameters:
+            sql_command += f' WITH ({self.storage_parameters})'
+        if self.materialized_view.tablespace:
+            sql_command += f' TABLESPACE {self.materialized_view.tablespace}'
+        if self.condition:
+            sql_command += f' WHERE {self.condition}'
+
+        return sql_command + ';'
+
+    @on_view_database
+    def create(self, db_table=None, concurrently=None):
         """
         Creates an index for the materialized view table
+
+        :param db_table: create the index on another table with the same columns, e.g. a shadow table
+        :param concurrently: build the index without blocking the readers of the table. By default indexes
+            on populated views are built concurrently, unless in a transaction, which CONCURRENTLY does not allow.
+            Indexes on partitioned tables cannot be built concurrently.
+            The session settings of the view are applied to the build, see MaterializedView.get_session_settings
+        """
+        db_table = db_table or self.materialized_view.db_table  # linked with the materialized view table
+
+        if concurrently is None:
+            concurrently = not get_connection().in_atomic_block and is_populated(db_table) and \
+                get_relation_kind(db_table) != PARTITIONED_TABLE
+
+        if concurrently:
+            # a failed concurrent build leaves an invalid index behind, IF NOT EXISTS would keep it
+            self._drop_invalid(db_table)
+
+        return self._execute(self.get_create_sql(db_table, concurrently=concurrently), concurrently)
+
+    def _execute(self, sql_command, concurrently):
+        """
+        Runs the statement with the session settings of the view: SET LOCAL in a transaction,
+        or for the duration of the statement when it runs concurrently, which is not allowed in a transaction
         """
-        unique_index = 'UNIQUE' if self.is_unique else ''  # UNIQUE prefix
-        db_table = self.materialized_view.db_table  # linked with the materialized view table
-        index_name = f'{db_table}_{self.index_field}'
+        view_settings = self.materialized_view.get_session_settings()
 
-        sql_command = f'CREATE {unique_index} INDEX IF NOT EXISTS {index_name} ' \
-                      f'ON {db_table} USING {self.index_type}({self.index_field});'
+        if concurrently:
+            with session_settings(view_settings):
+                return execute_raw_sql(sql_command)
 
-        return execute_raw_sql(sql_command)
+        with atomic():
+            set_local_settings(view_settings)
+            return execute_raw_sql(sql_command)
 
+    def _drop_invalid(self, db_table):
+        schema = f'{db_table.split(".")[0]}.' if '.' in db_table else ''
+        index_name = f'{schema}{self.get_index_name(db_table)}'
+
+        rows = fetch_raw_sql(
+            'SELECT NOT indisvalid FROM pg_index WHERE indexrelid = to_regclass(%s);', [index_name]
+        )
+        if rows and rows[0][0]:
+            execute_raw_sql(f'DROP INDEX CONCURRENTLY IF EXISTS {index_name};')
+
+    @on_view_database
     def drop(self):
         """
-        Drops the index from the materialized view table
+        Drops the index from the materialized view table with the session settings of the view,
+        concurrently when not in a transaction and not on a partitioned table
         """
         db_table = self.materialized_view.db_table
-        index_name = f'{db_table}_{self.index_field}'
+        schema = f'{db_table.split(".")[0]}.' if '.' in db_table else ''
+        concurrent = not get_connection().in_atomic_block and get_relation_kind(db_table) != PARTITIONED_TABLE
+        concurrently = 'CONCURRENTLY ' if concurrent else ''
+
+        sql_command = f'DROP INDEX {concurrently}IF EXISTS {schema}{self.get_index_name()};'
+
+        return self._execute(sql_command, concurrent)
 
-        sql_command = f'DROP INDEX {index_name};'
 
-        return execute_raw_sql(sql_command)
+def split_list(value):
+    """
+    Splits a comma separated list of columns or expressions on the commas outside of parentheses and quotes
+    """
+    items, current, depth, quoted = [], '', 0, None
+
+    for char in value:
+        if quoted:
+            quoted = None if char == quoted else quoted
+        elif char in '"\'':
+            quoted = char
+        elif char == '(':
+            depth += 1
+        elif char == ')':
+            depth -= 1
+        elif char == ',' and depth == 0:
+            items.append(current.strip())
+            current = ''
+            continue
+        current += char
+
+    items.append(current.strip())
+
+    return [item for item in items if item]
+
+
+def truncate_name(prefix, digest):
+    """
+    Returns `{prefix}_{digest}`, shortening the prefix so that the name fits in a PostgreSQL identifier
+    """
+    return f'{prefix[:MAX_NAME_LENGTH - len(digest) - 1]}_{digest}'
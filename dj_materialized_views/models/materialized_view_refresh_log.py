@@ -0,0 +1,259 @@
+import time
+from contextlib import contextmanager
+from datetime import timedelta
+from enum import Enum
+
+from django.db import models
+from django.db.models.expressions import RawSQL
+from django.utils import timezone
+from django.utils.translation import gettext_lazy as _
+
+from dj_materialized_views.conf import get_setting
+from dj_materialized_views.utils import (
+    fetch_raw_sql
+)
+
+# percentiles and failure rate per materialized view, computed in the database
+REFRESH_STATS_SQL = """
+    SELECT
+        materialized_view_id,
+        count(*),
+        count(*) FILTER (WHERE status = %(failure)s),
+        percentile_cont(0.5) WITHIN GROUP (ORDER BY duration) FILTER (WHERE status = %(success)s),
+        percentile_cont(0.95) WITHIN GROUP (ORDER BY duration) FILTER (WHERE status = %(success)s),
+        max(finished_at) FILTER (WHERE status = %(success)s)
+    FROM {db_table}
+    WHERE started_at >= %(since)s
+    GROUP BY materialized_view_id
+"""
+
+# correlated subquery over the logs of every materialized view in a queryset
+REFRESH_STAT_SQL = """
+    SELECT {aggregate} FROM {db_table} log
+    WHERE log.materialized_view_id = {view_table}.id
+"""
+
+
+class MaterializedViewRefreshLog(models.Model):
+    """
+    History of the refreshes of a materialized view, one row per refresh.
+    Rows older than MATERIALIZED_VIEWS_REFRESH_LOG_RETENTION_DAYS are purged
+    """
+
+    class Status(Enum):
+        SUCCESS = "success"
+        FAILURE = "failure"
+        SKIPPED = "skipped"
+
+        @classmethod
+        def choices(cls):
+            return tuple((i.name, i.value) for i in cls)
+
+    class Trigger(Enum):
+        BEAT = "periodic task"
+        CHANGE = "source change"
+        CASCADE = "source view refreshed"
+        FOLLOW_UP = "requests during a refresh"
+        ADMIN = "admin"
+        TASK = "celery task"
+        API = "api"
+        COMMAND = "management command"
+        MAINTENANCE = "maintenance"
+
+        @classmethod
+        def choices(cls):
+            return tuple((i.name, i.value) for i in cls)
+
+    materialized_view = models.ForeignKey(
+        'dj_materialized_views.MaterializedView',
+        related_name='refresh_logs',
+        on_delete=models.CASCADE
+    )
+    strategy = models.CharField(max_length=255, blank=True)
+    status = models.CharField(choices=Status.choices(), max_length=255, default=Status.SUCCESS.name)
+    trigger = models.CharField(choices=Trigger.choices(), max_length=255, default=Trigger.API.name)
+    started_at = models.DateTimeField()
+    finished_at = models.DateTimeField(null=True, blank=True)
+    duration = models.FloatField(null=True, blank=True, help_text=_('Duration of the refresh in seconds'))
+    row_count = models.BigIntegerField(null=True, blank=True, help_text=_('Rows in the view after the refresh'))
+    estimated_rows = models.BigIntegerField(
+        null=True, blank=True, help_text=_('Rows of the query estimated by the planner before the refresh')
+    )
+    maintenance_duration = models.FloatField(
+        null=True, blank=True,
+        help_text=_('Duration of the ANALYZE or VACUUM after the refresh in seconds, not included in the duration')
+    )
+    warm_up_duration = models.FloatField(
+        null=True, blank=True,
+        help_text=_('Duration of the buffer cache warm-up after the refresh in seconds, not included in the duration')
+    )
+    size_before = models.BigIntegerField(null=True, blank=True, help_text=_('Size of the view in bytes'))
+    size_after = models.BigIntegerField(null=True, blank=True, help_text=_('Size of the view in bytes'))
+    error = models.TextField(blank=True)
+
+    class Meta:
+        verbose_name = _('Materialized View Refresh Log')
+        verbose_name_plural = _('Materialized View Refresh Logs')
+        ordering = ('-started_at',)
+        indexes = [models.Index(fields=['materialized_view', 'started_at'])]
+
+    def __str__(self):
+        return f'{self.materialized_view} {self.started_at:%Y-%m-%d %H:%M:%S} {self.status}'
+
+    @classmethod
+    @contextmanager
+    def record(cls, materialized_view, strategy, trigger=None):
+        """
+        Records the refresh that runs inside the context, also when it fails.
+        The log is written after the refresh, outside of its transaction
+
+        Example:
+
+            with MaterializedViewRefreshLog.record(mv, MaterializedView.RefreshStrategy.PLAIN):
+                execute_raw_sql(f'REFRESH MATERIALIZED VIEW {mv.db_table};')
+
+        :param materialized_view: MaterializedView instance
+        :param strategy: MaterializedView.RefreshStrategy
+        :param trigger: Trigger, what started the refresh
+        """
+        log = cls(
+            materialized_view=materialized_view,
+            strategy=strategy.name,
+            trigger=(trigger or cls.Trigger.API).name,
+            started_at=timezone.now(),
+            size_before=get_relation_size(materialized_view.db_table),
+            estimated_rows=materialized_view.estimated_rows,
+        )
+        start = time.monotonic()
+
+        try:
+            yield log
+        except Exception as e:
+            log.status = cls.Status.FAILURE.name
+            log.error = str(e) or repr(e)
+            raise
+        else:
+            log.size_after = get_relation_size(materialized_view.db_table)
+            log.row_count = get_row_count(materialized_view.db_table)
+        finally:
+            log.duration = time.monotonic() - start
+            log.finished_at = timezone.now()
+            log.save()
+            cls.purge(materialized_view)
+
+    @classmethod
+    def log_skipped(cls, materialized_view, reason, trigger=None):
+        """
+        Records a refresh that did not run, e.g. because a source view failed to refresh
+        """
+        now = timezone.now()
+
+        return cls.objects.create(
+            materialized_view=materialized_view,
+            strategy='',
+            status=cls.Status.SKIPPED.name,
+            trigger=(trigger or cls.Trigger.API).name,
+            started_at=now,
+            finished_at=now,
+            error=str(reason),
+        )
+
+    @classmethod
+    def purge(cls, materialized_view=None):
+        """
+        Deletes the logs older than MATERIALIZED_VIEWS_REFRESH_LOG_RETENTION_DAYS
+
+        :param materialized_view: only purge the logs of this view
+        :return: number of deleted logs
+        """
+        logs = cls.objects.filter(
+            started_at__lt=timezone.now() - timedelta(days=get_setting('REFRESH_LOG_RETENTION_DAYS'))
+        )
+        if materialized_view is not None:
+            logs = logs.filter(materialized_view=materialized_view)
+
+        deleted, _ = logs.delete()
+
+        return deleted
+
+    @classmethod
+    def get_stats(cls, since=None):
+        """
+        Aggregates the refresh logs per materialized view: the number of refreshes, the failure rate,
+        the p50 / p95 duration of the successful refreshes and the time of the last successful refresh
+
+        :param since: only logs started after this datetime, defaults to the whole retention period
+        :return: dict of materialized view id -> dict of stats
+        """
+        if since is None:
+            since = timezone.now() - timedelta(days=get_setting('REFRESH_LOG_RETENTION_DAYS'))
+
+        rows = fetch_raw_sql(REFRESH_STATS_SQL.format(db_table=cls._meta.db_table), {
+            'failure': cls.Status.FAILURE.name,
+            'success': cls.Status.SUCCESS.name,
+            'since': since,
+        })
+
+        return {
+            materialized_view_id: {
+                'count': count,
+                'failures': failures,
+                'failure_rate': failures / count,
+                'p50': p50,
+                'p95': p95,
+                'last_success': last_success,
+            }
+            for materialized_view_id, count, failures, p50, p95, last_success in rows
+        }
+
+    @classmethod
+    def get_stats_annotations(cls):
+        """
+        Annotations of a MaterializedView queryset with the p50 / p95 duration of the successful refreshes
+        and the failure rate, computed in the same query
+
+        Example:
+
+            MaterializedView.objects.annotate(**MaterializedViewRefreshLog.get_stats_annotations())
+        """
+        success, failure = cls.Status.SUCCESS.name, cls.Status.FAILURE.name
+        view_table = cls._meta.get_field('materialized_view').related_model._meta.db_table
+        aggregates = {
+            'refresh_duration_p50': ('percentile_cont(0.5) WITHIN GROUP (ORDER BY log.duration) '
+                                     'FILTER (WHERE log.status = %s)', [success]),
+            'refresh_duration_p95': ('percentile_cont(0.95) WITHIN GROUP (ORDER BY log.duration) '
+                                     'FILTER (WHERE log.status = %s)', [success]),
+            'refresh_failure_rate': ('(count(*) FILTER (WHERE log.status = %s))::float / nullif(count(*), 0)',
+                                     [failure]),
+        }
+
+        return {
+            name: RawSQL(
+                REFRESH_STAT_SQL.format(aggregate=aggregate, db_table=cls._meta.db_table, view_table=view_table),
+                params, output_field=models.FloatField()
+            )
+            for name, (aggregate, params) in aggregates.items()
+        }
+
+
+def get_relation_size(db_table):
+    """
+    Returns the size of the relation with its indexes in bytes, or None if it does not exist
+    """
+    rows = fetch_raw_sql('SELECT pg_total_relation_size(to_regclass(%s));', [db_table])
+
+    return rows[0][0] if rows else None
+
+
+def get_row_count(db_table):
+    """
+    Returns the number of rows of the relation. The planner estimate is used unless
+    MATERIALIZED_VIEWS_REFRESH_LOG_EXACT_ROW_COUNT is set, counting the rows reads the whole view
+    """
+    if get_setting('REFRESH_LOG_EXACT_ROW_COUNT'):
+        return fetch_raw_sql(f'SELECT count(*) FROM {db_table};')[0][0]
+
+    rows = fetch_raw_sql('SELECT reltuples::bigint FROM pg_class WHERE oid = to_regclass(%s);', [db_table])
+
+    # -1 until the view is analyzed for the first time (PostgreSQL 14+)
+    return rows[0][0] if rows and rows[0][0] >= 0 else None
@@ -0,0 +1,169 @@
+import keyword
+import re
+import threading
+
+from django.apps.registry import Apps
+from django.db import models
+
+from dj_materialized_views.read_cache import CachedQuerySet
+from dj_materialized_views.utils import fetch_raw_sql, get_connection, using_database
+
+# columns of the relation in their physical order
+COLUMNS_SQL = """
+    SELECT attribute.attname, attribute.atttypid, attribute.atttypmod, attribute.attnotnull
+    FROM pg_attribute attribute
+    WHERE attribute.attrelid = to_regclass(%s)
+        AND attribute.attnum > 0
+        AND NOT attribute.attisdropped
+    ORDER BY attribute.attnum
+"""
+
+# columns of the unique single column indexes without a predicate, e.g. the index required by concurrent refresh
+UNIQUE_COLUMNS_SQL = """
+    SELECT attribute.attname
+    FROM pg_index index
+    JOIN pg_attribute attribute
+        ON attribute.attrelid = index.indrelid
+        AND attribute.attnum = index.indkey[0]
+    WHERE index.indrelid = to_regclass(%s)
+        AND index.indisunique
+        AND index.indnkeyatts = 1
+        AND index.indpred IS NULL
+    ORDER BY index.indisprimary DESC, index.indexrelid
+"""
+
+# helper columns of the incremental tables, not part of the query result
+HIDDEN_COLUMN_PREFIX = '__mv_'
+
+# the generated models live in their own registry, so they never clash with the project models
+registry = Apps()
+
+_models = {}
+_lock = threading.Lock()
+
+
+def get_model(materialized_view):
+    """
+    Returns the unmanaged Django model of the materialized view table, with a field for every column.
+    The model is built once per process and definition version of the view.
+    The queries of the model are cached until the next refresh when the read cache of the view is enabled
+
+    :param materialized_view: MaterializedView instance
+    :return: Django model class
+    """
+    key = (materialized_view.pk, materialized_view.definition_version, materialized_view.read_cache,
+           materialized_view.get_database_alias())
+
+    with _lock:
+        if key not in _models:
+            _unregister(materialized_view.pk)
+            with using_database(materialized_view.get_database_alias()):
+                _models[key] = build_model(materialized_view)
+
+        return _models[key]
+
+
+def invalidate_model(materialized_view):
+    """
+    Forgets the model of the materialized view, the next get_model call introspects the table again
+    """
+    with _lock:
+        _unregister(materialized_view.pk)
+
+
+def _unregister(materialized_view_id):
+    for key in [key for key in _models if key[0] == materialized_view_id]:
+        model = _models.pop(key)
+        registry.all_models[model._meta.app_label].pop(model._meta.model_name, None)
+
+    registry.clear_cache()
+
+
+def build_model(materialized_view):
+    """
+    Builds the model from the columns of the table found in pg_attribute.
+    The primary key is the column of a unique index, or the id column (otherwise the first column)
+    when there is no unique index
+    """
+    columns = [column for column in fetch_raw_sql(COLUMNS_SQL, [materialized_view.db_table])
+               if not column[0].startswith(HIDDEN_COLUMN_PREFIX)]
+    column_names = [column[0] for column in columns]
+
+    unique_columns = [row[0] for row in fetch_raw_sql(UNIQUE_COLUMNS_SQL, [materialized_view.db_table])]
+    primary_key = next((column for column in unique_columns if column in column_names), None)
+    if primary_key is None and column_names:
+        # Django models need a primary key, the id column or the first column stands in for it
+        primary_key = 'id' if 'id' in column_names else column_names[0]
+
+    attrs = {
+        '__module__': __name__,
+        # used by routers.MaterializedViewRouter
+        '_materialized_view_id': materialized_view.pk,
+        '_materialized_view_database': materialized_view.get_database_alias(),
+        'Meta': type('Meta', (), {
+            'managed': False,
+            'db_table': materialized_view.db_table,
+            'app_label': 'dj_materialized_views',
+            'apps': registry,
+        }),
+    }
+    if materialized_view.read_cache:
+        attrs['objects'] = CachedQuerySet.for_view(materialized_view.pk)
+
+    field_names = set()
+    for name, type_oid, type_modifier, not_null in columns:
+        field_name = get_field_name(name, field_names)
+        field_names.add(field_name)
+
+        attrs[field_name] = get_field(
+            type_oid, type_modifier,
+            db_column=name,
+            null=not not_null,
+            primary_key=name == primary_key,
+            unique=name in unique_columns and name != primary_key,
+        )
+
+    class_name = f'MaterializedView{materialized_view.pk}V{materialized_view.definition_version}'
+
+    return type(class_name, (models.Model,), attrs)
+
+
+def get_field(type_oid, type_modifier, **kwargs):
+    """
+    Returns the Django field for the PostgreSQL type, TextField for the types Django does not introspect
+    """
+    field_type = get_connection().introspection.data_types_reverse.get(type_oid, 'TextField')
+    field_class = getattr(models, field_type, models.TextField)
+
+    if field_class is models.CharField:
+        kwargs['max_length'] = type_modifier - 4 if type_modifier > 4 else None
+    elif field_class is models.DecimalField:
+        # numeric without precision has no type modifier
+        if type_modifier > 4:
+            kwargs['max_digits'] = ((type_modifier - 4) >> 16) & 0xffff
+            kwargs['decimal_places'] = (type_modifier - 4) & 0xffff
+        else:
+            kwargs.update(max_digits=None, decimal_places=None)
+
+    if kwargs.get('primary_key'):
+        kwargs['null'] = False
+
+    return field_class(**kwargs)
+
+
+def get_field_name(column, taken):
+    """
+    Turns the column name into a valid and unique model field name, e.g. "Total Count" -> total_count
+    """
+    name = re.sub(r'\W+', '_', column).lower()
+    name = re.sub(r'_+', '_', name).strip('_') or 'column'
+
+    if name[0].isdigit() or keyword.iskeyword(name) or name == 'pk':
+        name = f'field_{name}'
+
+    unique_name, i = name, 1
+    while unique_name in taken:
+        i += 1
+        unique_name = f'{name}_{i}'
+
+    return unique_name
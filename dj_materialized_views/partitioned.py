@@ -0,0 +1,304 @@
+"""
+Materialized views kept as tables partitioned by a time column.
+
+The query is kept as a plain view (`<db_table>__query`) and its result is stored in a table partitioned
+by range of the partition column, one partition per day, week, month or year:
+
+    orders_summary                  partitioned table, queried like any other view
+        orders_summary_p20240101    rows of January 2024
+        orders_summary_p20240201    rows of February 2024
+        orders_summary_default      rows without a partition: NULL keys and keys after the refresh window
+
+A refresh recomputes only the partitions inside the trailing window, the current period and the
+`partition_window - 1` periods before it. Every partition is built as a new table with its indexes, then
+all of them are swapped in with DETACH / ATTACH PARTITION in one short transaction, so readers see either
+the old or the new data. Older partitions stay frozen until they are backfilled.
+"""
+import datetime
+
+from django.utils import timezone
+
+from dj_materialized_views.dependencies import relation_exists
+from dj_materialized_views.utils import atomic, execute_raw_sql, fetch_raw_sql, get_connection
+
+# the rows of the recomputed partitions, the query runs once per refresh
+WINDOW_TABLE = '__mv_window'
+# lets ATTACH PARTITION skip the scan of the new partition
+BOUND_CONSTRAINT = '__mv_bound'
+# leaves room for the __new suffix and the hash of the index names, see MaterializedViewIndex.get_index_name
+MAX_TABLE_PREFIX_LENGTH = 38
+
+# lower bounds of the partitions, NULL for the default partition
+PARTITIONS_SQL = """
+    SELECT
+        child.relname,
+        (regexp_match(pg_get_expr(child.relpartbound, child.oid), 'FROM \\(''([^'']+)''\\)'))[1]::timestamp
+    FROM pg_inherits inheritance
+    JOIN pg_class child ON child.oid = inheritance.inhrelid
+    WHERE inheritance.inhparent = to_regclass(%s)
+"""
+
+
+def truncate(value, interval):
+    """
+    Returns the start of the day, week (Monday), month or year that contains the value
+
+    :param value: datetime or date
+    :param interval: MaterializedView.PartitionInterval name
+    """
+    value = datetime.datetime(value.year, value.month, value.day)
+
+    if interval == 'WEEK':
+        return value - datetime.timedelta(days=value.weekday())
+    if interval == 'MONTH':
+        return value.replace(day=1)
+    if interval == 'YEAR':
+        return value.replace(month=1, day=1)
+
+    return value
+
+
+def add_interval(value, interval, count=1):
+    """
+    Moves the start of a period by count periods, backwards for a negative count
+    """
+    if interval == 'DAY':
+        return value + datetime.timedelta(days=count)
+    if interval == 'WEEK':
+        return value + datetime.timedelta(weeks=count)
+    if interval == 'MONTH':
+        years, month = divmod(value.month - 1 + count, 12)
+        return value.replace(year=value.year + years, month=month + 1)
+
+    return value.replace(year=value.year + count)
+
+
+def get_periods(start, end, interval):
+    """
+    Returns the starts of the periods from the one that contains start up to end, exclusive
+    """
+    periods = []
+    period = truncate(start, interval)
+
+    while period < end:
+        periods.append(period)
+        period = add_interval(period, interval)
+
+    return periods
+
+
+def _to_naive(value):
+    """
+    Converts a date or an aware datetime to a naive datetime in the time zone of the database connection
+    """
+    if not isinstance(value, datetime.datetime):
+        return datetime.datetime(value.year, value.month, value.day)
+    if timezone.is_aware(value):
+        return timezone.make_naive(value, get_connection().timezone)
+
+    return value
+
+
+def _literal(value):
+    return f"'{value:%Y-%m-%d %H:%M:%S}'"
+
+
+def _qualify(materialized_view, name):
+    schema = materialized_view.db_table.split('.')[0] if '.' in materialized_view.db_table else None
+
+    return f'{schema}.{name}' if schema else name
+
+
+def get_default_partition(materialized_view):
+    return f'{materialized_view.db_table.split(".")[-1][:MAX_TABLE_PREFIX_LENGTH]}_default'
+
+
+def get_partition_name(materialized_view, start):
+    return f'{materialized_view.db_table.split(".")[-1][:MAX_TABLE_PREFIX_LENGTH]}_p{start:%Y%m%d}'
+
+
+def get_partitions(materialized_view):
+    """
+    Returns the partitions of the table except the default one, by their lower bound
+
+    :return: dict of period start -> partition name
+    """
+    rows = fetch_raw_sql(PARTITIONS_SQL, [materialized_view.db_table])
+
+    return {start: name for name, start in rows if start is not None}
+
+
+def get_current_period(materialized_view):
+    """
+    Returns the start of the current period, the clock of the database is used
+    """
+    now = fetch_raw_sql('SELECT localtimestamp;')[0][0]
+
+    return truncate(now, materialized_view.partition_interval)
+
+
+def get_window(materialized_view):
+    """
+    Returns the starts of the periods recomputed by a refresh: the trailing window,
+    and the periods after the last partition if the table was not refreshed for longer than the window
+    """
+    interval = materialized_view.partition_interval
+    current = get_current_period(materialized_view)
+    window_start = add_interval(current, interval, 1 - max(materialized_view.partition_window, 1))
+
+    existing = get_partitions(materialized_view)
+    if existing:
+        window_start = min(window_start, add_interval(max(existing), interval))
+
+    return get_periods(window_start, add_interval(current, interval), interval)
+
+
+def create(materialized_view):
+    """
+    Creates the partitioned table with its indexes and all the partitions up to the current period
+    """
+    db_table = materialized_view.db_table
+    query_view = materialized_view.query_relation
+
+    execute_raw_sql(f'CREATE OR REPLACE VIEW {query_view} AS {materialized_view.sql_query.strip().rstrip(";")}\n;')
+    execute_raw_sql(f'CREATE TABLE IF NOT EXISTS {db_table} (LIKE {query_view}) '
+                    f'PARTITION BY RANGE ({materialized_view.partition_column})'
+                    f'{materialized_view.get_storage_sql(parameters=False)};')
+    default_partition = _qualify(materialized_view, get_default_partition(materialized_view))
+    execute_raw_sql(f'CREATE TABLE IF NOT EXISTS {default_partition} PARTITION OF {db_table} DEFAULT'
+                    f'{materialized_view.get_storage_sql(parameters=False)};')
+
+    # created on the partitioned table, the partitions get them on attach
+    materialized_view._create_indexes()
+
+    backfill(materialized_view)
+
+
+def drop(materialized_view):
+    """
+    Drops the partitioned table with all the partitions and the view of the query
+    """
+    execute_raw_sql(f'DROP TABLE IF EXISTS {materialized_view.db_table};')
+    execute_raw_sql(f'DROP VIEW IF EXISTS {materialized_view.query_relation};')
+
+
+def refresh(materialized_view):
+    """
+    Recomputes the partitions of the trailing window and the default partition
+    """
+    rebuild_partitions(materialized_view, get_window(materialized_view))
+
+
+def backfill(materialized_view, start=None, end=None):
+    """
+    Recomputes the partitions of the periods between start and end, creating the missing ones
+
+    :param start: datetime or date, defaults to the lowest value of the partition column
+    :param end: datetime or date, exclusive, defaults to the end of the current period
+    """
+    interval = materialized_view.partition_interval
+
+    if start is None:
+        column = materialized_view.partition_column
+        start = fetch_raw_sql(f'SELECT min({column})::timestamp FROM {materialized_view.query_relation};')[0][0]
+    if end is None:
+        end = add_interval(get_current_period(materialized_view), interval)
+
+    periods = get_periods(_to_naive(start), _to_naive(end), interval) if start is not None else []
+
+    rebuild_partitions(materialized_view, periods)
+
+
+def rebuild_partitions(materialized_view, periods):
+    """
+    Recomputes the partitions of the given periods and the default partition in one transaction.
+    New tables are built with all the indexes first, then they replace the old partitions at once
+
+    :param materialized_view: MaterializedView instance
+    :param periods: starts of the periods, see get_periods
+    """
+    with atomic():
+        materialized_view.apply_session_settings()
+        _rebuild_partitions(materialized_view, periods)
+
+
+def _rebuild_partitions(materialized_view, periods):
+    db_table = materialized_view.db_table
+    column = materialized_view.partition_column
+    interval = materialized_view.partition_interval
+
+    existing = get_partitions(materialized_view)
+    starts = sorted(set(existing) | set(periods))
+
+    # everything outside of the partitions
+    default_condition = f'{column} IS NULL'
+    if starts:
+        default_condition += f' OR {column} < {_literal(starts[0])} ' \
+                             f'OR {column} >= {_literal(add_interval(starts[-1], interval))}'
+
+    window_condition = default_condition
+    if periods:
+        window_condition += f' OR ({column} >= {_literal(min(periods))} ' \
+                            f'AND {column} < {_literal(add_interval(max(periods), interval))})'
+
+    execute_raw_sql(f'DROP TABLE IF EXISTS {WINDOW_TABLE};')
+    execute_raw_sql(f'CREATE TEMPORARY TABLE {WINDOW_TABLE} ON COMMIT DROP AS '
+                    f'SELECT * FROM {materialized_view.query_relation} WHERE {window_condition};')
+
+    partitions = []  # (name, bound, condition)
+    for start in sorted(periods):
+        end = add_interval(start, interval)
+        partitions.append((
+            existing.get(start) or get_partition_name(materialized_view, start),
+            f'FOR VALUES FROM ({_literal(start)}) TO ({_literal(end)})',
+            f'{column} >= {_literal(start)} AND {column} < {_literal(end)}',
+        ))
+    partitions.append((get_default_partition(materialized_view), 'DEFAULT', default_condition))
+
+    for name, bound, condition in partitions:
+        new_table = _qualify(materialized_view, f'{name}__new')
+
+        statements = [
+            f'DROP TABLE IF EXISTS {new_table};',
+            f'CREATE TABLE {new_table} (LIKE {db_table}){materialized_view.get_storage_sql(parameters=False)};',
+            f'INSERT INTO {new_table} SELECT * FROM {WINDOW_TABLE} WHERE {condition};',
+        ]
+        if bound != 'DEFAULT':
+            statements.append(f'ALTER TABLE {new_table} ADD CONSTRAINT {BOUND_CONSTRAINT} '
+                              f'CHECK ({column} IS NOT NULL AND {condition});')
+        execute_raw_sql('\n'.join(statements))
+
+        materialized_view._create_indexes(db_table=new_table)
+
+    _swap_partitions(materialized_view, partitions)
+
+
+def _swap_partitions(materialized_view, partitions):
+    """
+    Replaces the partitions with the new tables in one round trip. The default partition is detached first
+    and attached last, so PostgreSQL does not scan it for rows of the new partitions
+    """
+    db_table = materialized_view.db_table
+    detach, attach = [], []
+
+    for name, bound, _ in sorted(partitions, key=lambda partition: partition[1] != 'DEFAULT'):
+        table = _qualify(materialized_view, name)
+        if relation_exists(table):
+            detach += [f'ALTER TABLE {db_table} DETACH PARTITION {table};', f'DROP TABLE {table};']
+
+    for name, bound, _ in sorted(partitions, key=lambda partition: partition[1] == 'DEFAULT'):
+        table = _qualify(materialized_view, name)
+        new_table = _qualify(materialized_view, f'{name}__new')
+
+        attach += [
+            f'ALTER TABLE {db_table} ATTACH PARTITION {new_table} {bound};',
+            f'ALTER TABLE {new_table} RENAME TO {name};',
+            f'ALTER TABLE {table} DROP CONSTRAINT IF EXISTS {BOUND_CONSTRAINT};',
+        ]
+        attach += [
+            f'ALTER INDEX IF EXISTS {_qualify(materialized_view, index.get_index_name(new_table))} '
+            f'RENAME TO {index.get_index_name(table)};'
+            for index in materialized_view.indexes.all()
+        ]
+
+    execute_raw_sql('\n'.join(detach + attach))
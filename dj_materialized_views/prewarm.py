@@ -0,0 +1,183 @@
+"""
+Warm-up of the buffer cache after a refresh.
+
+A refresh or a rebuild writes a new version of the view, the first queries afterwards read it from disk.
+With the pg_prewarm extension installed the warm-up loads the blocks of the warm-up indexes and then of the
+table into shared buffers:
+
+    SELECT pg_prewarm('orders_summary_created_at', 'buffer', 'main', 0, 127)
+
+Without it the warm-up queries of the view are run through its model, e.g.
+
+    [{"filter": {"status": "active"}, "order_by": ["-amount"], "limit": 100}]
+
+The warm-up reads at most the budget of the view, MATERIALIZED_VIEWS_WARM_UP_MAX_BYTES by default, capped by
+MATERIALIZED_VIEWS_WARM_UP_MAX_SHARED_BUFFERS_RATIO of shared_buffers so that it cannot evict the rest of the
+cache. The queries cannot be limited to a number of bytes, they only run when the whole view fits in the budget.
+"""
+import json
+
+from dj_materialized_views import partitioned
+from dj_materialized_views.conf import get_setting
+from dj_materialized_views.utils import fetch_raw_sql, get_database_alias
+
+# keys of a warm-up query
+QUERY_KEYS = ('filter', 'exclude', 'order_by', 'limit')
+# rows of a warm-up query without a limit
+DEFAULT_QUERY_LIMIT = 1000
+
+SHARED_BUFFERS_SQL = """
+    SELECT setting::bigint * current_setting('block_size')::bigint FROM pg_settings WHERE name = 'shared_buffers'
+"""
+
+# blocks of the relations that exist, in the given order
+BLOCKS_SQL = """
+    SELECT name, pg_relation_size(to_regclass(name)) / current_setting('block_size')::bigint
+    FROM unnest(%s::text[]) WITH ORDINALITY AS relation(name, position)
+    WHERE to_regclass(name) IS NOT NULL
+    ORDER BY position
+"""
+
+
+def has_pg_prewarm():
+    return bool(fetch_raw_sql("SELECT 1 FROM pg_extension WHERE extname = 'pg_prewarm';"))
+
+
+def get_block_size():
+    return int(fetch_raw_sql("SELECT current_setting('block_size');")[0][0])
+
+
+def get_budget(materialized_view):
+    """
+    Returns the number of bytes the warm-up of the view may load into the buffer cache
+    """
+    budget = materialized_view.warm_up_max_bytes
+    if budget is None:
+        budget = get_setting('WARM_UP_MAX_BYTES')
+
+    shared_buffers = fetch_raw_sql(SHARED_BUFFERS_SQL)[0][0]
+
+    return min(budget, int(shared_buffers * get_setting('WARM_UP_MAX_SHARED_BUFFERS_RATIO')))
+
+
+def get_tables(materialized_view):
+    """
+    Returns the tables that hold the rows of the view, the partitions of partitioned tables, the most recent first
+    """
+    if not materialized_view.is_partitioned:
+        return [materialized_view.db_table]
+
+    return [
+        partitioned._qualify(materialized_view, name)
+        for _, name in sorted(partitioned.get_partitions(materialized_view).items(), reverse=True)
+    ]
+
+
+def get_relations(materialized_view):
+    """
+    Returns the relations to warm up in order: the warm-up indexes before the table they belong to
+    """
+    db_table = materialized_view.db_table
+    indexes = [index for index in materialized_view.indexes.all() if index.warm_up]
+
+    schema = f'{db_table.split(".")[0]}.' if '.' in db_table else ''
+    relations = []
+    for table in get_tables(materialized_view):
+        relations += [f'{schema}{index.get_index_name(table)}' for index in indexes]
+        relations.append(table)
+
+    return relations
+
+
+def get_plan(materialized_view, budget):
+    """
+    Splits the budget among the relations of the view in the order of get_relations
+
+    :param budget: bytes
+    :return: list of (relation, number of blocks from the start of the relation)
+    """
+    remaining = budget // get_block_size()
+    plan = []
+
+    for relation, blocks in fetch_raw_sql(BLOCKS_SQL, [get_relations(materialized_view)]):
+        blocks = min(blocks, remaining)
+        if blocks:
+            plan.append((relation, blocks))
+            remaining -= blocks
+
+    return plan
+
+
+def prewarm(materialized_view, budget):
+    """
+    Loads the blocks of the plan into shared buffers with pg_prewarm
+
+    :return: loaded bytes
+    """
+    blocks = 0
+    for relation, count in get_plan(materialized_view, budget):
+        blocks += fetch_raw_sql("SELECT pg_prewarm(%s, 'buffer', 'main', 0, %s);", [relation, count - 1])[0][0]
+
+    return blocks * get_block_size()
+
+
+def parse_queries(value):
+    """
+    Parses and validates the warm-up queries of a view
+
+    :param value: JSON list of objects with filter, exclude, order_by and limit keys
+    :return: list of dicts
+    :raises ValueError: the queries are not valid
+    """
+    queries = json.loads(value) if value else []
+
+    if not isinstance(queries, list) or not all(isinstance(query, dict) for query in queries):
+        raise ValueError('Expected a list of objects')
+    for query in queries:
+        unknown = set(query) - set(QUERY_KEYS)
+        if unknown:
+            raise ValueError(f'Unknown keys {", ".join(sorted(unknown))}, expected {", ".join(QUERY_KEYS)}')
+
+    return queries
+
+
+def run_queries(materialized_view):
+    """
+    Runs the warm-up queries of the view through its model
+
+    :return: number of fetched rows
+    """
+    rows = 0
+
+    for query in parse_queries(materialized_view.warm_up_queries):
+        queryset = materialized_view.model.objects.using(get_database_alias())
+        queryset = queryset.filter(**query.get('filter', {})).exclude(**query.get('exclude', {}))
+        if query.get('order_by'):
+            queryset = queryset.order_by(*query['order_by'])
+
+        rows += len(list(queryset[:query.get('limit', DEFAULT_QUERY_LIMIT)]))
+
+    return rows
+
+
+def warm_up(materialized_view):
+    """
+    Warms up the view with pg_prewarm, or with the warm-up queries when the extension is not installed
+    and the view fits in the budget
+
+    :return: dict with the method and the loaded bytes or fetched rows, None when nothing ran
+    """
+    budget = get_budget(materialized_view)
+
+    if has_pg_prewarm():
+        return {'method': 'pg_prewarm', 'bytes': prewarm(materialized_view, budget)}
+
+    if not materialized_view.warm_up_queries:
+        return None
+
+    size = fetch_raw_sql('SELECT sum(pg_total_relation_size(to_regclass(name))) FROM unnest(%s::text[]) AS name;',
+                         [get_tables(materialized_view)])[0][0]
+    if size is None or size > budget:
+        return None
+
+    return {'method': 'queries', 'rows': run_queries(materialized_view)}
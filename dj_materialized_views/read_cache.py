@@ -0,0 +1,182 @@
+import hashlib
+import uuid
+
+from django.core.cache import caches
+from django.core.exceptions import EmptyResultSet
+from django.db import models
+from django.db.models.query import FlatValuesListIterable, ModelIterable, ValuesIterable, ValuesListIterable
+
+from dj_materialized_views.conf import get_setting
+
+KEY_PREFIX = 'dj_materialized_views'
+
+
+def get_cache():
+    return caches[get_setting('READ_CACHE_ALIAS')]
+
+
+def _key(materialized_view_id, name):
+    return f'{KEY_PREFIX}:{materialized_view_id}:{name}'
+
+
+def get_generation(materialized_view_id):
+    """
+    Returns the refresh generation of the view, part of the key of every cached query result.
+    A new random generation is used when the cache lost the current one, so old results are never served
+    """
+    cache = get_cache()
+    key = _key(materialized_view_id, 'generation')
+
+    generation = cache.get(key)
+    if generation is None:
+        cache.add(key, uuid.uuid4().hex, timeout=None)
+        generation = cache.get(key)
+
+    return generation
+
+
+def bump_generation(materialized_view_id):
+    """
+    Invalidates all the cached query results of the view, called after every change of its data
+    """
+    get_cache().set(_key(materialized_view_id, 'generation'), uuid.uuid4().hex, timeout=None)
+
+
+def _count(materialized_view_id, name):
+    cache = get_cache()
+    key = _key(materialized_view_id, name)
+
+    cache.add(key, 0, timeout=None)
+    try:
+        cache.incr(key)
+    except ValueError:  # evicted in between
+        pass
+
+
+def get_stats(materialized_view_id):
+    """
+    Returns the number of cache hits and misses of the view, shared by all the processes using the cache
+    """
+    cache = get_cache()
+
+    return {
+        'hits': cache.get(_key(materialized_view_id, 'hits'), 0),
+        'misses': cache.get(_key(materialized_view_id, 'misses'), 0),
+    }
+
+
+class CachedQuerySet(models.QuerySet):
+    """
+    Queryset of a materialized view model that keeps the query results in the Django cache until the view
+    is refreshed. Model instances, values() and values_list() results, count() and aggregate() are cached.
+    Querysets with select_related, prefetch_related, only / defer or named values_list always hit the database
+    """
+
+    materialized_view_id = None
+
+    @classmethod
+    def for_view(cls, materialized_view_id):
+        """
+        Returns the manager of the model of the given view
+        """
+        return type(cls.__name__, (cls,), {'materialized_view_id': materialized_view_id}).as_manager()
+
+    @property
+    def _view_db(self):
+        """
+        The database of the view. Its replicas serve the same data, a replica is only picked when the cache misses
+        """
+        return self._db or getattr(self.model, '_materialized_view_database', None) or self.db
+
+    def _cache_key(self, *extra):
+        try:
+            sql, params = self.query.sql_with_params()
+        except EmptyResultSet:
+            return None
+
+        generation = get_generation(self.materialized_view_id)
+        digest = hashlib.sha1(repr((self._view_db, sql, params) + extra).encode()).hexdigest()
+
+        return _key(self.materialized_view_id, f'{generation}:{digest}')
+
+    def _cached(self, key, fetch, to_cache=lambda value: value, from_cache=lambda value: value):
+        if key is None:
+            return fetch()
+
+        cache = get_cache()
+        cached = cache.get(key)
+        if cached is not None:
+            _count(self.materialized_view_id, 'hits')
+            return from_cache(cached)
+
+        _count(self.materialized_view_id, 'misses')
+        value = fetch()
+
+        if not isinstance(value, list) or len(value) <= get_setting('READ_CACHE_MAX_ROWS'):
+            cache.set(key, to_cache(value), timeout=get_setting('READ_CACHE_TIMEOUT'))
+
+        return value
+
+    def _is_cacheable(self):
+        if self._prefetch_related_lookups or self.query.select_related:
+            return False
+
+        if self._iterable_class is ModelIterable:
+            return self.query.deferred_loading == (frozenset(), True)
+
+        return self._iterable_class in (ValuesIterable, ValuesListIterable, FlatValuesListIterable)
+
+    def _fetch_all(self):
+        if self._result_cache is not None or not self._is_cacheable():
+            return super()._fetch_all()
+
+        def fetch():
+            super(CachedQuerySet, self)._fetch_all()
+            return self._result_cache
+
+        self._result_cache = self._cached(
+            self._cache_key(self._iterable_class.__name__),
+            fetch,
+            to_cache=self._rows_to_cache,
+            from_cache=self._rows_from_cache,
+        )
+
+    def _rows_to_cache(self, rows):
+        # the generated model classes cannot be pickled, their field values are cached instead
+        if self._iterable_class is not ModelIterable:
+            return rows
+
+        field_names = [field.attname for field in self.model._meta.concrete_fields]
+        annotation_names = list(self.query.annotation_select)
+
+        return [
+            tuple(getattr(instance, name) for name in field_names + annotation_names)
+            for instance in rows
+        ]
+
+    def _rows_from_cache(self, rows):
+        if self._iterable_class is not ModelIterable:
+            return rows
+
+        field_names = [field.attname for field in self.model._meta.concrete_fields]
+        annotation_names = list(self.query.annotation_select)
+
+        instances = []
+        for row in rows:
+            instance = self.model.from_db(self._view_db, field_names, row[:len(field_names)])
+            for name, value in zip(annotation_names, row[len(field_names):]):
+                setattr(instance, name, value)
+            instances.append(instance)
+
+        return instances
+
+    def count(self):
+        if self._result_cache is not None:
+            return len(self._result_cache)
+
+        return self._cached(self._cache_key('count'), super().count)
+
+    def aggregate(self, *args, **kwargs):
+        key = self._cache_key('aggregate', repr(args), repr(sorted(kwargs.items())))
+
+        return self._cached(key, lambda: super(CachedQuerySet, self).aggregate(*args, **kwargs))
@@ -0,0 +1,98 @@
+"""
+Routing of the ORM queries of the materialized views, see MaterializedView.model:
+
+    DATABASE_ROUTERS = ['dj_materialized_views.routers.MaterializedViewRouter']
+
+The reads of a view go to a replica of its database from MATERIALIZED_VIEWS_REPLICAS that has replayed the WAL
+position stored after the last refresh, so a reader never sees the data of an older refresh. When no replica
+has caught up yet, the reads go to the database of the view, as do the writes
+"""
+import random
+import threading
+
+from django.db import DatabaseError
+
+from dj_materialized_views.conf import get_setting
+from dj_materialized_views.utils import fetch_raw_sql
+
+REPLAY_POSITION_SQL = 'SELECT pg_is_in_recovery(), pg_last_wal_replay_lsn()::text;'
+
+# highest WAL position that every replica is known to have replayed, replay positions only move forward
+_replayed = {}
+_lock = threading.Lock()
+
+
+def parse_lsn(lsn):
+    """
+    Converts a PostgreSQL WAL position, e.g. "16/B374D848", to a comparable number
+    """
+    high, low = lsn.split('/')
+
+    return (int(high, 16) << 32) + int(low, 16)
+
+
+def has_replayed(alias, lsn):
+    """
+    Checks if the database has replayed the WAL position. A database that is not a standby always has,
+    a replica that cannot be reached has not
+
+    :param alias: database alias of the replica
+    :param lsn: WAL position, e.g. MaterializedView.last_refresh_lsn
+    """
+    if not lsn:
+        return True
+
+    position = parse_lsn(lsn)
+    if _replayed.get(alias, -1) >= position:
+        return True
+
+    try:
+        in_recovery, replayed = fetch_raw_sql(REPLAY_POSITION_SQL, using=alias)[0]
+    except DatabaseError:
+        return False
+
+    if in_recovery and replayed is None:
+        return False
+
+    replayed = parse_lsn(replayed) if in_recovery else position
+    with _lock:
+        _replayed[alias] = max(_replayed.get(alias, -1), replayed)
+
+    return replayed >= position
+
+
+def get_read_database(materialized_view_id, database):
+    """
+    Returns a replica of the database that has replayed the last refresh of the view, in random order
+    to spread the reads, or the database itself
+
+    :param materialized_view_id: id of the MaterializedView
+    :param database: alias of the database of the view
+    """
+    from dj_materialized_views.models import MaterializedView
+
+    replicas = list(get_setting('REPLICAS').get(database, []))
+    if not replicas:
+        return database
+
+    lsn = MaterializedView.objects.filter(pk=materialized_view_id).values_list('last_refresh_lsn', flat=True).first()
+
+    random.shuffle(replicas)
+    return next((replica for replica in replicas if has_replayed(replica, lsn)), database)
+
+
+class MaterializedViewRouter:
+    """
+    Sends the reads of the models of the materialized views to an up to date replica
+    and their writes to the database of the view. Other models are left to the next routers
+    """
+
+    def db_for_read(self, model, **hints):
+        materialized_view_id = getattr(model, '_materialized_view_id', None)
+        if materialized_view_id is None:
+            return None
+
+        return get_read_database(materialized_view_id, model._materialized_view_database)
+
+    def db_for_write(self, model, **hints):
+        return getattr(model, '_materialized_view_database', None)
@@ -6,14 +6,124 @@ from dj_materialized_views.apps import (
 
 
 @shared_task()
-def refresh_materialized_view(materialized_view_id):
+def refresh_materialized_view(materialized_view_id, cascade=True, force=False, trigger=None):
     """
-    Task to periodically refresh the materialized view
+    Task to periodically refresh the materialized view.
+    With cascade the views that depend on it are refreshed afterwards in topological order. The periodic
+    task cascades when refresh_dependents is set, the periodic refreshes of the dependents are skipped then.
+    With force the view is refreshed even if its source tables did not change.
+    The trigger is the name of a MaterializedViewRefreshLog.Trigger, periodic task by default
     """
-    from dj_materialized_views.models import MaterializedView
+    from dj_materialized_views.models import MaterializedView, MaterializedViewRefreshLog
 
     materialized_view = MaterializedView.objects.get(id=materialized_view_id)
-    materialized_view.refresh()
+    if trigger is None and materialized_view.is_refreshed_by_sources():
+        return  # refreshed by the periodic refresh of a source view
+
+    trigger = MaterializedViewRefreshLog.Trigger[trigger or MaterializedViewRefreshLog.Trigger.BEAT.name]
+
+    if cascade:
+        materialized_view.refresh_with_dependents(trigger=trigger, force=force)
+    else:
+        materialized_view.refresh(trigger=trigger, force=force)
+
+
+@shared_task()
+def refresh_materialized_views(materialized_view_ids=None, workers=None, cascade=False, force=False):
+    """
+    Task to refresh many materialized views in parallel, e.g. after a data load.
+    All the materialized views are refreshed when no ids are given
+    """
+    from dj_materialized_views.executor import refresh_materialized_views as refresh
+    from dj_materialized_views.exceptions import MaterializedViewRefreshError
+    from dj_materialized_views.models import MaterializedView, MaterializedViewRefreshLog
+
+    materialized_views = MaterializedView.objects.all()
+    if materialized_view_ids is not None:
+        materialized_views = materialized_views.filter(id__in=materialized_view_ids)
+
+    results = refresh(materialized_views, workers=workers, cascade=cascade,
+                      trigger=MaterializedViewRefreshLog.Trigger.TASK, force=force)
+
+    if not all(result.succeeded for result in results):
+        raise MaterializedViewRefreshError(results)
+
+    return {result.materialized_view.pk: result.duration for result in results}
+
+
+@shared_task()
+def refresh_changed_materialized_view(materialized_view_id):
+    """
+    Task to refresh the materialized view after changes in its source tables.
+    Reschedules itself while the changes keep coming, until the debounce window or the maximum staleness is reached
+    """
+    from django.utils import timezone
+
+    from dj_materialized_views.changes import get_refresh_due_date, schedule_refresh
+    from dj_materialized_views.models import MaterializedView, MaterializedViewRefreshLog
+
+    materialized_view = MaterializedView.objects.get(id=materialized_view_id)
+    if materialized_view.change_pending_since is None:
+        return  # already refreshed
+
+    due_date = get_refresh_due_date(materialized_view)
+    now = timezone.now()
+    if due_date > now:
+        return schedule_refresh(materialized_view, (due_date - now).total_seconds())
+
+    # changes that come in during the refresh request a new one
+    MaterializedView.objects.filter(
+        pk=materialized_view.pk, change_pending_since=materialized_view.change_pending_since
+    ).update(change_pending_since=None)
+
+    materialized_view.refresh_with_dependents(trigger=MaterializedViewRefreshLog.Trigger.CHANGE)
+
+
+@shared_task()
+def purge_refresh_logs():
+    """
+    Task to delete the refresh logs older than MATERIALIZED_VIEWS_REFRESH_LOG_RETENTION_DAYS.
+    Logs are also purged after every refresh of a view, this task cleans up after deleted or idle views
+    """
+    from dj_materialized_views.models import MaterializedViewRefreshLog
+
+    return MaterializedViewRefreshLog.purge()
+
+
+@shared_task()
+def maintain_materialized_views(materialized_view_ids=None):
+    """
+    Task to track the bloat of the materialized views and maintain the bloated ones, scheduled e.g. hourly.
+    The stats are updated on every run, the maintenance that is due only runs inside
+    MATERIALIZED_VIEWS_MAINTENANCE_WINDOW, one view at a time
+    """
+    from dj_materialized_views.bloat import in_maintenance_window
+    from dj_materialized_views.exceptions import MaterializedViewRefreshError
+    from dj_materialized_views.executor import RefreshExecutor, prefetch_materialized_views
+    from dj_materialized_views.models import MaterializedView
+
+    materialized_views = MaterializedView.objects.all()
+    if materialized_view_ids is not None:
+        materialized_views = materialized_views.filter(id__in=materialized_view_ids)
+
+    for materialized_view in materialized_views:
+        materialized_view.update_bloat_stats()
+
+    def maintain(materialized_view):
+        # the window may close while the views are maintained
+        if in_maintenance_window():
+            materialized_view.run_due_maintenance()
+
+    if not in_maintenance_window():
+        return {}
+
+    due = materialized_views.exclude(maintenance_due=MaterializedView.BloatAction.NONE.name)
+    results = RefreshExecutor(workers=1).run(prefetch_materialized_views(due), maintain)
+
+    if not all(result.succeeded for result in results):
+        raise MaterializedViewRefreshError(results)
+
+    return {result.materialized_view.pk: result.duration for result in results}
 
 
 REFRESH_MV_TASK_FULL_NAME = f'{MaterializedViewsAppConfig.name}.tasks.{refresh_materialized_view.__name__}'
@@ -1,15 +1,43 @@
+import datetime
 import json
+import os
+import tempfile
+from datetime import timedelta
+from io import StringIO
+from unittest import mock
 
 from django.contrib.auth import get_user_model
-from django.db import connection
-from django.test.testcases import TestCase
-from django.test.utils import CaptureQueriesContext
+from django.contrib.auth.models import AnonymousUser
+from django.core.management import call_command
+from django.core.management.base import CommandError
+from django.core.exceptions import ValidationError
+from django.db import OperationalError, connection, models
+from django.db.migrations.recorder import MigrationRecorder
+from django.test.client import RequestFactory
+from django.test.testcases import TestCase, TransactionTestCase
+from django.test.utils import CaptureQueriesContext, override_settings
+from django.utils import timezone
 
+from django.apps import apps
 from django.contrib.admin import AdminSite
 from django_celery_beat.models import PeriodicTask, IntervalSchedule
 
+from dj_materialized_views import benchmark, bloat, partitioned, prewarm, read_cache, routers, tasks
 from dj_materialized_views.admin import MaterializedViewAdmin
-from dj_materialized_views.models import MaterializedView, MaterializedViewIndex
+from dj_materialized_views.admin.actions import refresh_materialized_view_action
+from dj_materialized_views.advisor import IndexSuggestion, advise, get_predicate_columns
+from dj_materialized_views.changes import get_notify_trigger_tables, get_refresh_due_date, listen, notify_change, \
+    schedule_refresh
+from dj_materialized_views.dependencies import relation_exists, topological_levels
+from dj_materialized_views.exceptions import IncrementalQueryNotSupported, MaterializedViewCostExceeded
+from dj_materialized_views.executor import create_materialized_views, delete_materialized_views, \
+    refresh_materialized_views
+from dj_materialized_views.incremental import IncrementalQuery
+from dj_materialized_views.locks import LOCK_NAMESPACE
+from dj_materialized_views.models import MaterializedView, MaterializedViewIndex, MaterializedViewRefreshLog
+from dj_materialized_views.tasks import refresh_changed_materialized_view
+from dj_materialized_views.utils import execute_raw_sql
+from dj_materialized_views.views import metrics, render_metrics
 
 
 class MockRequest(object):
@@ -17,7 +45,7 @@ class MockRequest(object):
         self.user = user
 
 
-class MaterializedViewTests(TestCase):
+class MaterializedViewTestMixin:
     def setUp(self):
         self.super_user = get_user_model().objects.create_superuser(username='s', email='s@e.or', password='p')
 
@@ -28,7 +56,7 @@ class MaterializedViewTests(TestCase):
         """
         Helper function that creates a materialized view table with unique index on the id column
         """
-        periodic_task = PeriodicTask.objects.create(name='P', interval=self.interval)
+        periodic_task = PeriodicTask.objects.create(name=title, interval=self.interval)
         materialized_view_admin = MaterializedViewAdmin(model=MaterializedView, admin_site=AdminSite())
 
         materialized_view_data = dict(
@@ -55,6 +83,12 @@ class MaterializedViewTests(TestCase):
 
         return mv
 
+
+class MaterializedViewTestCase(MaterializedViewTestMixin, TestCase):
+    pass
+
+
+class MaterializedViewTests(MaterializedViewTestCase):
     def test__materialized_view__admin_creation(self):
         # WHEN materialized view is created from admin
         self._create_materialized_view(title='Test MV Creation')
@@ -90,13 +124,12 @@ class MaterializedViewTests(TestCase):
         # the periodic refresh is enabled
         self.assertTrue(mv.periodic_task.enabled)
 
-        # queries to create materialized view and indexes are executed
+        # the materialized view and its indexes are created in one round trip
         queries = [q.get('sql') for q in captured_queries]
-        create_mv_query = f'CREATE MATERIALIZED VIEW IF NOT EXISTS {mv.db_table} AS {mv.sql_query}'
+        create_mv_query = f'CREATE MATERIALIZED VIEW IF NOT EXISTS {mv.db_table} AS {mv.sql_query}\n;'
         create_mv_index_query = f'CREATE UNIQUE INDEX IF NOT EXISTS test_id ON test USING btree(id);'
 
-        self.assertIn(create_mv_query, queries)
-        self.assertIn(create_mv_index_query, queries)
+        self.assertIn(f'{create_mv_query}\n{create_mv_index_query}', queries)
 
     def test__materialized_view__admin_action_refresh(self):
         # GIVEN materialized view is created from admin
@@ -137,3 +170,1955 @@ class MaterializedViewTests(TestCase):
         drop_mv_query = f'DROP MATERIALIZED VIEW IF EXISTS {mv.db_table};'
 
         self.assertIn(drop_mv_query, queries)
+
+
+class MaterializedViewDependencyTests(MaterializedViewTestCase):
+    def _create_chain(self):
+        """
+        Helper function that creates three materialized views, each selecting from the previous one
+        """
+        base = self._create_materialized_view(title='Base', db_table='mv_base')
+        middle = self._create_materialized_view(
+            title='Middle', db_table='mv_middle', sql_query='SELECT * FROM mv_base'
+        )
+        top = self._create_materialized_view(
+            title='Top', db_table='mv_top', sql_query='SELECT id, app FROM "mv_middle" WHERE id > 0'
+        )
+
+        return base, middle, top
+
+    def test__materialized_view__dependencies_parsed_from_query(self):
+        # WHEN materialized views that select from other views are saved
+        base, middle, top = self._create_chain()
+
+        # THEN the dependencies are found in the sql query
+        self.assertEqual(list(base.depends_on.all()), [])
+        self.assertEqual(list(middle.depends_on.all()), [base])
+        self.assertEqual(list(top.depends_on.all()), [middle])
+        self.assertEqual(list(base.dependents.all()), [middle])
+
+    def test__materialized_view__dependencies_from_catalog(self):
+        # GIVEN a view whose query mentions another view only in a string literal
+        base = self._create_materialized_view(title='Base', db_table='mv_base')
+        other = self._create_materialized_view(
+            title='Other', db_table='mv_other', sql_query="SELECT id, 'mv_base' AS label FROM django_migrations"
+        )
+        self.assertEqual(list(other.depends_on.all()), [base])
+
+        # WHEN the views are created in the database
+        base.create()
+        other.create()
+
+        # THEN the dependencies are taken from pg_depend
+        self.assertEqual(list(other.depends_on.all()), [])
+
+    def test__materialized_view__topological_levels(self):
+        # GIVEN a diamond of dependencies
+        base = self._create_materialized_view(title='Base', db_table='mv_base')
+        left = self._create_materialized_view(title='Left', db_table='mv_left', sql_query='SELECT * FROM mv_base')
+        right = self._create_materialized_view(title='Right', db_table='mv_right', sql_query='SELECT * FROM mv_base')
+        top = self._create_materialized_view(
+            title='Top', db_table='mv_top', sql_query='SELECT l.* FROM mv_left l JOIN mv_right r ON l.id = r.id'
+        )
+
+        # THEN views on the same level do not depend on each other
+        levels = topological_levels([top, right, left, base])
+        self.assertEqual(levels, [[base], [left, right], [top]])
+
+        # circular dependencies are reported
+        base.depends_on.add(top)
+        with self.assertRaises(ValueError):
+            topological_levels([top, right, left, base])
+
+    def test__materialized_view__refresh_cascades_to_dependents(self):
+        # GIVEN a chain of created materialized views
+        base, middle, top = self._create_chain()
+        for mv in (base, middle, top):
+            mv.create()
+
+        # WHEN the root view is refreshed by the periodic task
+        with CaptureQueriesContext(connection) as captured_queries:
+            tasks.refresh_materialized_view(**json.loads(base.periodic_task.kwargs))
+
+        # THEN the dependent views are refreshed after their sources
+        queries = [q.get('sql') for q in captured_queries if q.get('sql').startswith('REFRESH')]
+        self.assertEqual(queries, [
+            'REFRESH MATERIALIZED VIEW CONCURRENTLY mv_base;',
+            'REFRESH MATERIALIZED VIEW CONCURRENTLY mv_middle;',
+            'REFRESH MATERIALIZED VIEW CONCURRENTLY mv_top;',
+        ])
+
+    def test__materialized_view__admin_refresh_cascades_to_dependents(self):
+        # GIVEN a chain of created materialized views
+        base, middle, top = self._create_chain()
+        for mv in (base, middle, top):
+            mv.create()
+
+        # WHEN the root view is refreshed with the admin action
+        with CaptureQueriesContext(connection) as captured_queries:
+            refresh_materialized_view_action()(mock.Mock(), mock.Mock(), MaterializedView.objects.filter(pk=base.pk))
+
+        # THEN the dependent views are refreshed after their sources
+        queries = [q.get('sql') for q in captured_queries if q.get('sql').startswith('REFRESH')]
+        self.assertEqual(queries, [
+            'REFRESH MATERIALIZED VIEW CONCURRENTLY mv_base;',
+            'REFRESH MATERIALIZED VIEW CONCURRENTLY mv_middle;',
+            'REFRESH MATERIALIZED VIEW CONCURRENTLY mv_top;',
+        ])
+
+    def test__materialized_view__periodic_refresh_of_dependents_skipped(self):
+        # GIVEN a chain of created materialized views, each with its own periodic task
+        base, middle, top = self._create_chain()
+        for mv in (base, middle, top):
+            mv.create()
+
+        # WHEN the dependents are refreshed by their periodic tasks
+        with CaptureQueriesContext(connection) as captured_queries:
+            for mv in (middle, top):
+                tasks.refresh_materialized_view(**json.loads(mv.periodic_task.kwargs))
+
+        # THEN they are skipped, the periodic refresh of the root view refreshes them
+        queries = [q.get('sql') for q in captured_queries if q.get('sql').startswith('REFRESH')]
+        self.assertEqual(queries, [])
+
+        # WHEN the root view does not refresh its dependents
+        base.refresh_dependents = False
+        base.save()
+        self.assertEqual(json.loads(base.periodic_task.kwargs), {'materialized_view_id': base.id, 'cascade': False})
+        with CaptureQueriesContext(connection) as captured_queries:
+            for mv in (base, middle, top):
+                tasks.refresh_materialized_view(**json.loads(mv.periodic_task.kwargs))
+
+        # THEN every view is refreshed once
+        queries = [q.get('sql') for q in captured_queries if q.get('sql').startswith('REFRESH')]
+        self.assertEqual(queries, [
+            'REFRESH MATERIALIZED VIEW CONCURRENTLY mv_base;',
+            'REFRESH MATERIALIZED VIEW CONCURRENTLY mv_middle;',
+            'REFRESH MATERIALIZED VIEW CONCURRENTLY mv_top;',
+        ])
+
+
+class MaterializedViewExecutorTests(MaterializedViewTestMixin, TransactionTestCase):
+    def tearDown(self):
+        for mv in MaterializedView.objects.order_by('-id'):
+            mv.drop()
+
+    def test__materialized_view__parallel_refresh_continues_after_failure(self):
+        # GIVEN created materialized views, one of them missing from the database
+        views = [self._create_materialized_view(title=f'MV {i}', db_table=f'mv_{i}') for i in range(3)]
+        for mv in views:
+            mv.create()
+
+        missing = self._create_materialized_view(title='Missing', db_table='mv_missing')
+        dependent = self._create_materialized_view(
+            title='Dependent', db_table='mv_dependent', sql_query='SELECT * FROM mv_missing'
+        )
+
+        # WHEN all the views are refreshed in parallel
+        results = refresh_materialized_views(MaterializedView.objects.all(), workers=2)
+
+        # THEN every view has a result and the failure does not stop the other views
+        results = {result.materialized_view.db_table: result for result in results}
+        self.assertEqual(set(results), {'mv_0', 'mv_1', 'mv_2', 'mv_missing', 'mv_dependent'})
+
+        for mv in views:
+            self.assertTrue(results[mv.db_table].succeeded)
+            self.assertIsNotNone(results[mv.db_table].duration)
+
+        self.assertFalse(results[missing.db_table].succeeded)
+
+        # the view that selects from the failed view is skipped
+        self.assertTrue(results[dependent.db_table].skipped)
+        self.assertFalse(results[dependent.db_table].succeeded)
+
+        # the failure and the skipped refresh are logged
+        self.assertEqual(missing.refresh_logs.get().status, MaterializedViewRefreshLog.Status.FAILURE.name)
+        self.assertEqual(dependent.refresh_logs.get().status, MaterializedViewRefreshLog.Status.SKIPPED.name)
+
+    def test__materialized_view__bulk_create_and_delete(self):
+        # GIVEN views that are not created yet, one of them with a broken query and a view selecting from it
+        views = [self._create_materialized_view(title=f'MV {i}', db_table=f'mv_{i}') for i in range(3)]
+        broken = self._create_materialized_view(title='Broken', db_table='mv_broken', sql_query='SELECT 1/0 AS id')
+        dependent = self._create_materialized_view(
+            title='Dependent', db_table='mv_dependent', sql_query='SELECT * FROM mv_broken'
+        )
+
+        # WHEN all the views are created at once
+        with CaptureQueriesContext(connection) as captured_queries:
+            results = create_materialized_views(MaterializedView.objects.all(), workers=2)
+
+        # THEN the failure is reported per view and does not stop the others
+        results = {result.materialized_view.db_table: result for result in results}
+        self.assertTrue(all(results[mv.db_table].succeeded for mv in views))
+        self.assertFalse(results[broken.db_table].succeeded)
+        self.assertTrue(results[dependent.db_table].skipped)
+
+        # the periodic tasks of the created views are enabled in one query
+        enabled = PeriodicTask.objects.filter(enabled=True).values_list('materializedview__db_table', flat=True)
+        self.assertEqual(set(enabled), {'mv_0', 'mv_1', 'mv_2'})
+        task_table = PeriodicTask._meta.db_table
+        updates = [q['sql'] for q in captured_queries if q['sql'].startswith(f'UPDATE "{task_table}"')]
+        self.assertEqual(len(updates), 1)
+
+        # WHEN the views are deleted at once
+        results = delete_materialized_views(MaterializedView.objects.all(), workers=2)
+
+        # THEN the views and their periodic tasks are gone, the dependent view was dropped first
+        self.assertTrue(all(result.succeeded for result in results))
+        self.assertEqual([result.materialized_view.db_table for result in results][0], 'mv_dependent')
+        self.assertFalse(MaterializedView.objects.exists())
+        self.assertFalse(PeriodicTask.objects.filter(name__in=['MV 0', 'Broken', 'Dependent']).exists())
+        self.assertFalse(relation_exists('mv_0'))
+
+    def test__materialized_view__topological_levels_in_one_query(self):
+        # GIVEN a chain of views
+        first = self._create_materialized_view(title='First', db_table='mv_first')
+        second = self._create_materialized_view(
+            title='Second', db_table='mv_second', sql_query='SELECT * FROM mv_first'
+        )
+        third = self._create_materialized_view(
+            title='Third', db_table='mv_third', sql_query='SELECT * FROM mv_second'
+        )
+
+        # THEN the levels are found with a single query
+        with self.assertNumQueries(1):
+            levels = topological_levels([third, second, first])
+
+        self.assertEqual(levels, [[first], [second], [third]])
+
+
+class MaterializedViewRebuildTests(MaterializedViewTestCase):
+    def _fetch(self, sql):
+        with connection.cursor() as cursor:
+            cursor.execute(sql)
+            return cursor.fetchall()
+
+    def test__materialized_view__rebuild_swaps_shadow(self):
+        # GIVEN a created materialized view with a dependent view
+        mv = self._create_materialized_view(title='Rebuild', db_table='mv_rebuild')
+        mv.create()
+        dependent = self._create_materialized_view(
+            title='Dependent', db_table='mv_rebuild_dependent', sql_query='SELECT * FROM mv_rebuild'
+        )
+        dependent.create()
+
+        # WHEN the query is changed and the view is rebuilt
+        mv.sql_query = 'SELECT id, app, 1 AS version FROM django_migrations'
+        mv.save()
+
+        with CaptureQueriesContext(connection) as captured_queries:
+            mv.rebuild()
+
+        # THEN the new version is built under the shadow name and swapped
+        queries = [q.get('sql') for q in captured_queries]
+        self.assertIn(f'CREATE MATERIALIZED VIEW mv_rebuild__shadow AS {mv.sql_query}\n;', queries)
+        self.assertIn('DROP MATERIALIZED VIEW IF EXISTS mv_rebuild__old;', queries)
+        self.assertIn('ALTER MATERIALIZED VIEW mv_rebuild RENAME TO mv_rebuild__old;', queries)
+        self.assertIn('ALTER MATERIALIZED VIEW mv_rebuild__shadow RENAME TO mv_rebuild;', queries)
+        self.assertIn('DROP MATERIALIZED VIEW mv_rebuild__old;\n'
+                      f'ALTER INDEX IF EXISTS {mv.indexes.get().get_index_name(mv.shadow_db_table)} '
+                      'RENAME TO mv_rebuild_id;', queries)
+
+        # the views have the new columns, the indexes have their usual names and no leftovers remain
+        self.assertEqual(self._fetch('SELECT DISTINCT version FROM mv_rebuild_dependent'), [(1,)])
+        self.assertEqual(
+            self._fetch("SELECT indexname FROM pg_indexes WHERE tablename LIKE 'mv_rebuild%' ORDER BY 1"),
+            [('mv_rebuild_dependent_id',), ('mv_rebuild_id',)]
+        )
+        self.assertEqual(self._fetch("SELECT matviewname FROM pg_matviews WHERE matviewname LIKE '%\\_\\_%'"), [])
+
+    def test__materialized_view__rebuild_restores_old_version_on_failure(self):
+        # GIVEN a created materialized view with a dependent view
+        mv = self._create_materialized_view(title='Rebuild', db_table='mv_rebuild')
+        mv.create()
+        dependent = self._create_materialized_view(
+            title='Dependent', db_table='mv_rebuild_dependent', sql_query='SELECT * FROM mv_rebuild'
+        )
+        dependent.create()
+
+        # WHEN the query is changed and the dependent view fails to rebuild
+        mv.sql_query = 'SELECT id, app, 1 AS version FROM django_migrations;'
+        mv.save()
+
+        build_shadow = MaterializedView._build_shadow
+
+        def fail_dependent(materialized_view):
+            if materialized_view.pk == dependent.pk:
+                raise OperationalError('canceling statement due to statement timeout')
+            build_shadow(materialized_view)
+
+        with mock.patch.object(MaterializedView, '_build_shadow', autospec=True, side_effect=fail_dependent):
+            with self.assertRaises(OperationalError):
+                mv.rebuild()
+
+        # THEN the view has its old version back and no leftovers remain
+        self.assertEqual(self._fetch("SELECT matviewname FROM pg_matviews WHERE matviewname LIKE '%\\_\\_%'"), [])
+        self.assertEqual(
+            self._fetch("SELECT count(*) FROM information_schema.columns WHERE table_name = 'mv_rebuild' "
+                        "AND column_name = 'version'"),
+            [(0,)]
+        )
+
+        # and the next rebuild, of a query ending with a semicolon, succeeds
+        mv.rebuild()
+        self.assertEqual(self._fetch('SELECT DISTINCT version FROM mv_rebuild_dependent'), [(1,)])
+
+    def test__materialized_view__rebuild_replaces_query_views_of_dependent_tables(self):
+        # GIVEN a created materialized view with a dependent append-only table and a dependent view
+        mv = self._create_materialized_view(title='Rebuild', db_table='mv_rebuild')
+        mv.create()
+        table = self._create_materialized_view(
+            title='Appended', db_table='mv_rebuild_appended', sql_query='SELECT id, app FROM mv_rebuild'
+        )
+        table.materialization = MaterializedView.Materialization.APPEND.name
+        table.watermark_column = 'id'
+        table.full_clean()
+        table.save()
+        table.create()
+        dependent = self._create_materialized_view(
+            title='Dependent', db_table='mv_rebuild_dependent', sql_query='SELECT * FROM mv_rebuild'
+        )
+        dependent.create()
+        query_view_source = "SELECT DISTINCT source.relname FROM pg_depend dependency " \
+            "JOIN pg_rewrite rewrite ON rewrite.oid = dependency.objid " \
+            "JOIN pg_class source ON source.oid = dependency.refobjid " \
+            "WHERE rewrite.ev_class = 'mv_rebuild_appended__query'::regclass AND source.oid <> rewrite.ev_class"
+
+        # WHEN the query is changed and the dependent view fails to rebuild
+        mv.sql_query = 'SELECT id, app, 1 AS version FROM django_migrations'
+        mv.save()
+
+        build_shadow = MaterializedView._build_shadow
+
+        def fail_dependent(materialized_view):
+            if materialized_view.pk == dependent.pk:
+                raise OperationalError('canceling statement due to statement timeout')
+            build_shadow(materialized_view)
+
+        with mock.patch.object(MaterializedView, '_build_shadow', autospec=True, side_effect=fail_dependent):
+            with self.assertRaises(OperationalError):
+                mv.rebuild()
+
+        # THEN the query view of the table selects from the old version again and no leftovers remain
+        self.assertEqual(self._fetch(query_view_source), [('mv_rebuild',)])
+        self.assertEqual(self._fetch("SELECT matviewname FROM pg_matviews WHERE matviewname LIKE '%\\_\\_%'"), [])
+
+        # WHEN the view is rebuilt
+        mv.rebuild()
+
+        # THEN the query view of the table selects from the new version and the old version is dropped
+        self.assertEqual(self._fetch(query_view_source), [('mv_rebuild',)])
+        self.assertFalse(relation_exists('mv_rebuild__old'))
+        self.assertEqual(self._fetch('SELECT DISTINCT version FROM mv_rebuild_dependent'), [(1,)])
+        table.refresh()
+
+    def test__materialized_view__swap_drops_leftover_old_version(self):
+        # GIVEN a created materialized view and an old version left behind by an interrupted swap
+        mv = self._create_materialized_view(title='Leftover', db_table='mv_leftover')
+        mv.create()
+        execute_raw_sql('CREATE MATERIALIZED VIEW mv_leftover__old AS SELECT 1 AS id;')
+
+        # WHEN the view is rebuilt
+        mv.rebuild()
+
+        # THEN the leftover does not block the swap
+        self.assertTrue(relation_exists('mv_leftover'))
+        self.assertFalse(relation_exists('mv_leftover__old'))
+
+    def test__materialized_view__refresh_without_unique_index_swaps(self):
+        # GIVEN a created materialized view without a unique index
+        mv = self._create_materialized_view(title='No Unique', db_table='mv_no_unique')
+        mv.indexes.update(is_unique=False)
+        mv.create()
+
+        # WHEN the view is refreshed
+        with CaptureQueriesContext(connection) as captured_queries:
+            mv.refresh()
+
+        # THEN it is rebuilt and swapped instead of concurrently refreshed
+        queries = [q.get('sql') for q in captured_queries]
+        self.assertNotIn('REFRESH MATERIALIZED VIEW CONCURRENTLY mv_no_unique;', queries)
+        self.assertIn('ALTER MATERIALIZED VIEW mv_no_unique__shadow RENAME TO mv_no_unique;', queries)
+
+
+class MaterializedViewRefreshStrategyTests(MaterializedViewTestCase):
+    def test__materialized_view__auto_refresh_strategy(self):
+        # GIVEN a created materialized view with a unique index
+        mv = self._create_materialized_view(title='Auto', db_table='mv_auto')
+        mv.create()
+
+        # THEN it is refreshed concurrently and the strategy is recorded
+        self.assertEqual(mv.get_refresh_strategy(), MaterializedView.RefreshStrategy.CONCURRENT)
+        mv.refresh()
+        mv.refresh_from_db()
+        self.assertEqual(mv.last_refresh_strategy, 'CONCURRENT')
+        self.assertIsNotNone(mv.concurrent_refresh_duration)
+
+        # WHEN the concurrent refresh is slower than a full rebuild
+        mv.concurrent_refresh_duration = mv.full_refresh_duration * 2
+        # THEN the view is swapped
+        self.assertEqual(mv.get_refresh_strategy(), MaterializedView.RefreshStrategy.SWAP)
+
+        # until the last concurrent refresh is old enough to be measured again
+        mv.last_concurrent_refresh_date = timezone.now() - timedelta(days=8)
+        self.assertEqual(mv.get_refresh_strategy(), MaterializedView.RefreshStrategy.CONCURRENT)
+        with override_settings(MATERIALIZED_VIEWS_CONCURRENT_REFRESH_RETRY_AGE=None):
+            self.assertEqual(mv.get_refresh_strategy(), MaterializedView.RefreshStrategy.SWAP)
+        mv.last_concurrent_refresh_date = timezone.now()
+
+        # unless other views select from it
+        self._create_materialized_view(
+            title='Dependent', db_table='mv_auto_dependent', sql_query='SELECT * FROM mv_auto'
+        )
+        self.assertEqual(mv.get_refresh_strategy(), MaterializedView.RefreshStrategy.PLAIN)
+
+    def test__materialized_view__refresh_unpopulated_view(self):
+        # GIVEN a materialized view without data
+        mv = self._create_materialized_view(title='No Data', db_table='mv_no_data')
+        mv.create()
+        with connection.cursor() as cursor:
+            cursor.execute('REFRESH MATERIALIZED VIEW mv_no_data WITH NO DATA;')
+
+        # WHEN the view is refreshed
+        with CaptureQueriesContext(connection) as captured_queries:
+            mv.refresh()
+
+        # THEN a plain refresh is used, because concurrent refresh is not possible
+        queries = [q.get('sql') for q in captured_queries]
+        self.assertIn('REFRESH MATERIALIZED VIEW mv_no_data;', queries)
+        self.assertTrue(mv.is_populated())
+        self.assertEqual(MaterializedView.objects.get(pk=mv.pk).last_refresh_strategy, 'PLAIN')
+
+    def test__materialized_view__explicit_refresh_strategy(self):
+        # GIVEN a view configured to always use a plain refresh
+        mv = self._create_materialized_view(title='Plain', db_table='mv_plain')
+        mv.refresh_strategy = MaterializedView.RefreshStrategy.PLAIN.name
+        mv.save()
+        mv.create()
+
+        # THEN the configured strategy is used
+        self.assertEqual(mv.get_refresh_strategy(), MaterializedView.RefreshStrategy.PLAIN)
+
+
+class MaterializedViewChangeDetectionTests(MaterializedViewTestCase):
+    def _create_changed_view(self, change_detection):
+        with connection.cursor() as cursor:
+            cursor.execute('CREATE TABLE mv_events (id integer PRIMARY KEY, amount integer);')
+
+        mv = self._create_materialized_view(
+            title='Changes', db_table='mv_changes', sql_query='SELECT id, amount FROM mv_events'
+        )
+        mv.change_detection = change_detection.name
+        mv.save()
+        mv.create()
+
+        return mv
+
+    def test__materialized_view__change_triggers_installed(self):
+        # WHEN a view with trigger change detection is created
+        mv = self._create_changed_view(MaterializedView.ChangeDetection.TRIGGERS)
+
+        # THEN the source tables are found and the notify trigger is installed on them
+        self.assertEqual(mv.get_source_tables(), ['public.mv_events'])
+        with connection.cursor() as cursor:
+            cursor.execute("SELECT count(*) FROM pg_trigger WHERE tgname = 'dj_materialized_views_notify';")
+            self.assertEqual(cursor.fetchone()[0], 1)
+
+        # the trigger is removed when the view is dropped
+        mv.drop()
+        with connection.cursor() as cursor:
+            cursor.execute("SELECT count(*) FROM pg_trigger WHERE tgname = 'dj_materialized_views_notify';")
+            self.assertEqual(cursor.fetchone()[0], 0)
+
+    def test__materialized_view__change_triggers_follow_change_detection(self):
+        # GIVEN a created view without change detection
+        mv = self._create_changed_view(MaterializedView.ChangeDetection.NONE)
+        self.assertEqual(get_notify_trigger_tables(mv.get_source_tables()), set())
+
+        # WHEN trigger change detection is turned on
+        mv.change_detection = MaterializedView.ChangeDetection.TRIGGERS.name
+        mv.save()
+
+        # THEN the notify trigger is installed on the source tables
+        self.assertEqual(get_notify_trigger_tables(mv.get_source_tables()), {'public.mv_events'})
+
+        # and removed when it is turned off again
+        mv.change_detection = MaterializedView.ChangeDetection.NONE.name
+        mv.save()
+        self.assertEqual(get_notify_trigger_tables(mv.get_source_tables()), set())
+
+    def test__materialized_view__listen_handles_waiting_notifications(self):
+        # GIVEN a notification that was received while the listener ran another query
+        connection.ensure_connection()
+        connection.connection.notifies.append(mock.Mock(payload='public.mv_events'))
+
+        # WHEN the listener runs, with nothing more arriving on the socket
+        with mock.patch('dj_materialized_views.changes.notify_change', side_effect=KeyboardInterrupt) as notify, \
+                mock.patch('select.select', side_effect=KeyboardInterrupt) as wait:
+            with self.assertRaises(KeyboardInterrupt):
+                listen(timeout=0.01)
+
+        # THEN the waiting notification is handled without waiting on the socket
+        notify.assert_called_once_with({'public.mv_events'}, change_detection=MaterializedView.ChangeDetection.TRIGGERS)
+        wait.assert_not_called()
+
+    def test__materialized_view__changes_are_debounced(self):
+        # GIVEN a view with signal change detection
+        mv = self._create_changed_view(MaterializedView.ChangeDetection.SIGNALS)
+
+        # WHEN a burst of changes comes in
+        with mock.patch('dj_materialized_views.tasks.refresh_changed_materialized_view.apply_async') as apply_async, \
+                mock.patch('django.db.transaction.on_commit', side_effect=lambda func, using=None: func()):
+            for _ in range(3):
+                notify_change(['mv_events'], change_detection=MaterializedView.ChangeDetection.SIGNALS)
+
+            # THEN only one refresh is scheduled, after the debounce window
+            apply_async.assert_called_once_with(kwargs={'materialized_view_id': mv.pk}, countdown=mv.debounce_seconds)
+
+            # the task reschedules itself while the debounce window is open
+            refresh_changed_materialized_view(materialized_view_id=mv.pk)
+            self.assertEqual(apply_async.call_count, 2)
+
+        # WHEN the debounce window passed
+        MaterializedView.objects.filter(pk=mv.pk).update(last_change_at=timezone.now() - timedelta(minutes=5))
+
+        with CaptureQueriesContext(connection) as captured_queries:
+            refresh_changed_materialized_view(materialized_view_id=mv.pk)
+
+        # THEN the view is refreshed and no change is pending
+        queries = [q.get('sql') for q in captured_queries]
+        self.assertIn('REFRESH MATERIALIZED VIEW CONCURRENTLY mv_changes;', queries)
+        self.assertIsNone(MaterializedView.objects.get(pk=mv.pk).change_pending_since)
+
+    def test__materialized_view__refresh_due_at_max_staleness(self):
+        # GIVEN changes that keep coming for longer than the maximum staleness
+        mv = self._create_changed_view(MaterializedView.ChangeDetection.SIGNALS)
+        now = timezone.now()
+        mv.change_pending_since = now - timedelta(seconds=mv.max_staleness_seconds)
+        mv.last_change_at = now
+
+        # THEN the refresh is due anyway
+        self.assertLessEqual(get_refresh_due_date(mv), now)
+
+
+class MaterializedViewIncrementalTests(MaterializedViewTestCase):
+    AGGREGATE_QUERY = 'SELECT e.key, count(*) AS n, count(e.x) AS n_x, sum(e.x) AS total, min(e.x) AS lo, ' \
+                      'max(e.x) AS hi, avg(e.x) AS mean FROM mv_ivm_events e WHERE e.x IS DISTINCT FROM 13 ' \
+                      'GROUP BY e.key'
+    JOIN_QUERY = 'SELECT d.name, count(*) AS n, sum(e.x) AS total, max(e.x) AS hi ' \
+                 'FROM mv_ivm_events AS e INNER JOIN mv_ivm_dims d ON d.id = e.dim_id GROUP BY d.name'
+
+    def setUp(self):
+        super().setUp()
+        self._execute(
+            'CREATE TABLE mv_ivm_dims (id integer PRIMARY KEY, name text);',
+            'CREATE TABLE mv_ivm_events (id serial PRIMARY KEY, key text, dim_id integer, x integer);',
+            "INSERT INTO mv_ivm_dims VALUES (1, 'one'), (2, 'two'), (3, 'three');",
+            "INSERT INTO mv_ivm_events (key, dim_id, x) VALUES ('a', 1, 1), ('a', 1, 5), ('b', 2, 2), "
+            "('b', 2, NULL), ('c', 3, 7), (NULL, 1, 3), ('c', 3, 13);",
+        )
+
+    def _execute(self, *sql):
+        with connection.cursor() as cursor:
+            for statement in sql:
+                cursor.execute(statement)
+
+    def _fetch(self, sql):
+        with connection.cursor() as cursor:
+            cursor.execute(sql)
+            return cursor.fetchall()
+
+    def _create_incremental_view(self, sql_query):
+        mv = self._create_materialized_view(title='Incremental', db_table='mv_ivm', sql_query=sql_query)
+        mv.materialization = MaterializedView.Materialization.INCREMENTAL.name
+        mv.save()
+        mv.indexes.all().delete()  # the table has no id column
+        mv.create()
+
+        return mv
+
+    def _assert_matches_full_recompute(self, mv, columns):
+        """
+        Refreshes the view and compares it with the result of its query
+        """
+        with CaptureQueriesContext(connection) as captured_queries:
+            mv.refresh()
+
+        select = ', '.join(f'round({c}, 6)' if c == 'mean' else c for c in columns)
+        self.assertEqual(
+            self._fetch(f'SELECT {select} FROM mv_ivm ORDER BY 1 NULLS FIRST'),
+            self._fetch(f'SELECT {select} FROM ({mv.sql_query}) q ORDER BY 1 NULLS FIRST')
+        )
+
+        return [q.get('sql') for q in captured_queries]
+
+    def test__materialized_view__incremental_aggregates(self):
+        # GIVEN an incremental table over a single table
+        mv = self._create_incremental_view(self.AGGREGATE_QUERY)
+        columns = ['key', 'n', 'n_x', 'total', 'lo', 'hi', 'mean']
+        self._assert_matches_full_recompute(mv, columns)
+
+        # WHEN rows are inserted into new and existing groups
+        self._execute("INSERT INTO mv_ivm_events (key, dim_id, x) VALUES ('a', 1, 0), ('d', 1, 4), ('d', 1, NULL);")
+
+        # THEN the changes are merged and the result is the same as a full recompute
+        queries = self._assert_matches_full_recompute(mv, columns)
+        self.assertTrue(any(q.startswith('UPDATE mv_ivm AS') for q in queries))
+        self.assertFalse(any(q.startswith('DELETE FROM mv_ivm;') for q in queries))
+
+        # WHEN rows are updated, moved between groups, deleted, and a group becomes empty
+        self._execute(
+            "UPDATE mv_ivm_events SET x = x + 10 WHERE key = 'b';",
+            "UPDATE mv_ivm_events SET key = 'c' WHERE key = 'a' AND x = 5;",
+            "DELETE FROM mv_ivm_events WHERE key = 'a' AND x = 0;",
+            "DELETE FROM mv_ivm_events WHERE key = 'd';",
+            "UPDATE mv_ivm_events SET x = 13 WHERE key IS NULL;",
+        )
+        self._assert_matches_full_recompute(mv, columns)
+        self.assertEqual(self._fetch("SELECT count(*) FROM mv_ivm WHERE key = 'd';"), [(0,)])
+
+        # WHEN groups with a NULL key change
+        self._execute("INSERT INTO mv_ivm_events (key, dim_id, x) VALUES (NULL, 2, 8), (NULL, 2, NULL);")
+        self._assert_matches_full_recompute(mv, columns)
+
+        # WHEN a source table is truncated
+        self._execute("TRUNCATE mv_ivm_events;", "INSERT INTO mv_ivm_events (key, dim_id, x) VALUES ('z', 1, 1);")
+        queries = self._assert_matches_full_recompute(mv, columns)
+        self.assertIn('DELETE FROM mv_ivm;', queries)
+
+    def test__materialized_view__incremental_source_table_altered(self):
+        # GIVEN an incremental table, whose query does not use the dim_id column of the source table
+        mv = self._create_incremental_view(self.AGGREGATE_QUERY)
+        columns = ['key', 'n', 'n_x', 'total', 'lo', 'hi', 'mean']
+        self.assertEqual(self._fetch(
+            "SELECT attname FROM pg_attribute WHERE attrelid = 'mv_ivm__delta_0'::regclass AND attnum > 0 ORDER BY 1"
+        ), [('__mv_sign',), ('key',), ('x',)])
+
+        # WHEN columns are added to and dropped from the source table
+        self._execute(
+            'ALTER TABLE mv_ivm_events ADD COLUMN note text;',
+            'ALTER TABLE mv_ivm_events DROP COLUMN dim_id;',
+        )
+
+        # THEN the source table can still be written and the changes are merged
+        self._execute(
+            "INSERT INTO mv_ivm_events (key, x, note) VALUES ('a', 2, 'new'), ('e', 6, NULL);",
+            "UPDATE mv_ivm_events SET x = x + 1, note = 'updated' WHERE key = 'c';",
+            "DELETE FROM mv_ivm_events WHERE key = 'b';",
+        )
+        queries = self._assert_matches_full_recompute(mv, columns)
+        self.assertFalse(any(q.startswith('DELETE FROM mv_ivm;') for q in queries))
+
+    def test__materialized_view__incremental_join(self):
+        # GIVEN an incremental table over joined tables
+        mv = self._create_incremental_view(self.JOIN_QUERY)
+        self.assertEqual(mv.get_source_tables(), ['public.mv_ivm_events', 'public.mv_ivm_dims'])
+        columns = ['name', 'n', 'total', 'hi']
+
+        # WHEN only one of the tables changes, the changes are merged
+        self._execute("INSERT INTO mv_ivm_events (key, dim_id, x) VALUES ('a', 2, 100), ('a', 3, 1);")
+        queries = self._assert_matches_full_recompute(mv, columns)
+        self.assertFalse(any(q.startswith('DELETE FROM mv_ivm;') for q in queries))
+
+        self._execute("UPDATE mv_ivm_dims SET name = 'uno' WHERE id = 1;")
+        queries = self._assert_matches_full_recompute(mv, columns)
+        self.assertFalse(any(q.startswith('DELETE FROM mv_ivm;') for q in queries))
+
+        # WHEN both tables change, the table is recomputed
+        self._execute(
+            "INSERT INTO mv_ivm_dims VALUES (4, 'four');",
+            "INSERT INTO mv_ivm_events (key, dim_id, x) VALUES ('a', 4, 3);",
+            "DELETE FROM mv_ivm_events WHERE dim_id = 2;",
+        )
+        queries = self._assert_matches_full_recompute(mv, columns)
+        self.assertIn('DELETE FROM mv_ivm;', queries)
+
+        # the change capture is removed with the table
+        mv.drop()
+        self.assertEqual(self._fetch("SELECT count(*) FROM pg_trigger WHERE tgname LIKE 'mv_ivm%';"), [(0,)])
+        self.assertFalse(relation_exists('mv_ivm__delta_0'))
+
+    def test__materialized_view__incremental_unsupported_query(self):
+        # GIVEN queries that cannot be maintained incrementally
+        for sql_query in (
+            'SELECT key, count(*) AS n FROM mv_ivm_events GROUP BY key HAVING count(*) > 1',
+            'SELECT key, count(DISTINCT x) AS n FROM mv_ivm_events GROUP BY key',
+            'SELECT e.key, count(*) AS n FROM mv_ivm_events e LEFT JOIN mv_ivm_dims d ON d.id = e.dim_id GROUP BY 1',
+            'SELECT key, sum(x) + 1 AS n FROM mv_ivm_events GROUP BY key',
+            'SELECT key, x FROM mv_ivm_events',
+        ):
+            with self.assertRaises(IncrementalQueryNotSupported):
+                IncrementalQuery(sql_query)
+
+        # THEN they are fully recomputed on every refresh
+        mv = self._create_incremental_view(
+            'SELECT key, count(*) AS n FROM mv_ivm_events GROUP BY key HAVING count(*) > 1'
+        )
+        self._execute("INSERT INTO mv_ivm_events (key, dim_id, x) VALUES ('c', 1, 1), ('e', 1, 1), ('e', 1, 2);")
+        queries = self._assert_matches_full_recompute(mv, ['key', 'n'])
+        self.assertIn('DELETE FROM mv_ivm;', queries)
+
+
+class MaterializedViewRefreshLogTests(MaterializedViewTestCase):
+    def test__materialized_view__refresh_is_logged(self):
+        # GIVEN a created materialized view
+        mv = self._create_materialized_view(title='Logged', db_table='mv_logged')
+        mv.create()
+
+        # WHEN the view is refreshed by the periodic task
+        tasks.refresh_materialized_view(materialized_view_id=mv.id)
+
+        # THEN the creation and the refresh are logged
+        log = mv.refresh_logs.first()
+        self.assertEqual(mv.refresh_logs.count(), 2)
+        self.assertEqual(log.status, MaterializedViewRefreshLog.Status.SUCCESS.name)
+        self.assertEqual(log.trigger, MaterializedViewRefreshLog.Trigger.BEAT.name)
+        self.assertEqual(log.strategy, MaterializedView.RefreshStrategy.CONCURRENT.name)
+        self.assertGreater(log.size_after, 0)
+        self.assertGreaterEqual(log.duration, 0)
+
+        # saving the view in the admin does not change the time of the last refresh
+        mv.refresh_from_db()
+        last_run_date = mv.last_run_date
+        mv.title = 'Renamed'
+        mv.save()
+        mv.refresh_from_db()
+        self.assertEqual(mv.last_run_date, last_run_date)
+
+    def test__materialized_view__failed_refresh_is_logged(self):
+        # GIVEN a materialized view that does not exist in the database
+        mv = self._create_materialized_view(title='Failing', db_table='mv_failing')
+
+        # WHEN the refresh fails
+        with self.assertRaises(Exception):
+            mv.refresh(trigger=MaterializedViewRefreshLog.Trigger.ADMIN)
+
+        # THEN the error is logged
+        log = mv.refresh_logs.get()
+        self.assertEqual(log.status, MaterializedViewRefreshLog.Status.FAILURE.name)
+        self.assertEqual(log.trigger, MaterializedViewRefreshLog.Trigger.ADMIN.name)
+        self.assertIn('mv_failing', log.error)
+
+    def test__materialized_view__refresh_log_retention(self):
+        # GIVEN a log older than the retention period
+        mv = self._create_materialized_view(title='Retention', db_table='mv_retention')
+        MaterializedViewRefreshLog.objects.create(
+            materialized_view=mv, strategy='PLAIN', started_at=timezone.now() - timedelta(days=31)
+        )
+
+        # WHEN the view is created and refreshed
+        mv.create()
+
+        # THEN the old log is purged
+        self.assertEqual(mv.refresh_logs.count(), 1)
+
+    def test__materialized_view__refresh_stats(self):
+        # GIVEN logged refreshes of a view
+        mv = self._create_materialized_view(title='Stats', db_table='mv_stats')
+        now = timezone.now()
+        for duration in range(1, 11):
+            MaterializedViewRefreshLog.objects.create(
+                materialized_view=mv, strategy='PLAIN', started_at=now, finished_at=now, duration=duration
+            )
+        MaterializedViewRefreshLog.objects.create(
+            materialized_view=mv, strategy='PLAIN', started_at=now, duration=100,
+            status=MaterializedViewRefreshLog.Status.FAILURE.name
+        )
+
+        # THEN the percentiles only include the successful refreshes
+        stats = MaterializedViewRefreshLog.get_stats()[mv.id]
+        self.assertEqual(stats['count'], 11)
+        self.assertEqual(stats['failures'], 1)
+        self.assertEqual(stats['p50'], 5.5)
+        self.assertAlmostEqual(stats['p95'], 9.55)
+
+        # the admin list shows the same stats
+        annotated = MaterializedView.objects.annotate(
+            **MaterializedViewRefreshLog.get_stats_annotations()
+        ).get(pk=mv.pk)
+        self.assertEqual(annotated.refresh_duration_p50, 5.5)
+        self.assertAlmostEqual(annotated.refresh_failure_rate, 1 / 11)
+
+        # and the exporter
+        metrics = render_metrics()
+        self.assertIn('dj_materialized_views_refresh_duration_seconds{view="mv_stats",quantile="0.5"} 5.5', metrics)
+        self.assertIn('dj_materialized_views_refresh_failures{view="mv_stats"} 1', metrics)
+
+    @override_settings(MATERIALIZED_VIEWS_METRICS_TOKEN='secret')
+    def test__materialized_view__metrics_require_token_or_staff(self):
+        # WHEN the metrics are requested anonymously THEN they are refused
+        request = RequestFactory().get('/metrics/')
+        request.user = AnonymousUser()
+        self.assertEqual(metrics(request).status_code, 403)
+
+        # WHEN the scraper sends the token or a staff user is logged in THEN they are exported
+        request = RequestFactory().get('/metrics/', HTTP_AUTHORIZATION='Bearer secret')
+        request.user = AnonymousUser()
+        self.assertEqual(metrics(request).status_code, 200)
+        request = RequestFactory().get('/metrics/')
+        request.user = self.super_user
+        self.assertEqual(metrics(request).status_code, 200)
+
+        # WHEN no token is set THEN only staff users get them
+        with override_settings(MATERIALIZED_VIEWS_METRICS_TOKEN=None):
+            request = RequestFactory().get('/metrics/', HTTP_AUTHORIZATION='Bearer ')
+            request.user = AnonymousUser()
+            self.assertEqual(metrics(request).status_code, 403)
+
+
+class MaterializedViewModelTests(MaterializedViewTestCase):
+    def test__materialized_view__model_fields_are_introspected(self):
+        # GIVEN a created materialized view with a unique index on the name column
+        mv = self._create_materialized_view(
+            title='Model', db_table='mv_model',
+            sql_query='SELECT id::int AS "Row Id", (app || name)::varchar(100) AS name, applied FROM django_migrations'
+        )
+        mv.indexes.all().delete()
+        MaterializedViewIndex.objects.create(title='Name', materialized_view=mv, index_field='name', is_unique=True)
+        mv.create()
+
+        # WHEN the model is used
+        model = mv.model
+
+        # THEN the fields match the columns and the primary key is the unique column
+        fields = {field.name: field for field in model._meta.get_fields()}
+        self.assertEqual(list(fields), ['row_id', 'name', 'applied'])
+        self.assertEqual(fields['row_id'].column, 'Row Id')
+        self.assertIsInstance(fields['row_id'], models.IntegerField)
+        self.assertEqual(fields['name'].max_length, 100)
+        self.assertTrue(fields['name'].primary_key)
+        self.assertIsInstance(fields['applied'], models.DateTimeField)
+
+        row = model.objects.order_by('applied').first()
+        self.assertEqual(model.objects.get(pk=row.name).row_id, row.row_id)
+
+        # the model is cached and not registered with the project models
+        self.assertIs(mv.model, model)
+        self.assertIs(MaterializedView.objects.get(pk=mv.pk).model, model)
+        self.assertNotIn(model, apps.get_models())
+
+    def test__materialized_view__model_invalidated_on_rebuild(self):
+        # GIVEN a created materialized view with a cached model
+        mv = self._create_materialized_view(title='Rebuilt Model', db_table='mv_rebuilt_model')
+        mv.create()
+        model = mv.model
+
+        # WHEN the view is rebuilt with another query
+        mv.sql_query = 'SELECT id, app FROM django_migrations'
+        mv.save()
+        mv.rebuild()
+
+        # THEN a new model with the new columns is built
+        self.assertIsNot(mv.model, model)
+        self.assertEqual([field.name for field in mv.model._meta.get_fields()], ['id', 'app'])
+
+
+@mock.patch('django.db.transaction.on_commit', side_effect=lambda func, using=None: func())
+class MaterializedViewReadCacheTests(MaterializedViewTestCase):
+    def test__materialized_view__read_cache_until_refresh(self, on_commit):
+        # GIVEN a created materialized view with the read cache enabled
+        mv = self._create_materialized_view(title='Cached', db_table='mv_cached')
+        mv.read_cache = True
+        mv.save()
+        mv.create()
+
+        # WHEN the same queries run twice
+        queryset = mv.model.objects.filter(app='dj_materialized_views').order_by('id')
+        rows = list(queryset)
+        count = queryset.all().count()
+        names = list(queryset.values_list('name', flat=True))
+
+        # THEN the second time they are answered from the cache
+        with self.assertNumQueries(0):
+            self.assertEqual([row.pk for row in queryset.all()], [row.pk for row in rows])
+            self.assertEqual(queryset.all().count(), count)
+            self.assertEqual(list(queryset.values_list('name', flat=True)), names)
+
+        stats = read_cache.get_stats(mv.pk)
+        self.assertEqual(stats['misses'], 3)
+        self.assertEqual(stats['hits'], 3)
+
+        # WHEN the source changes and the view is refreshed
+        MigrationRecorder.Migration.objects.create(app='dj_materialized_views', name='9999_new')
+        mv.refresh()
+
+        # THEN the cached results are invalidated
+        self.assertEqual(queryset.all().count(), count + 1)
+        self.assertIn('9999_new', queryset.values_list('name', flat=True))
+
+    @override_settings(MATERIALIZED_VIEWS_REPLICAS={'default': ['replica']},
+                       DATABASE_ROUTERS=['dj_materialized_views.routers.MaterializedViewRouter'])
+    def test__materialized_view__read_cache_hit_does_not_route(self, on_commit):
+        # GIVEN a created materialized view with the read cache enabled, on a database with a replica
+        mv = self._create_materialized_view(title='Cached', db_table='mv_cached')
+        mv.read_cache = True
+        mv.save()
+        mv.create()
+
+        with mock.patch('dj_materialized_views.routers.get_read_database', return_value='default') as route:
+            # WHEN a query misses the cache THEN it is routed
+            rows = list(mv.model.objects.all())
+            route.assert_called()
+            route.reset_mock()
+
+            # WHEN it runs again THEN it is answered from the cache without looking up the replicas
+            with self.assertNumQueries(0):
+                self.assertEqual([row.pk for row in mv.model.objects.all()], [row.pk for row in rows])
+            route.assert_not_called()
+
+    def test__materialized_view__read_cache_disabled(self, on_commit):
+        # GIVEN a created materialized view without the read cache
+        mv = self._create_materialized_view(title='Not Cached', db_table='mv_not_cached')
+        mv.create()
+
+        # THEN every query goes to the database
+        list(mv.model.objects.all())
+        with self.assertNumQueries(1):
+            list(mv.model.objects.all())
+
+
+class MaterializedViewOverlapTests(MaterializedViewTestCase):
+    def _refresh_queries(self, mv, trigger=None):
+        with CaptureQueriesContext(connection) as captured_queries:
+            mv.refresh(trigger=trigger)
+
+        return [q.get('sql') for q in captured_queries if q.get('sql').startswith('REFRESH')]
+
+    def test__materialized_view__overlapping_refreshes_are_coalesced(self):
+        # GIVEN a created materialized view that another worker is refreshing
+        mv = self._create_materialized_view(title='Overlap', db_table='mv_overlap')
+        mv.create()
+
+        other_connection = connection.copy()
+        with other_connection.cursor() as cursor:
+            cursor.execute('SELECT pg_advisory_lock(%s, %s);', [LOCK_NAMESPACE, mv.pk])
+
+        # WHEN the view is refreshed twice in the meantime
+        try:
+            self.assertEqual(self._refresh_queries(mv), [])
+            self.assertEqual(self._refresh_queries(mv), [])
+        finally:
+            other_connection.close()  # releases the lock
+
+        # THEN the requests are merged into one follow-up refresh
+        mv.refresh_from_db()
+        self.assertTrue(mv.refresh_follow_up_pending)
+        self.assertEqual(mv.overlapping_refresh_count, 2)
+        self.assertEqual(mv.coalesced_refresh_count, 1)
+        self.assertEqual(
+            mv.refresh_logs.filter(status=MaterializedViewRefreshLog.Status.SKIPPED.name).count(), 2
+        )
+
+        # the next refresh also covers the pending follow-up
+        self.assertEqual(self._refresh_queries(mv), ['REFRESH MATERIALIZED VIEW CONCURRENTLY mv_overlap;'])
+        mv.refresh_from_db()
+        self.assertFalse(mv.refresh_follow_up_pending)
+
+    def test__materialized_view__follow_up_refresh(self):
+        # GIVEN a created materialized view
+        mv = self._create_materialized_view(title='Follow Up', db_table='mv_follow_up')
+        mv.create()
+
+        # WHEN a refresh is requested while the view is refreshing
+        refresh = MaterializedView._refresh
+
+        def refresh_with_request(materialized_view, trigger=None, force=False):
+            refresh(materialized_view, trigger, force)
+            if trigger != MaterializedViewRefreshLog.Trigger.FOLLOW_UP:
+                materialized_view._request_follow_up()
+
+        with mock.patch.object(MaterializedView, '_refresh', refresh_with_request):
+            queries = self._refresh_queries(mv, trigger=MaterializedViewRefreshLog.Trigger.BEAT)
+
+        # THEN the view is refreshed once more right afterwards
+        self.assertEqual(len(queries), 2)
+        self.assertEqual(
+            mv.refresh_logs.filter(status=MaterializedViewRefreshLog.Status.SUCCESS.name).first().trigger,
+            MaterializedViewRefreshLog.Trigger.FOLLOW_UP.name
+        )
+
+
+class MaterializedViewSkipUnchangedTests(MaterializedViewTestCase):
+    def _refresh_queries(self, mv, **kwargs):
+        with CaptureQueriesContext(connection) as captured_queries:
+            mv.refresh(**kwargs)
+
+        return [q.get('sql') for q in captured_queries if q.get('sql').startswith('REFRESH')]
+
+    def test__materialized_view__refresh_skipped_when_sources_unchanged(self):
+        # GIVEN a created materialized view that skips the refresh when its sources did not change
+        mv = self._create_materialized_view(title='Unchanged', db_table='mv_unchanged')
+        mv.skip_unchanged = True
+        mv.save()
+        mv.create()
+        refresh_query = 'REFRESH MATERIALIZED VIEW CONCURRENTLY mv_unchanged;'
+
+        # WHEN the view is refreshed twice
+        self.assertEqual(self._refresh_queries(mv), [refresh_query])
+        self.assertEqual(self._refresh_queries(mv), [])
+
+        # THEN the second refresh is skipped and logged
+        log = mv.refresh_logs.first()
+        self.assertEqual(log.status, MaterializedViewRefreshLog.Status.SKIPPED.name)
+        self.assertIn('unchanged', log.error)
+
+        # a forced refresh runs anyway
+        self.assertEqual(self._refresh_queries(mv, force=True), [refresh_query])
+
+        # WHEN the source table changes
+        MigrationRecorder.Migration.objects.create(app='dj_materialized_views', name='9999_new')
+
+        # THEN the view is refreshed again
+        self.assertEqual(self._refresh_queries(mv), [refresh_query])
+        self.assertEqual(self._refresh_queries(mv), [])
+
+
+class MaterializedViewIndexTests(MaterializedViewTestCase):
+    def test__materialized_view_index__definitions(self):
+        # GIVEN a materialized view with indexes of several kinds
+        mv = self._create_materialized_view(title='Indexed', db_table='mv_indexed')
+
+        def create_index(**kwargs):
+            return MaterializedViewIndex.objects.create(title='idx', materialized_view=mv, **kwargs)
+
+        composite = create_index(index_field='app, applied DESC', include_fields='name')
+        partial = create_index(index_field='lower(name) text_pattern_ops', condition="app = 'auth'")
+        brin = create_index(index_field='applied', index_type='BRIN', storage_parameters='pages_per_range = 32')
+        second_id = create_index(index_field='id', index_type='HASH')
+
+        # THEN every index gets a unique name, the plain one on a single column keeps the usual name
+        self.assertEqual(mv.indexes.get(is_unique=True).index_name, 'mv_indexed_id')
+        names = list(mv.indexes.values_list('index_name', flat=True))
+        self.assertEqual(len(set(names)), 5)
+        self.assertTrue(all(len(name) <= 63 for name in names))
+
+        self.assertEqual(
+            composite.get_create_sql(),
+            f'CREATE INDEX IF NOT EXISTS {composite.index_name} ON mv_indexed USING btree(app, applied DESC) '
+            f'INCLUDE (name);'
+        )
+        self.assertEqual(
+            partial.get_create_sql(concurrently=True),
+            f'CREATE INDEX CONCURRENTLY IF NOT EXISTS {partial.index_name} ON mv_indexed '
+            f"USING btree(lower(name) text_pattern_ops) WHERE app = 'auth';"
+        )
+        self.assertEqual(
+            brin.get_create_sql(),
+            f'CREATE INDEX IF NOT EXISTS {brin.index_name} ON mv_indexed USING BRIN(applied) '
+            f'WITH (pages_per_range = 32);'
+        )
+        self.assertTrue(second_id.index_name.startswith('mv_indexed_id_'))
+
+        # WHEN the view is created
+        mv.create()
+
+        # THEN all the indexes exist and only the unique index on a column allows concurrent refresh
+        with connection.cursor() as cursor:
+            cursor.execute("SELECT indexname FROM pg_indexes WHERE tablename = 'mv_indexed'")
+            self.assertEqual({row[0] for row in cursor.fetchall()}, set(names))
+
+        self.assertTrue(mv.has_unique_index())
+        mv.indexes.filter(is_unique=True).update(condition='id > 0')
+        self.assertFalse(mv.has_unique_index())
+
+    def test__materialized_view_index__created_concurrently(self):
+        # GIVEN a populated materialized view
+        mv = self._create_materialized_view(title='Concurrent Index', db_table='mv_concurrent_index')
+        mv.create()
+        index = MaterializedViewIndex.objects.create(title='idx', materialized_view=mv, index_field='app')
+
+        # THEN an index added outside of a transaction is built concurrently
+        with mock.patch.object(connection, 'in_atomic_block', False), \
+                mock.patch('dj_materialized_views.models.materialized_view_index.execute_raw_sql') as execute:
+            index.create()
+            index.drop()
+
+        self.assertEqual([call.args[0] for call in execute.call_args_list], [
+            f'CREATE INDEX CONCURRENTLY IF NOT EXISTS {index.index_name} ON mv_concurrent_index USING btree(app);',
+            f'DROP INDEX CONCURRENTLY IF EXISTS {index.index_name};',
+        ])
+
+        # and in a transaction as usual
+        with CaptureQueriesContext(connection) as captured_queries:
+            index.create()
+        self.assertIn(index.get_create_sql(), [q.get('sql') for q in captured_queries])
+
+    def test__materialized_view_index__definition_change_replaces_index(self):
+        # GIVEN a created materialized view with a partial index
+        mv = self._create_materialized_view(title='Edited Index', db_table='mv_edited_index')
+        index = MaterializedViewIndex.objects.create(title='idx', materialized_view=mv, index_field='app',
+                                                     condition="app = 'auth'")
+        mv.create()
+        old_name = index.index_name
+
+        def get_definitions():
+            with connection.cursor() as cursor:
+                cursor.execute("SELECT indexname, indexdef FROM pg_indexes WHERE tablename = 'mv_edited_index'")
+                return dict(cursor.fetchall())
+
+        # WHEN the definition of the index is edited
+        index.condition = "app = 'admin'"
+        index.save()
+
+        # THEN the generated name follows the definition and the old index is replaced
+        self.assertNotEqual(index.index_name, old_name)
+        definitions = get_definitions()
+        self.assertNotIn(old_name, definitions)
+        self.assertIn("'admin'::text", definitions[index.index_name])
+
+        # WHEN the index is given a custom name and edited again
+        index.index_name = 'mv_edited_index_custom'
+        index.save()
+        index.include_fields = 'name'
+        index.save()
+
+        # THEN the custom name is kept and the index is rebuilt with the new definition
+        self.assertEqual(index.index_name, 'mv_edited_index_custom')
+        definitions = get_definitions()
+        self.assertEqual(len(definitions), 2)
+        self.assertIn('INCLUDE (name)', definitions['mv_edited_index_custom'])
+
+
+class MaterializedViewIndexAdvisorTests(MaterializedViewTestCase):
+    # the statistics of the test transaction are only published after it commits
+    TABLE_USAGE_SQL = 'SELECT 500, 100000, 10 WHERE %s IS NOT NULL'
+    STATEMENTS_SQL = """
+        SELECT query, calls, total_time_ms::float FROM (VALUES
+            ('SELECT * FROM mv_advised WHERE app = $1 AND applied >= $2 ORDER BY id', 40, 9000.0),
+            ('SELECT count(*) FROM "mv_advised" WHERE "mv_advised"."app" IN ($1, $2)', 10, 1000.0),
+            ('SELECT * FROM mv_advised WHERE id = $1', 1000, 50.0),
+            ('SELECT * FROM mv_advised WHERE missing = $1', 5, 20.0)
+        ) statements(query, calls, total_time_ms) WHERE %s IS NOT NULL AND %s > 0
+    """
+
+    def test__materialized_view__predicate_columns(self):
+        columns = {'id', 'app', 'name', 'applied'}
+
+        self.assertEqual(get_predicate_columns(
+            'SELECT * FROM "mv" WHERE "mv"."applied" < $1 AND "mv"."app" = $2 ORDER BY "mv"."id"', 'mv', columns
+        ), ('app', 'applied'))
+        self.assertEqual(get_predicate_columns(
+            'SELECT * FROM mv JOIN other ON other.id = mv.id WHERE other.name = $1', 'mv', columns
+        ), ())
+
+    def test__materialized_view__index_advisor(self):
+        # GIVEN a materialized view with an unused index, read by queries filtering on app
+        mv = self._create_materialized_view(title='Advised', db_table='mv_advised')
+        unused = MaterializedViewIndex.objects.create(title='idx', materialized_view=mv, index_field='name')
+        MaterializedViewIndex.objects.filter(pk=unused.pk).update(created_at=timezone.now() - timedelta(days=2))
+        unused.refresh_from_db()
+        mv.create()
+
+        # WHEN the advisor runs
+        with mock.patch('dj_materialized_views.advisor.TABLE_USAGE_SQL', self.TABLE_USAGE_SQL), \
+                mock.patch('dj_materialized_views.advisor.STATEMENTS_SQL', self.STATEMENTS_SQL), \
+                mock.patch('dj_materialized_views.advisor.get_statements_time_column', return_value='total_time'):
+            suggestions = advise(mv)
+
+            # THEN the unused index is dropped, never the unique index, and the slowest filter gets an index
+            self.assertEqual([(s.action, s.index, s.index_field) for s in suggestions], [
+                (IndexSuggestion.DROP, unused, None),
+                (IndexSuggestion.CREATE, None, 'app, applied'),
+                (IndexSuggestion.CREATE, None, 'app'),
+            ])
+            self.assertEqual((suggestions[1].calls, suggestions[1].total_time), (40, 9000.0))
+
+            # WHEN the suggestions are applied
+            for suggestion in suggestions[:2]:
+                suggestion.apply(user=self.super_user)
+
+            # THEN the index is created, no longer suggested and too young to be judged
+            self.assertEqual(advise(mv), [])
+
+        self.assertFalse(mv.indexes.filter(pk=unused.pk).exists())
+        created = mv.indexes.get(index_field='app, applied')
+        self.assertEqual(created.created_by_user, self.super_user)
+        with connection.cursor() as cursor:
+            cursor.execute("SELECT indexname FROM pg_indexes WHERE tablename = 'mv_advised'")
+            self.assertEqual({row[0] for row in cursor.fetchall()}, {'mv_advised_id', created.index_name})
+
+    def test__materialized_view__index_advisor_needs_reads(self):
+        # GIVEN a materialized view that was never read
+        mv = self._create_materialized_view(title='Unread', db_table='mv_unread')
+        MaterializedViewIndex.objects.create(title='idx', materialized_view=mv, index_field='name')
+        mv.create()
+
+        # THEN its indexes are not judged yet
+        self.assertEqual(advise(mv, min_age=timedelta(0)), [])
+
+
+class MaterializedViewPartitionedTests(MaterializedViewTestCase):
+    def setUp(self):
+        super().setUp()
+
+        # orders of the current month, the last month and half a year ago
+        execute_raw_sql(
+            'CREATE TABLE mv_orders (id int PRIMARY KEY, created date, amount int);'
+            "INSERT INTO mv_orders VALUES (1, current_date, 10), (2, current_date - interval '1 month', 20), "
+            "(3, current_date - interval '6 months', 30), (4, NULL, 40);"
+        )
+
+    def _partitions(self, db_table):
+        return {name: start for start, name in partitioned.get_partitions(MaterializedView(db_table=db_table)).items()}
+
+    def _amounts(self, mv):
+        return dict(mv.model.objects.values_list('id', 'amount'))
+
+    def test__materialized_view__partitioned_window_refresh(self):
+        # GIVEN a view partitioned by month with a window of two partitions
+        mv = self._create_materialized_view(title='Orders', db_table='mv_orders_summary',
+                                            sql_query='SELECT id, created, amount FROM mv_orders')
+        mv.indexes.update(is_unique=False)
+        mv.materialization = MaterializedView.Materialization.PARTITIONED.name
+        mv.partition_column = 'created'
+        mv.partition_window = 2
+        mv.full_clean()
+        mv.save()
+
+        # WHEN the view is created
+        mv.create()
+
+        # THEN there is a partition for every month since the first order, rows without a date are in the default
+        partitions = self._partitions('mv_orders_summary')
+        self.assertEqual(len(partitions), 7)
+        self.assertEqual(self._amounts(mv), {1: 10, 2: 20, 3: 30, 4: 40})
+        self.assertEqual(mv.get_refresh_strategy(), MaterializedView.RefreshStrategy.PARTITION)
+
+        # WHEN all the orders change and the view is refreshed
+        execute_raw_sql('UPDATE mv_orders SET amount = amount + 1;')
+        mv.refresh()
+
+        # THEN only the partitions of the window and the default partition are recomputed
+        self.assertEqual(self._amounts(mv), {1: 11, 2: 21, 3: 30, 4: 41})
+        self.assertEqual(set(self._partitions('mv_orders_summary')), set(partitions))
+
+        # and the partitions keep the indexes of the view
+        with connection.cursor() as cursor:
+            cursor.execute("SELECT count(*) FROM pg_indexes WHERE tablename LIKE 'mv_orders_summary_p%'")
+            self.assertEqual(cursor.fetchone()[0], 7)
+
+        # WHEN the old partitions are backfilled
+        mv.backfill()
+
+        # THEN they are recomputed as well
+        self.assertEqual(self._amounts(mv), {1: 11, 2: 21, 3: 31, 4: 41})
+        self.assertEqual(mv.refresh_logs.filter(strategy=MaterializedView.RefreshStrategy.PARTITION.name).count(), 2)
+
+        # WHEN the view is dropped
+        mv.drop()
+
+        # THEN the table and the view of the query are gone
+        self.assertFalse(relation_exists('mv_orders_summary'))
+        self.assertFalse(relation_exists('mv_orders_summary__query'))
+
+    def test__materialized_view__partition_periods(self):
+        start = datetime.datetime(2023, 11, 15, 12, 30)
+
+        self.assertEqual(partitioned.get_periods(start, datetime.datetime(2024, 2, 1), 'MONTH'), [
+            datetime.datetime(2023, 11, 1), datetime.datetime(2023, 12, 1), datetime.datetime(2024, 1, 1),
+        ])
+        self.assertEqual(partitioned.truncate(start, 'WEEK'), datetime.datetime(2023, 11, 13))
+        self.assertEqual(partitioned.add_interval(datetime.datetime(2024, 1, 1), 'MONTH', -2),
+                         datetime.datetime(2023, 11, 1))
+
+
+class MaterializedViewAppendTests(MaterializedViewTestCase):
+    def setUp(self):
+        super().setUp()
+
+        # click events, two of them share the same second
+        execute_raw_sql(
+            'CREATE TABLE mv_events (id int PRIMARY KEY, created timestamp, kind text);'
+            "INSERT INTO mv_events VALUES (1, '2024-01-01 10:00', 'click'), (2, '2024-01-01 10:01', 'view'), "
+            "(3, '2024-01-01 10:02', 'click');"
+        )
+
+    def _create_append_view(self, **fields):
+        mv = self._create_materialized_view(title='Clicks', db_table='mv_clicks',
+                                            sql_query="SELECT id, created FROM mv_events WHERE kind = 'click'")
+        mv.materialization = MaterializedView.Materialization.APPEND.name
+        mv.watermark_column = 'created'
+        for name, value in fields.items():
+            setattr(mv, name, value)
+        mv.full_clean()
+        mv.save()
+
+        return mv
+
+    def _ids(self, mv):
+        return sorted(mv.model.objects.values_list('id', flat=True))
+
+    def test__materialized_view__append_refresh(self):
+        # GIVEN an append-only view with batches of two rows
+        mv = self._create_append_view(append_batch_size=2)
+
+        # WHEN the view is created
+        mv.create()
+
+        # THEN it contains the clicks and the watermark is the latest one
+        self.assertEqual(self._ids(mv), [1, 3])
+        self.assertEqual(mv.watermark, '2024-01-01 10:02:00')
+        self.assertEqual(mv.get_watermark_lag(), {'rows': 0, 'seconds': 0.0})
+        self.assertEqual(mv.get_refresh_strategy(), MaterializedView.RefreshStrategy.APPEND)
+
+        # WHEN new events come in, two of them at the same time, and the view is refreshed
+        execute_raw_sql(
+            "INSERT INTO mv_events VALUES (4, '2024-01-01 10:03', 'click'), (5, '2024-01-01 10:04', 'click'), "
+            "(6, '2024-01-01 10:04', 'click'), (7, '2024-01-01 10:05', 'view');"
+        )
+        self.assertEqual(mv.get_watermark_lag()['rows'], 3)
+        mv.refresh()
+
+        # THEN only the new rows are appended, the rows of the same time are not split between batches
+        self.assertEqual(self._ids(mv), [1, 3, 4, 5, 6])
+        self.assertEqual(MaterializedView.objects.get(pk=mv.pk).watermark, '2024-01-01 10:04:00')
+        self.assertEqual(mv.get_watermark_lag()['rows'], 0)
+        self.assertEqual(mv.refresh_logs.filter(strategy=MaterializedView.RefreshStrategy.APPEND.name).count(), 1)
+
+        # and the lag stored by the refresh is exported without querying the source tables
+        execute_raw_sql("INSERT INTO mv_events VALUES (8, '2024-01-01 10:06', 'click');")
+        self.assertEqual(MaterializedView.objects.get(pk=mv.pk).watermark_lag_rows, 0)
+        with CaptureQueriesContext(connection) as captured_queries:
+            metrics = render_metrics()
+        self.assertIn('dj_materialized_views_watermark_lag_rows{view="mv_clicks"} 0', metrics)
+        self.assertIn('dj_materialized_views_watermark_lag_seconds{view="mv_clicks"}', metrics)
+        self.assertFalse([q for q in captured_queries if 'mv_clicks__query' in q.get('sql')])
+        execute_raw_sql('DELETE FROM mv_events WHERE id = 8;')
+
+        # WHEN an old event is changed and the view is rebuilt
+        execute_raw_sql("UPDATE mv_events SET kind = 'click' WHERE id = 2;")
+        mv.rebuild()
+
+        # THEN the whole table is recomputed with its indexes
+        self.assertEqual(self._ids(mv), [1, 2, 3, 4, 5, 6])
+        self.assertTrue(relation_exists('mv_clicks_id'))
+        self.assertFalse(relation_exists('mv_clicks__shadow'))
+
+        # WHEN the view is dropped
+        mv.drop()
+
+        # THEN the table and the view of the query are gone
+        self.assertFalse(relation_exists('mv_clicks'))
+        self.assertFalse(relation_exists('mv_clicks__query'))
+
+    def test__materialized_view__append_full_rebuild_schedule(self):
+        # GIVEN an append-only view rebuilt every hour
+        mv = self._create_append_view(full_rebuild_interval=3600)
+        mv.create()
+        self.assertEqual(mv.get_refresh_strategy(), MaterializedView.RefreshStrategy.APPEND)
+
+        # WHEN the last full rebuild is older than an hour
+        MaterializedView.objects.filter(pk=mv.pk).update(last_full_rebuild_at=timezone.now() - timedelta(hours=2))
+        mv.refresh_from_db()
+        execute_raw_sql("UPDATE mv_events SET kind = 'click' WHERE id = 2;")
+
+        # THEN the next refresh rebuilds the table
+        self.assertEqual(mv.get_refresh_strategy(), MaterializedView.RefreshStrategy.SWAP)
+        mv.refresh()
+        self.assertEqual(self._ids(mv), [1, 2, 3])
+        self.assertEqual(mv.get_refresh_strategy(), MaterializedView.RefreshStrategy.APPEND)
+
+
+class MaterializedViewSessionSettingsTests(MaterializedViewTestMixin, TransactionTestCase):
+    def tearDown(self):
+        for mv in MaterializedView.objects.order_by('-id'):
+            mv.drop()
+
+    def _current_setting(self, name):
+        with connection.cursor() as cursor:
+            cursor.execute('SELECT current_setting(%s)', [name])
+            return cursor.fetchone()[0]
+
+    @override_settings(MATERIALIZED_VIEWS_REFRESH_SESSION_SETTINGS={'work_mem': '8MB', 'lock_timeout': '5s'})
+    def test__materialized_view__session_settings_applied_during_refresh(self):
+        # GIVEN a view that stores the settings of the session that refreshed it
+        mv = self._create_materialized_view(
+            title='Settings', db_table='mv_settings',
+            sql_query="SELECT 1 AS id, current_setting('work_mem') AS work_mem, "
+                      "current_setting('lock_timeout') AS lock_timeout"
+        )
+        mv.work_mem = '16MB'
+        mv.full_clean()
+        mv.save()
+        work_mem = self._current_setting('work_mem')
+
+        # WHEN the view is created and refreshed
+        mv.create()
+        mv.refresh()
+
+        # THEN the settings of the view override the global defaults during the refresh only
+        self.assertEqual(mv.get_session_settings(), {'work_mem': '16MB', 'lock_timeout': '5s'})
+        self.assertEqual(list(mv.model.objects.values_list('work_mem', 'lock_timeout')), [('16MB', '5s')])
+        self.assertEqual(self._current_setting('work_mem'), work_mem)
+
+        # WHEN an index is built concurrently
+        MaterializedViewIndex.objects.create(title='Settings work_mem', materialized_view=mv,
+                                             index_field='work_mem').create(concurrently=True)
+
+        # THEN the settings of the session are restored afterwards
+        self.assertEqual(self._current_setting('work_mem'), work_mem)
+        self.assertTrue(relation_exists('mv_settings_work_mem'))
+
+    def test__materialized_view__invalid_session_setting(self):
+        # GIVEN a view with an invalid memory setting
+        mv = self._create_materialized_view(title='Settings', db_table='mv_settings')
+        mv.maintenance_work_mem = 'a lot'
+
+        # WHEN the view is validated THEN the setting is rejected
+        with self.assertRaises(ValidationError) as context:
+            mv.full_clean()
+        self.assertIn('maintenance_work_mem', context.exception.message_dict)
+
+
+class MaterializedViewBenchmarkTests(MaterializedViewTestMixin, TransactionTestCase):
+    def test__materialized_view__benchmark_command(self):
+        # GIVEN a file for the results
+        with tempfile.TemporaryDirectory() as directory:
+            output = os.path.join(directory, 'benchmark.json')
+
+            # WHEN the benchmark runs at a small scale
+            call_command('mv_benchmark', scales=[200], repeat=2, label='test', output=output, stderr=mock.Mock())
+
+            with open(output) as f:
+                results = json.load(f)
+
+        # THEN every operation is timed and the benchmark leaves nothing behind
+        self.assertEqual(results['label'], 'test')
+        operations = [(result['operation'], result['strategy']) for result in results['results']]
+        self.assertEqual(operations, [
+            ('create', ''), ('refresh', 'concurrent'), ('refresh', 'plain'), ('refresh', 'swap'),
+            ('create_index', ''), ('query_get', ''), ('query_filter_count', ''), ('query_top_10', ''),
+        ])
+        self.assertTrue(all(len(result['runs']) == 2 for result in results['results']))
+
+        self.assertFalse(MaterializedView.objects.exists())
+        self.assertFalse(PeriodicTask.objects.exists())
+        self.assertFalse(relation_exists('__mv_bench_events'))
+        self.assertFalse(relation_exists('__mv_bench_users'))
+
+    def test__materialized_view__benchmark_data_is_seeded(self):
+        # WHEN the benchmark data is generated and changed twice with the same seed
+        checksum_sql = 'SELECT sum(user_id), sum(amount) FROM __mv_bench_events'
+        checksums = []
+        try:
+            for _ in range(2):
+                benchmark.generate_data(1000, seed=0.25)
+                benchmark.change_data(1000, 0.1)
+                with connection.cursor() as cursor:
+                    cursor.execute(checksum_sql)
+                    checksums.append(cursor.fetchone())
+        finally:
+            benchmark.cleanup()
+
+        # THEN both runs have the same data
+        self.assertEqual(checksums[0], checksums[1])
+
+
+class MaterializedViewEstimateTests(MaterializedViewTestCase):
+    def test__materialized_view__estimate_stored_on_save(self):
+        # WHEN a view is saved
+        mv = self._create_materialized_view(title='Estimated', db_table='mv_estimated')
+
+        # THEN the planner estimate of its query is stored
+        mv.refresh_from_db()
+        self.assertIsNotNone(mv.estimated_rows)
+        self.assertGreater(mv.estimated_width, 0)
+        self.assertGreater(mv.estimated_cost, 0)
+
+        # WHEN the query cannot be planned THEN the estimate is cleared
+        mv.sql_query = 'SELECT * FROM mv_missing'
+        mv.save()
+        mv.refresh_from_db()
+        self.assertIsNone(mv.estimated_cost)
+
+    def test__materialized_view__no_estimate_without_limits_or_query_change(self):
+        # GIVEN a created view and no cost limits
+        mv = self._create_materialized_view(title='Estimated', db_table='mv_estimated')
+        mv.create()
+
+        # WHEN the view is refreshed, and saved without a change of its query
+        with CaptureQueriesContext(connection) as captured_queries:
+            mv.refresh()
+            mv.title = 'Renamed'
+            mv.save()
+
+        # THEN the query is not planned
+        self.assertFalse(any(q.get('sql').startswith('EXPLAIN') for q in captured_queries))
+
+    def test__materialized_view__cost_guardrail(self):
+        # GIVEN a view with a cross join
+        mv = self._create_materialized_view(
+            title='Cross join', db_table='mv_cross_join',
+            sql_query='SELECT a.id, b.id AS other_id FROM django_migrations a CROSS JOIN django_migrations b'
+        )
+        MaterializedViewIndex.objects.filter(materialized_view=mv).update(index_field='id, other_id')
+
+        with override_settings(MATERIALIZED_VIEWS_MAX_ESTIMATED_ROWS=10):
+            # WHEN the view is created above the row limit
+            with self.assertRaises(MaterializedViewCostExceeded):
+                mv.create()
+
+            # THEN it is not created
+            self.assertFalse(relation_exists('mv_cross_join'))
+
+            # WHEN the estimated cost is approved
+            mv.approve_estimate()
+
+            # THEN the view is created and refreshed, the refresh log records the estimate next to the actual rows
+            mv.create()
+            mv.refresh()
+            log = mv.refresh_logs.first()
+            self.assertEqual(log.status, MaterializedViewRefreshLog.Status.SUCCESS.name)
+            self.assertEqual(log.estimated_rows, mv.estimated_rows)
+
+            # WHEN the query grows more expensive than the approved cost
+            mv.sql_query += ' CROSS JOIN django_migrations c'
+            mv.save()
+
+            # THEN the refresh is refused and logged
+            with self.assertRaises(MaterializedViewCostExceeded):
+                mv.refresh()
+            self.assertEqual(mv.refresh_logs.first().status, MaterializedViewRefreshLog.Status.SKIPPED.name)
+
+
+class MaterializedViewCommandTests(MaterializedViewTestCase):
+    def setUp(self):
+        super().setUp()
+
+        self.sales = self._create_materialized_view(title='Sales', db_table='mv_sales')
+        self.stock = self._create_materialized_view(title='Stock', db_table='mv_stock')
+        self.other = self._create_materialized_view(title='Other', db_table='mv_other')
+        MaterializedView.objects.filter(pk__in=[self.sales.pk, self.stock.pk]).update(tags='nightly, shop')
+
+    def _call(self, *args, **kwargs):
+        stdout = StringIO()
+        call_command(*args, workers=1, stdout=stdout, **kwargs)
+
+        return stdout.getvalue()
+
+    def test__materialized_view__create_and_refresh_commands(self):
+        # WHEN the views with a tag are created
+        output = self._call('mv_create', tag=['nightly'])
+
+        # THEN only they are created, with their timings
+        self.assertTrue(relation_exists('mv_sales'))
+        self.assertTrue(relation_exists('mv_stock'))
+        self.assertFalse(relation_exists('mv_other'))
+        self.assertIn('mv_sales', output)
+
+        # WHEN all the views are created THEN the existing ones are skipped
+        output = self._call('mv_create', all=True)
+        self.assertIn('mv_sales', output)
+        self.assertIn('exists, skipped', output)
+        self.assertTrue(relation_exists('mv_other'))
+
+        # WHEN a view is refreshed by name
+        self._call('mv_refresh', 'mv_sales', force=True)
+
+        # THEN only that view is refreshed, logged as started by a command
+        self.assertEqual(self.sales.refresh_logs.count(), 2)
+        self.assertEqual(self.sales.refresh_logs.first().trigger, MaterializedViewRefreshLog.Trigger.COMMAND.name)
+        self.assertEqual(self.stock.refresh_logs.count(), 1)
+
+    def test__materialized_view__refresh_command_dry_run_and_failure(self):
+        # WHEN a refresh is planned
+        output = self._call('mv_refresh', id=[self.sales.pk], dry_run=True)
+
+        # THEN nothing runs
+        self.assertIn('mv_sales', output)
+        self.assertFalse(self.sales.refresh_logs.exists())
+
+        # WHEN a view that does not exist in the database is refreshed THEN the command fails
+        with self.assertRaises(CommandError):
+            self._call('mv_refresh', 'mv_sales')
+
+        # WHEN no view is selected or an unknown view is selected THEN the command fails
+        with self.assertRaises(CommandError):
+            self._call('mv_refresh')
+        with self.assertRaises(CommandError):
+            self._call('mv_refresh', 'mv_unknown')
+
+
+class MaterializedViewRouterTests(MaterializedViewTestCase):
+    def setUp(self):
+        super().setUp()
+
+        routers._replayed.clear()
+        self.router = routers.MaterializedViewRouter()
+
+    @override_settings(MATERIALIZED_VIEWS_REPLICAS={'default': ['replica']})
+    @mock.patch('django.db.transaction.on_commit', side_effect=lambda func, using=None: func())
+    def test__materialized_view__reads_from_replica_that_replayed_the_refresh(self, _):
+        # GIVEN a refreshed view of a database with a replica
+        mv = self._create_materialized_view(title='Replicated', db_table='mv_replicated')
+        mv.create()
+        mv.refresh_from_db()
+        self.assertTrue(mv.last_refresh_lsn)
+        refresh_lsn = routers.parse_lsn(mv.last_refresh_lsn)
+
+        # WHEN the replica has not replayed the refresh yet
+        behind = f'{(refresh_lsn - 1) >> 32:X}/{(refresh_lsn - 1) & 0xffffffff:X}'
+        with mock.patch('dj_materialized_views.routers.fetch_raw_sql', return_value=[(True, behind)]):
+            # THEN the reads go to the database of the view
+            self.assertEqual(self.router.db_for_read(mv.model), 'default')
+
+        # WHEN the replica has replayed the refresh
+        with mock.patch('dj_materialized_views.routers.fetch_raw_sql',
+                        return_value=[(True, mv.last_refresh_lsn)]) as fetch:
+            # THEN the reads go to the replica, its replay position is remembered
+            self.assertEqual(self.router.db_for_read(mv.model), 'replica')
+            self.assertEqual(self.router.db_for_read(mv.model), 'replica')
+            self.assertEqual(fetch.call_count, 1)
+
+        # and the writes and the other models are not routed to the replica
+        self.assertEqual(self.router.db_for_write(mv.model), 'default')
+        self.assertIsNone(self.router.db_for_read(MaterializedView))
+
+    @override_settings(MATERIALIZED_VIEWS_REPLICAS={'default': ['replica']})
+    @mock.patch('django.db.transaction.on_commit', side_effect=lambda func, using=None: func())
+    def test__materialized_view__wal_position_recorded_before_read_cache_generation(self, _):
+        # GIVEN a created view of a database with a replica
+        mv = self._create_materialized_view(title='Replicated', db_table='mv_replicated')
+        mv.create()
+        MaterializedView.objects.filter(pk=mv.pk).update(last_refresh_lsn='')
+
+        # WHEN the view is refreshed
+        recorded = []
+        with mock.patch('dj_materialized_views.read_cache.bump_generation', side_effect=lambda pk: recorded.append(
+                MaterializedView.objects.filter(pk=pk).values_list('last_refresh_lsn', flat=True).first())):
+            mv.refresh()
+
+        # THEN the new generation starts after the replicas are told to replay the refresh
+        self.assertEqual(len(recorded), 1)
+        self.assertTrue(recorded[0])
+
+    def test__materialized_view__unreachable_replica(self):
+        # WHEN the replica cannot be reached THEN it is not used
+        with mock.patch('dj_materialized_views.routers.fetch_raw_sql', side_effect=OperationalError):
+            self.assertFalse(routers.has_replayed('replica', '0/1'))
+
+        # WHEN the database is not a standby THEN it is always up to date
+        with mock.patch('dj_materialized_views.routers.fetch_raw_sql', return_value=[(False, None)]):
+            self.assertTrue(routers.has_replayed('primary', 'FF/1'))
+
+
+class MaterializedViewTaskOptionsTests(MaterializedViewTestCase):
+    def _set_task_options(self, mv, **options):
+        for name, value in options.items():
+            setattr(mv, name, value)
+        mv.full_clean()
+        mv.save()
+        mv.periodic_task.refresh_from_db()
+
+    @override_settings(MATERIALIZED_VIEWS_REFRESH_TASK_OPTIONS={'queue': 'refresh', 'priority': 3})
+    def test__materialized_view__task_options_applied_to_periodic_task(self):
+        # GIVEN a view with its own queue, time limits and expiry
+        mv = self._create_materialized_view(title='Heavy')
+        mv.periodic_task.headers = json.dumps({'tenant': 'a'})
+        mv.periodic_task.save()
+
+        # WHEN the view is saved
+        self._set_task_options(mv, refresh_queue='heavy', refresh_soft_time_limit=600, refresh_time_limit=660,
+                               refresh_expire_seconds=300)
+
+        # THEN the periodic task is routed with the options of the view over the global defaults
+        self.assertEqual(mv.periodic_task.queue, 'heavy')
+        self.assertEqual(mv.periodic_task.priority, 3)
+        self.assertEqual(mv.periodic_task.expire_seconds, 300)
+        self.assertEqual(json.loads(mv.periodic_task.headers), {'tenant': 'a', 'timelimit': [660, 600]})
+
+        # WHEN the options of the view are cleared
+        self._set_task_options(mv, refresh_queue='', refresh_soft_time_limit=None, refresh_time_limit=None,
+                               refresh_expire_seconds=None)
+
+        # THEN the periodic task falls back to the global defaults
+        self.assertEqual(mv.periodic_task.queue, 'refresh')
+        self.assertIsNone(mv.periodic_task.expire_seconds)
+        self.assertEqual(json.loads(mv.periodic_task.headers), {'tenant': 'a'})
+
+    def test__materialized_view__task_options_applied_to_dispatches(self):
+        # GIVEN a view with a queue, a priority and an expiry
+        mv = self._create_materialized_view(title='Light')
+        self._set_task_options(mv, refresh_queue='light', refresh_priority=9, refresh_expire_seconds=60)
+
+        # WHEN the view is refreshed in the background
+        with mock.patch('dj_materialized_views.tasks.refresh_materialized_view.apply_async') as apply_async:
+            mv.refresh_async(force=True)
+
+        # THEN the task is sent with the options of the view
+        apply_async.assert_called_once_with(
+            kwargs={'materialized_view_id': mv.pk, 'cascade': True, 'force': True, 'trigger': 'TASK'},
+            queue='light', priority=9, expires=60
+        )
+
+        # WHEN a change refresh is scheduled
+        with mock.patch('dj_materialized_views.tasks.refresh_changed_materialized_view.apply_async') as apply_async:
+            schedule_refresh(mv, 30)
+
+        # THEN it is sent without the expiry, an expired change refresh would never be requested again
+        apply_async.assert_called_once_with(
+            kwargs={'materialized_view_id': mv.pk}, queue='light', priority=9, countdown=30
+        )
+
+    def test__materialized_view__change_refresh_runs_after_the_expiry(self):
+        # GIVEN a view with signal change detection and an expiry of its refresh tasks
+        mv = self._create_materialized_view(title='Expiring', db_table='mv_expiring')
+        self._set_task_options(mv, change_detection=MaterializedView.ChangeDetection.SIGNALS.name,
+                               refresh_expire_seconds=60)
+        mv.create()
+
+        # WHEN a change is notified
+        with mock.patch('dj_materialized_views.tasks.refresh_changed_materialized_view.apply_async') as apply_async, \
+                mock.patch('django.db.transaction.on_commit', side_effect=lambda func, using=None: func()):
+            notify_change(['django_migrations'], change_detection=MaterializedView.ChangeDetection.SIGNALS)
+        self.assertNotIn('expires', apply_async.call_args.kwargs)
+
+        # and its task only runs long after the expiry of the refresh tasks
+        MaterializedView.objects.filter(pk=mv.pk).update(
+            change_pending_since=timezone.now() - timedelta(hours=1),
+            last_change_at=timezone.now() - timedelta(hours=1)
+        )
+        refresh_changed_materialized_view(materialized_view_id=mv.pk)
+
+        # THEN the view is refreshed and the next change schedules a new refresh
+        self.assertIsNone(MaterializedView.objects.get(pk=mv.pk).change_pending_since)
+        with mock.patch('dj_materialized_views.tasks.refresh_changed_materialized_view.apply_async') as apply_async, \
+                mock.patch('django.db.transaction.on_commit', side_effect=lambda func, using=None: func()):
+            notify_change(['django_migrations'], change_detection=MaterializedView.ChangeDetection.SIGNALS)
+        apply_async.assert_called_once()
+
+    def test__materialized_view__time_limits_validated(self):
+        # GIVEN a view whose soft time limit is above its time limit
+        mv = self._create_materialized_view(title='Limits')
+        mv.refresh_soft_time_limit = 120
+        mv.refresh_time_limit = 60
+
+        # WHEN the view is validated THEN the limits are rejected
+        with self.assertRaises(ValidationError) as context:
+            mv.full_clean()
+        self.assertIn('refresh_soft_time_limit', context.exception.message_dict)
+
+
+class MaterializedViewStorageTests(MaterializedViewTestMixin, TransactionTestCase):
+    def tearDown(self):
+        for mv in MaterializedView.objects.order_by('-id'):
+            mv.drop()
+
+    def _fetch_one(self, sql, params=None):
+        with connection.cursor() as cursor:
+            cursor.execute(sql, params)
+            return cursor.fetchone()
+
+    def test__materialized_view__storage_options_and_maintenance(self):
+        # GIVEN a view with a tablespace, storage parameters and a VACUUM (ANALYZE) after every refresh
+        mv = self._create_materialized_view(title='Storage', db_table='mv_storage')
+        mv.tablespace = 'pg_default'
+        mv.storage_parameters = 'fillfactor = 70, autovacuum_enabled = false'
+        mv.post_refresh_maintenance = MaterializedView.Maintenance.VACUUM_ANALYZE.name
+        mv.full_clean()
+        mv.save()
+
+        # WHEN the view is created and refreshed
+        with CaptureQueriesContext(connection) as captured_queries:
+            mv.create()
+            mv.refresh()
+
+        # THEN the view is created with the storage options and analyzed after every refresh
+        queries = [q.get('sql') for q in captured_queries]
+        self.assertIn('VACUUM (ANALYZE) mv_storage;', queries)
+        self.assertTrue(any('TABLESPACE pg_default' in query and 'CREATE UNIQUE INDEX' in query for query in queries))
+        self.assertEqual(self._fetch_one("SELECT reloptions FROM pg_class WHERE oid = 'mv_storage'::regclass;")[0],
+                         ['fillfactor=70', 'autovacuum_enabled=false'])
+        self.assertGreater(
+            self._fetch_one("SELECT count(*) FROM pg_statistic WHERE starelid = 'mv_storage'::regclass;")[0], 0
+        )
+
+        # the maintenance is recorded apart from the refresh
+        logs = mv.refresh_logs.filter(status=MaterializedViewRefreshLog.Status.SUCCESS.name)
+        self.assertEqual(logs.count(), 2)
+        self.assertFalse(logs.filter(maintenance_duration__isnull=True).exists())
+
+    def test__materialized_view__created_with_no_data(self):
+        # GIVEN a view created with no data
+        mv = self._create_materialized_view(title='Empty', db_table='mv_empty')
+        mv.create_with_no_data = True
+        mv.full_clean()
+        mv.save()
+
+        # WHEN the view is created
+        with mock.patch.object(MaterializedView, 'refresh_async') as refresh_async:
+            mv.create()
+
+        # THEN the view is empty and its first refresh is queued
+        self.assertFalse(mv.is_populated())
+        refresh_async.assert_called_once_with(trigger=None)
+
+        # the first refresh populates it
+        mv.refresh()
+        self.assertTrue(mv.is_populated())
+        self.assertEqual(mv.refresh_logs.first().strategy, MaterializedView.RefreshStrategy.PLAIN.name)
+
+    def test__materialized_view__storage_options_validated(self):
+        # GIVEN a partitioned table with storage parameters and no data
+        mv = self._create_materialized_view(title='Partitioned', db_table='mv_partitioned')
+        mv.materialization = MaterializedView.Materialization.PARTITIONED.name
+        mv.partition_column = 'applied'
+        mv.storage_parameters = 'fillfactor = 70'
+        mv.create_with_no_data = True
+
+        # WHEN the view is validated THEN the options are rejected
+        with self.assertRaises(ValidationError) as context:
+            mv.full_clean()
+        self.assertIn('create_with_no_data', context.exception.message_dict)
+
+
+@override_settings(MATERIALIZED_VIEWS_BLOAT_THRESHOLDS={'min_size': 0})
+class MaterializedViewBloatTests(MaterializedViewTestMixin, TransactionTestCase):
+    def tearDown(self):
+        for mv in MaterializedView.objects.order_by('-id'):
+            mv.drop()
+        execute_raw_sql('DROP TABLE IF EXISTS mv_bloat_source;')
+
+    def _create_bloated_view(self):
+        execute_raw_sql("CREATE TABLE mv_bloat_source AS SELECT i AS id, 'x' AS payload "
+                        "FROM generate_series(1, 2000) AS i;")
+        mv = self._create_materialized_view(title='Bloat', db_table='mv_bloat',
+                                            sql_query='SELECT id, payload FROM mv_bloat_source')
+        mv.refresh_strategy = MaterializedView.RefreshStrategy.CONCURRENT.name
+        mv.save()
+        mv.create()
+
+        # a concurrent refresh that changes every row leaves as many dead rows behind
+        execute_raw_sql("UPDATE mv_bloat_source SET payload = 'y';")
+        mv.refresh()
+        execute_raw_sql('SELECT pg_stat_force_next_flush();')
+
+        return mv
+
+    def test__materialized_view__bloat_tracked_and_maintained(self):
+        # GIVEN a view with dead rows left by a concurrent refresh
+        mv = self._create_bloated_view()
+
+        # WHEN the maintenance task runs outside of the maintenance window
+        with override_settings(MATERIALIZED_VIEWS_MAINTENANCE_WINDOW=('00:00', '00:00')):
+            self.assertEqual(tasks.maintain_materialized_views(), {})
+
+        # THEN the stats are tracked and a vacuum is scheduled
+        mv.refresh_from_db()
+        self.assertGreater(mv.heap_size, 0)
+        self.assertGreater(mv.index_size, 0)
+        self.assertGreaterEqual(mv.dead_tuple_ratio, 0.4)
+        self.assertEqual(mv.maintenance_due, MaterializedView.BloatAction.VACUUM.name)
+
+        # WHEN the maintenance task runs inside of the window
+        with CaptureQueriesContext(connection) as captured_queries:
+            results = tasks.maintain_materialized_views()
+
+        # THEN the view is vacuumed
+        self.assertEqual(list(results), [mv.pk])
+        self.assertIn('VACUUM (ANALYZE) mv_bloat;', [q.get('sql') for q in captured_queries])
+        mv.refresh_from_db()
+        self.assertEqual(mv.maintenance_due, MaterializedView.BloatAction.NONE.name)
+        self.assertEqual(mv.last_maintenance, MaterializedView.BloatAction.VACUUM.name)
+
+        # the analyzed view gets a bloat estimate
+        execute_raw_sql('SELECT pg_stat_force_next_flush();')
+        self.assertIsNotNone(mv.update_bloat_stats()['bloat_ratio'])
+
+    def test__materialized_view__reindex_and_rebuild(self):
+        # GIVEN a view with bloated indexes
+        mv = self._create_bloated_view()
+        mv.maintenance_due = MaterializedView.BloatAction.REINDEX.name
+
+        # WHEN the maintenance runs THEN the indexes are rebuilt without blocking the readers
+        with CaptureQueriesContext(connection) as captured_queries:
+            self.assertEqual(mv.run_due_maintenance(), MaterializedView.BloatAction.REINDEX)
+        self.assertIn('REINDEX TABLE CONCURRENTLY mv_bloat;', [q.get('sql') for q in captured_queries])
+
+        # WHEN a bloated table is maintained
+        mv.maintenance_due = MaterializedView.BloatAction.REBUILD.name
+        mv.run_due_maintenance()
+
+        # THEN the view is rebuilt under a shadow name
+        log = mv.refresh_logs.first()
+        self.assertEqual(log.strategy, MaterializedView.RefreshStrategy.SWAP.name)
+        self.assertEqual(log.trigger, MaterializedViewRefreshLog.Trigger.MAINTENANCE.name)
+
+    def test__materialized_view__maintenance_window_and_thresholds(self):
+        # GIVEN a maintenance window over midnight
+        with override_settings(MATERIALIZED_VIEWS_MAINTENANCE_WINDOW=('23:00', '04:00')):
+            # THEN the times inside of it are detected
+            self.assertTrue(bloat.in_maintenance_window(datetime.datetime(2024, 1, 1, 23, 30)))
+            self.assertTrue(bloat.in_maintenance_window(datetime.datetime(2024, 1, 2, 3, 59)))
+            self.assertFalse(bloat.in_maintenance_window(datetime.datetime(2024, 1, 2, 12, 0)))
+
+        # GIVEN the stats of a view THEN the most effective maintenance is picked
+        stats = {'heap_size': 100, 'index_size': 100, 'dead_tuple_ratio': 0.3, 'bloat_ratio': 0.1,
+                 'index_bloat_ratio': None}
+        self.assertEqual(bloat.get_action(stats), MaterializedView.BloatAction.VACUUM)
+        self.assertEqual(bloat.get_action(dict(stats, index_bloat_ratio=0.5)), MaterializedView.BloatAction.REINDEX)
+        self.assertEqual(bloat.get_action(dict(stats, bloat_ratio=0.6)), MaterializedView.BloatAction.REBUILD)
+        with override_settings(MATERIALIZED_VIEWS_BLOAT_THRESHOLDS={'min_size': 1000}):
+            self.assertEqual(bloat.get_action(stats), MaterializedView.BloatAction.NONE)
+
+
+class MaterializedViewWarmUpTests(MaterializedViewTestCase):
+    def _create_warm_view(self, **fields):
+        mv = self._create_materialized_view(
+            title='Warm', db_table='mv_warm', sql_query='SELECT i AS id FROM generate_series(1, 1000) AS i'
+        )
+        mv.warm_up = True
+        for name, value in fields.items():
+            setattr(mv, name, value)
+        mv.full_clean()
+        mv.save()
+
+        return mv
+
+    def test__materialized_view__warm_up_queries(self):
+        # GIVEN a view with warm-up queries, without pg_prewarm
+        mv = self._create_warm_view(
+            warm_up_queries=json.dumps([{'filter': {'id__lte': 10}, 'order_by': ['-id'], 'limit': 5}])
+        )
+
+        # WHEN the view is created
+        mv.create()
+
+        # THEN the queries warm it up and the warm-up is recorded apart from the creation
+        self.assertIsNotNone(mv.refresh_logs.get().warm_up_duration)
+        self.assertEqual(mv.run_warm_up(), {'method': 'queries', 'rows': 5})
+
+        # WHEN the view does not fit in the budget THEN it is not warmed up
+        mv.warm_up_max_bytes = 1
+        self.assertIsNone(mv.run_warm_up())
+
+    def test__materialized_view__prewarm_plan_within_budget(self):
+        # GIVEN a created view with a warm-up index
+        mv = self._create_warm_view()
+        index = mv.indexes.get()
+        index.warm_up = True
+        index.save()
+        mv.create()
+
+        # WHEN the budget covers the whole view
+        plan = prewarm.get_plan(mv, 1024 * 1024 * 1024)
+
+        # THEN the index is loaded before the table
+        self.assertEqual([relation for relation, _ in plan], [index.get_index_name(), 'mv_warm'])
+
+        # WHEN the budget is a single block THEN only the start of the index is loaded
+        self.assertEqual(prewarm.get_plan(mv, prewarm.get_block_size()), [(index.get_index_name(), 1)])
+
+        # the budget never exceeds the share of shared_buffers
+        with override_settings(MATERIALIZED_VIEWS_WARM_UP_MAX_SHARED_BUFFERS_RATIO=0):
+            self.assertEqual(prewarm.get_budget(mv), 0)
+
+    def test__materialized_view__invalid_warm_up_queries(self):
+        # GIVEN a view with a warm-up query with an unknown key
+        mv = self._create_materialized_view(title='Warm')
+        mv.warm_up_queries = json.dumps([{'where': 'id > 1'}])
+
+        # WHEN the view is validated THEN the queries are rejected
+        with self.assertRaises(ValidationError) as context:
+            mv.full_clean()
+        self.assertIn('warm_up_queries', context.exception.message_dict)
@@ -0,0 +1,9 @@
+from django.urls import path
+
+from dj_materialized_views import views
+
+app_name = 'dj_materialized_views'
+
+urlpatterns = [
+    path('metrics/', views.metrics, name='metrics'),
+]
@@ -1,13 +1,138 @@
-from django.db import connection
+import functools
+import threading
+from contextlib import contextmanager
 
+from django.db import connections, transaction
 
-def execute_raw_sql(*sql):
+from dj_materialized_views.conf import get_setting
+
+# database of the raw SQL of the current thread, see using_database
+_state = threading.local()
+
+
+def get_database_alias():
+    """
+    Returns the alias of the database that the raw SQL and the transactions of the app run on:
+    the one of the enclosing using_database, MATERIALIZED_VIEWS_DATABASE otherwise
+    """
+    return getattr(_state, 'alias', None) or get_setting('DATABASE')
+
+
+def get_connection():
+    return connections[get_database_alias()]
+
+
+@contextmanager
+def using_database(alias):
+    """
+    Runs the raw SQL and the transactions of the app inside the context on the given database, in this thread
+
+    Example:
+
+        with using_database('warehouse'):
+            execute_raw_sql('REFRESH MATERIALIZED VIEW orders_summary;')
+    """
+    previous = getattr(_state, 'alias', None)
+    _state.alias = alias
+
+    try:
+        yield
+    finally:
+        _state.alias = previous
+
+
+def on_view_database(method):
+    """
+    Runs a method of a MaterializedView, or of a model related to one, on the database of the view
+    """
+    @functools.wraps(method)
+    def wrapper(self, *args, **kwargs):
+        materialized_view = getattr(self, 'materialized_view', self)
+
+        with using_database(materialized_view.get_database_alias()):
+            return method(self, *args, **kwargs)
+
+    return wrapper
+
+
+def atomic():
+    """
+    transaction.atomic on the database of the raw SQL, see get_database_alias
+    """
+    return transaction.atomic(using=get_database_alias())
+
+
+def execute_raw_sql(*sql, using=None):
     """
     Execute SQL query and close the connection
 
     :param sql: sql string
+    :param using: database alias, defaults to get_database_alias
     :return: None
     """
 
-    with connection.cursor() as cursor:
+    with connections[using or get_database_alias()].cursor() as cursor:
         cursor.execute(*sql)
+
+
+def fetch_raw_sql(*sql, using=None):
+    """
+    Execute SQL query and return all the rows
+
+    :param sql: sql string
+    :param using: database alias, defaults to get_database_alias
+    :return: list of tuples
+    """
+
+    with connections[using or get_database_alias()].cursor() as cursor:
+        cursor.execute(*sql)
+        return cursor.fetchall()
+
+
+def _set_config(settings, is_local):
+    if settings:
+        execute_raw_sql(
+            f'SELECT {", ".join(f"set_config(%s, %s, {str(is_local).lower()})" for _ in settings)};',
+            [item for name, value in settings.items() for item in (name, str(value))]
+        )
+
+
+def set_local_settings(settings):
+    """
+    Applies PostgreSQL settings until the end of the current transaction, same as SET LOCAL
+
+    :param settings: dict of setting name -> value
+    """
+    _set_config(settings, is_local=True)
+
+
+@contextmanager
+def session_settings(settings):
+    """
+    Applies PostgreSQL settings to the session for the statements that cannot run in a transaction,
+    e.g. CREATE INDEX CONCURRENTLY. The previous values are restored when the context exits
+
+    :param settings: dict of setting name -> value
+    """
+    names = list(settings or {})
+    previous = fetch_raw_sql(f'SELECT {", ".join("current_setting(%s)" for _ in names)};', names)[0] if names else ()
+
+    _set_config(settings, is_local=False)
+    try:
+        yield
+    finally:
+        _set_config(dict(zip(names, previous)), is_local=False)
+
+
+@contextmanager
+def atomic_repeatable_read():
+    """
+    Atomic block in which all the queries see the same snapshot of the database.
+    When nested in another atomic block, the isolation level of the outer transaction is used
+    """
+    outermost = not get_connection().in_atomic_block
+
+    with atomic():
+        if outermost:
+            execute_raw_sql('SET TRANSACTION ISOLATION LEVEL REPEATABLE READ;')
+        yield
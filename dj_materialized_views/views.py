@@ -0,0 +1,116 @@
+from django.http import HttpResponse, HttpResponseForbidden
+from django.utils import timezone
+from django.utils.crypto import constant_time_compare
+
+from dj_materialized_views.conf import get_setting
+
+PROMETHEUS_CONTENT_TYPE = 'text/plain; version=0.0.4; charset=utf-8'
+
+
+def metrics(request):
+    """
+    Exports the refresh stats of the materialized views in the Prometheus text format.
+    The scraper has to send MATERIALIZED_VIEWS_METRICS_TOKEN as a bearer token, or be logged in as staff
+    """
+    token = get_setting('METRICS_TOKEN')
+    has_token = bool(token) and constant_time_compare(request.META.get('HTTP_AUTHORIZATION', ''), f'Bearer {token}')
+    user = getattr(request, 'user', None)
+    if not has_token and not (user is not None and user.is_active and user.is_staff):
+        return HttpResponseForbidden()
+
+    return HttpResponse(render_metrics(), content_type=PROMETHEUS_CONTENT_TYPE)
+
+
+def render_metrics():
+    """
+    Returns the refresh stats of all the materialized views in the Prometheus text format
+    """
+    from dj_materialized_views import read_cache
+    from dj_materialized_views.models import MaterializedView, MaterializedViewRefreshLog
+
+    stats = MaterializedViewRefreshLog.get_stats()
+    last_sizes = dict(
+        MaterializedViewRefreshLog.objects.filter(size_after__isnull=False)
+        .order_by('materialized_view_id', '-started_at')
+        .distinct('materialized_view_id')
+        .values_list('materialized_view_id', 'size_after')
+    )
+
+    metrics = {
+        'refresh_duration_seconds': ('summary', 'Duration of the successful refreshes', []),
+        'refreshes': ('gauge', 'Refreshes in the retention period', []),
+        'refresh_failures': ('gauge', 'Failed refreshes in the retention period', []),
+        'last_success_timestamp_seconds': ('gauge', 'Time of the last successful refresh', []),
+        'size_bytes': ('gauge', 'Size of the view with its indexes after the last refresh', []),
+        'overlapping_refreshes_total': ('counter', 'Refresh requests that came in while the view was refreshing', []),
+        'coalesced_refreshes_total': ('counter', 'Overlapping refresh requests merged into a pending follow-up', []),
+        'read_cache_hits_total': ('counter', 'Queries answered from the read cache', []),
+        'read_cache_misses_total': ('counter', 'Queries of the read cache that went to the database', []),
+        'watermark_lag_rows': ('gauge', 'Rows of append-only tables above the watermark after the last refresh', []),
+        'watermark_lag_seconds': ('gauge', 'Age of the oldest row of append-only tables above the watermark after '
+                                  'the last refresh, or of the last refresh', []),
+        'heap_size_bytes': ('gauge', 'Size of the table of the view without the indexes', []),
+        'index_size_bytes': ('gauge', 'Size of the indexes of the view', []),
+        'dead_tuple_ratio': ('gauge', 'Share of the rows of the view that are dead', []),
+        'bloat_ratio': ('gauge', 'Share of the table of the view taken by dead rows and free space', []),
+        'index_bloat_ratio': ('gauge', 'Share of the btree indexes of the view taken by free space', []),
+    }
+
+    for materialized_view in MaterializedView.objects.order_by('db_table'):
+        labels = f'view="{_escape_label(materialized_view.db_table)}"'
+        view_stats = stats.get(materialized_view.pk)
+
+        if view_stats:
+            for quantile, key in (('0.5', 'p50'), ('0.95', 'p95')):
+                if view_stats[key] is not None:
+                    metrics['refresh_duration_seconds'][2].append(
+                        (f'{labels},quantile="{quantile}"', view_stats[key])
+                    )
+
+            metrics['refreshes'][2].append((labels, view_stats['count']))
+            metrics['refresh_failures'][2].append((labels, view_stats['failures']))
+            if view_stats['last_success'] is not None:
+                metrics['last_success_timestamp_seconds'][2].append(
+                    (labels, view_stats['last_success'].timestamp())
+                )
+
+        if materialized_view.pk in last_sizes:
+            metrics['size_bytes'][2].append((labels, last_sizes[materialized_view.pk]))
+
+        metrics['overlapping_refreshes_total'][2].append((labels, materialized_view.overlapping_refresh_count))
+        metrics['coalesced_refreshes_total'][2].append((labels, materialized_view.coalesced_refresh_count))
+
+        if materialized_view.read_cache:
+            cache_stats = read_cache.get_stats(materialized_view.pk)
+            metrics['read_cache_hits_total'][2].append((labels, cache_stats['hits']))
+            metrics['read_cache_misses_total'][2].append((labels, cache_stats['misses']))
+
+        # stored by the refreshes, the source tables are not queried on every scrape
+        if materialized_view.is_append and materialized_view.watermark_lag_rows is not None:
+            metrics['watermark_lag_rows'][2].append((labels, materialized_view.watermark_lag_rows))
+            if materialized_view.watermark_lag_since is not None:
+                metrics['watermark_lag_seconds'][2].append(
+                    (labels, (timezone.now() - materialized_view.watermark_lag_since).total_seconds())
+                )
+
+        # measured by the maintain_materialized_views task
+        bloat_metrics = (('heap_size_bytes', 'heap_size'), ('index_size_bytes', 'index_size'),
+                         ('dead_tuple_ratio', 'dead_tuple_ratio'), ('bloat_ratio', 'bloat_ratio'),
+                         ('index_bloat_ratio', 'index_bloat_ratio'))
+        for metric, field in bloat_metrics:
+            value = getattr(materialized_view, field)
+            if value is not None:
+                metrics[metric][2].append((labels, value))
+
+    lines = []
+    for name, (metric_type, description, samples) in metrics.items():
+        name = f'dj_materialized_views_{name}'
+        lines.append(f'# HELP {name} {description}')
+        lines.append(f'# TYPE {name} {metric_type}')
+        lines.extend(f'{name}{{{labels}}} {value}' for labels, value in samples)
+
+    return '\n'.join(lines) + '\n'
+
+
+def _escape_label(value):
+    return value.replace('\\', r'\\').replace('"', r'\"').replace('\n', r'\n')